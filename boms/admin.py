@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import User, Bom, BomDetail, SizeSpec
+from .models import User, Bom, BomDetail, BomEvent, MaterialUnitFactor, Notification, SizeSpec
 
 
 @admin.register(User)
@@ -34,13 +34,25 @@ class SizeSpecInline(admin.TabularInline):
     fields = ('size', 'measurements', 'sort_order', 'is_active')
 
 
+class BomEventInline(admin.TabularInline):
+    """BOM工作流历史（只读）"""
+    model = BomEvent
+    extra = 0
+    can_delete = False
+    fields = ('created_at', 'action', 'from_status', 'to_status', 'actor', 'reason')
+    readonly_fields = fields
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(Bom)
 class BomAdmin(admin.ModelAdmin):
     """BOM主表管理界面"""
-    list_display = ('style_code', 'product_name', 'category', 'season', 'status', 'created_by', 'created_at')
+    list_display = ('style_code', 'product_name', 'category', 'season', 'status', 'total_cost', 'created_by', 'created_at')
     list_filter = ('status', 'category', 'season', 'year', 'created_by')
     search_fields = ('style_code', 'product_name', 'wave')
-    readonly_fields = ('created_at', 'updated_at', 'confirmed_at')
+    readonly_fields = ('created_at', 'updated_at', 'confirmed_at', 'total_cost', 'detail_count', 'material_costs')
     
     fieldsets = (
         ('基本信息', {
@@ -55,13 +67,16 @@ class BomAdmin(admin.ModelAdmin):
         ('状态管理', {
             'fields': ('status', 'version', 'created_by', 'assigned_to', 'notes')
         }),
+        ('成本汇总', {
+            'fields': ('total_cost', 'detail_count', 'material_costs')
+        }),
         ('时间信息', {
             'fields': ('created_at', 'updated_at', 'confirmed_at'),
             'classes': ('collapse',)
         }),
     )
     
-    inlines = [BomDetailInline, SizeSpecInline]
+    inlines = [BomDetailInline, SizeSpecInline, BomEventInline]
     
     def save_model(self, request, obj, form, change):
         if not change:  # 新建时自动设置创建人
@@ -75,6 +90,7 @@ class BomDetailAdmin(admin.ModelAdmin):
     list_display = ('bom', 'sequence', 'material_type', 'material_name', 'usage_quantity', 'usage_unit', 'unit_price', 'total_cost')
     list_filter = ('material_type', 'usage_unit', 'bom__category')
     search_fields = ('bom__style_code', 'material_name', 'specification', 'supplier_name')
+    readonly_fields = ('base_quantity', 'base_unit')
     
     fieldsets = (
         ('基本信息', {
@@ -84,7 +100,7 @@ class BomDetailAdmin(admin.ModelAdmin):
             'fields': ('supplier_name', 'supplier_code')
         }),
         ('用量价格', {
-            'fields': ('usage_quantity', 'usage_unit', 'unit_price')
+            'fields': ('usage_quantity', 'usage_unit', 'base_quantity', 'base_unit', 'unit_price')
         }),
         ('其他信息', {
             'fields': ('color_requirement', 'craft_requirement', 'notes')
@@ -92,6 +108,14 @@ class BomDetailAdmin(admin.ModelAdmin):
     )
 
 
+@admin.register(MaterialUnitFactor)
+class MaterialUnitFactorAdmin(admin.ModelAdmin):
+    """物料单位换算系数管理界面（保存后自动重算该物料的明细）"""
+    list_display = ('material_code', 'unit', 'factor', 'base_unit', 'notes', 'updated_at')
+    list_filter = ('unit', 'base_unit')
+    search_fields = ('material_code', 'notes')
+
+
 @admin.register(SizeSpec)
 class SizeSpecAdmin(admin.ModelAdmin):
     """尺码规格管理界面"""
@@ -107,3 +131,30 @@ class SizeSpecAdmin(admin.ModelAdmin):
             'fields': ('measurements',)
         }),
     )
+
+
+@admin.register(BomEvent)
+class BomEventAdmin(admin.ModelAdmin):
+    """BOM工作流事件（只追加，不允许修改）"""
+    list_display = ('bom', 'action', 'from_status', 'to_status', 'actor', 'created_at')
+    list_filter = ('action', 'to_status', 'actor_role')
+    search_fields = ('bom__style_code', 'actor', 'reason')
+    date_hierarchy = 'created_at'
+    list_select_related = ('bom',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    """通知管理界面"""
+    list_display = ('recipient', 'notification_type', 'title', 'bom', 'is_read', 'created_at')
+    list_filter = ('notification_type', 'is_read')
+    search_fields = ('recipient__username', 'title', 'bom__style_code')
+    date_hierarchy = 'created_at'
+    raw_id_fields = ('recipient', 'bom')
+    list_select_related = ('recipient',)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class BomsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'boms'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,377 @@
+"""
+BOM接口性能基准工具
+
+供 benchmark_list_queries、generate_bom_data、run_benchmarks、loadtest_workflow 等管理命令使用：
+批量生成测试BOM及其明细/尺码、通过 APIRequestFactory 直接调用视图计时，
+统计延迟百分位、吞吐量和SQL条数，并校验并发工作流压测后的数据不变量。
+"""
+import math
+import platform
+import random
+import time
+from decimal import Decimal
+
+import django
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
+
+from . import cache as bom_cache
+from . import units
+from .instrumentation import collect_metrics
+from .models import Bom, BomDetail, BomEvent, SizeMeasurement, SizeSpec, User
+
+BENCH_PREFIX = 'BENCH'
+
+# 列表接口过滤/排序用到的组合索引（见 0005_bom_list_indexes）
+LIST_INDEX_NAMES = (
+    'bom_main_status_created_idx',
+    'bom_main_cat_created_idx',
+    'bom_main_stat_cat_created_idx',
+    'bom_main_season_created_idx',
+    'bom_main_year_created_idx',
+)
+
+# PostgreSQL 上 SearchFilter 字段的 pg_trgm 索引
+TRIGRAM_INDEXES = (
+    ('bom_main_style_code_trgm', 'style_code'),
+    ('bom_main_product_name_trgm', 'product_name'),
+    ('bom_main_wave_trgm', 'wave'),
+)
+
+PRODUCT_WORDS = ('基础', '修身', '宽松', '印花', '条纹', '针织', '牛仔', '羊毛', '真丝', '棉麻')
+PRODUCT_TYPES = ('T恤', '衬衫', '卫衣', '长裤', '短裤', '半身裙', '连衣裙', '夹克', '大衣', '围巾')
+
+
+def get_bench_user():
+    user, _ = User.objects.get_or_create(
+        username='bench_user', defaults={'role': 'designer'}
+    )
+    return user
+
+
+def seed_boms(count, batch_size=5000, seed=42, log=None):
+    """
+    用 bulk_create 分批生成 count 个基准BOM（style_code 以 BENCH 开头）
+    已存在的基准BOM会被计入，只补齐差额
+    """
+    existing = Bom.objects.filter(style_code__startswith=BENCH_PREFIX).count()
+    if existing >= count:
+        return 0
+
+    rng = random.Random(seed + existing)
+    user = get_bench_user()
+    statuses = [code for code, _ in Bom.STATUS_CHOICES]
+    seasons = [code for code, _ in Bom.SEASON_CHOICES]
+    categories = [code for code, _ in Bom.CATEGORY_CHOICES]
+
+    created = 0
+    for start in range(existing, count, batch_size):
+        batch = []
+        for i in range(start, min(start + batch_size, count)):
+            batch.append(Bom(
+                style_code=f'{BENCH_PREFIX}{i:07d}',
+                product_name=f'{rng.choice(PRODUCT_WORDS)}{rng.choice(PRODUCT_TYPES)}{i % 1000:03d}',
+                season=rng.choice(seasons),
+                year=rng.randint(2020, 2026),
+                wave=f'第{rng.randint(1, 8)}波',
+                category=rng.choice(categories),
+                dev_colors='黑色/白色',
+                status=rng.choice(statuses),
+                created_by=user,
+            ))
+        Bom.objects.bulk_create(batch, batch_size=batch_size)
+        created += len(batch)
+        if log:
+            log(f'已生成 {start + len(batch)}/{count} 个BOM')
+    bom_cache.invalidate(everything=True)
+    analyze()
+    return created
+
+
+# 物料类型 -> (常用单位, 用量范围(千分位), 单价范围(万分位), 物料名称)
+MATERIAL_PROFILES = {
+    'FABRIC': ('M', (800, 3500), (150000, 850000), ('全棉府绸', '弹力牛仔', '真丝双绉', '羊毛呢', '涤纶雪纺')),
+    'LINING': ('M', (500, 2500), (60000, 200000), ('涤纶里布', '醋酸里布', '网眼里布')),
+    'INTERLINING': ('M', (100, 800), (30000, 120000), ('无纺衬', '有纺衬')),
+    'THREAD': ('ROLL', (1000, 3000), (20000, 80000), ('涤纶缝纫线', '锁边线')),
+    'BUTTON': ('PCS', (1000, 12000), (2000, 30000), ('树脂扣', '金属四合扣', '贝壳扣')),
+    'ZIPPER': ('PCS', (1000, 2000), (15000, 60000), ('隐形拉链', '金属拉链', '尼龙拉链')),
+    'LABEL': ('PCS', (1000, 3000), (1000, 8000), ('主唛', '洗水唛', '尺码唛')),
+    'TRIM': ('SET', (1000, 2000), (10000, 50000), ('吊牌', '包装袋')),
+    'ELASTIC': ('M', (200, 1500), (10000, 40000), ('松紧带',)),
+    'OTHER': ('PCS', (1000, 2000), (5000, 20000), ('其他辅料',)),
+}
+# 面料出现的概率远高于其他物料
+MATERIAL_WEIGHTS = {
+    'FABRIC': 6, 'LINING': 3, 'INTERLINING': 2, 'THREAD': 3, 'BUTTON': 3,
+    'ZIPPER': 2, 'LABEL': 3, 'TRIM': 2, 'ELASTIC': 1, 'OTHER': 1,
+}
+SUPPLIERS = ('华纺面料', '江南辅料', '广缘纺织', '申达纽扣', '永盛拉链', '恒丰线业')
+MEASUREMENT_BASE = {'胸围': 84, '肩宽': 38, '衣长': 62, '袖长': 57, '腰围': 66}
+MEASUREMENT_STEP = {'胸围': 4, '肩宽': 1.2, '衣长': 2, '袖长': 1.5, '腰围': 4}
+
+
+def seed_catalog(boms, details_per_bom=30, sizes_per_bom=8, batch_size=5000, seed=42, log=None):
+    """
+    生成完整的基准数据：boms 个BOM，平均每个 details_per_bom 条明细（在 0.5~1.5 倍之间随机）、
+    sizes_per_bom 个尺码，全部使用 bulk_create 分批写入，每批BOM一个事务并同时写回成本汇总。
+
+    可重复执行：只给还没有明细的基准BOM补数据；同一 seed 生成的数据完全相同。
+    返回 {'boms': 新BOM数, 'details': 新明细数, 'size_specs': 新尺码数}
+    """
+    created = {'boms': seed_boms(boms, batch_size=batch_size, seed=seed, log=log), 'details': 0, 'size_specs': 0}
+    sizes = [code for code, _ in SizeSpec.SIZE_CHOICES][:sizes_per_bom]
+    materials = list(MATERIAL_WEIGHTS)
+    weights = list(MATERIAL_WEIGHTS.values())
+    # 每批BOM的数量按明细数换算，使一批明细约为 batch_size 的若干倍
+    bom_batch = max(batch_size // max(details_per_bom, 1), 1) * 4
+
+    pending = (
+        Bom.objects.filter(style_code__startswith=BENCH_PREFIX, detail_count=0)
+        .order_by('style_code').values_list('style_code', flat=True)
+    )
+    last = ''
+    while True:
+        codes = list(pending.filter(style_code__gt=last)[:bom_batch])
+        if not codes:
+            break
+        last = codes[-1]
+        details, size_specs = [], []
+        for code in codes:
+            rng = random.Random(f'{seed}:{code}')
+            count = rng.randint(max(details_per_bom // 2, 1), max(details_per_bom * 3 // 2, 1)) if details_per_bom else 0
+            for sequence in range(1, count + 1):
+                material_type = rng.choices(materials, weights)[0]
+                unit, quantity, price, names = MATERIAL_PROFILES[material_type]
+                details.append(BomDetail(
+                    bom_id=code,
+                    sequence=sequence,
+                    material_type=material_type,
+                    material_name=rng.choice(names),
+                    material_code=f'{material_type[:3]}-{rng.randint(1, 9999):04d}',
+                    specification=f'{rng.randint(100, 300)}g/㎡ 门幅{rng.choice((140, 145, 150))}cm',
+                    supplier_name=rng.choice(SUPPLIERS),
+                    usage_quantity=Decimal(rng.randint(*quantity)) / 1000,
+                    usage_unit=unit,
+                    unit_price=Decimal(rng.randint(*price)) / 10000,
+                    color_requirement=rng.choice(('', '同大身', '黑色', '白色')),
+                ))
+            offset = rng.uniform(-2, 2)
+            for order, size in enumerate(sizes):
+                size_specs.append(SizeSpec(
+                    bom_id=code,
+                    size=size,
+                    sort_order=order,
+                    measurements={
+                        part: round(base + offset + MEASUREMENT_STEP[part] * order, 1)
+                        for part, base in MEASUREMENT_BASE.items()
+                    },
+                ))
+        units.apply(details)
+        with transaction.atomic():
+            BomDetail.objects.bulk_create(details, batch_size=batch_size)
+            SizeSpec.objects.bulk_create(size_specs, batch_size=batch_size)
+            Bom.refresh_cost_rollups(codes)
+            SizeMeasurement.rebuild(codes, batch_size=batch_size)
+        created['details'] += len(details)
+        created['size_specs'] += len(size_specs)
+        if log:
+            log(f"已生成明细 {created['details']} 条、尺码 {created['size_specs']} 条（至 {last}）")
+
+    bom_cache.invalidate(everything=True)
+    analyze()
+    return created
+
+
+def analyze():
+    """更新统计信息，让查询计划器看到新数据/新索引"""
+    with connection.cursor() as cursor:
+        for table in ('bom_main', 'bom_detail', 'bom_size_spec'):
+            cursor.execute(f'ANALYZE {table}')
+
+
+def set_list_indexes(enabled):
+    """创建或删除列表接口相关索引，用于对比有无索引时的延迟"""
+    indexes = [index for index in Bom._meta.indexes if index.name in LIST_INDEX_NAMES]
+    existing = _existing_index_names()
+    with connection.schema_editor() as editor:
+        for index in indexes:
+            if enabled and index.name not in existing:
+                editor.add_index(Bom, index)
+            elif not enabled and index.name in existing:
+                editor.remove_index(Bom, index)
+        if connection.vendor == 'postgresql':
+            for name, column in TRIGRAM_INDEXES:
+                if enabled:
+                    editor.execute(
+                        f'CREATE INDEX IF NOT EXISTS {name} ON bom_main '
+                        f'USING gin ((UPPER({column}::text)) gin_trgm_ops)'
+                    )
+                else:
+                    editor.execute(f'DROP INDEX IF EXISTS {name}')
+    analyze()
+
+
+def _existing_index_names():
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, Bom._meta.db_table)
+    return {name for name, info in constraints.items() if info.get('index')}
+
+
+def percentile(samples, pct):
+    """最近秩法计算百分位数"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(math.ceil(pct / 100.0 * len(ordered)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def time_view(view, path, params=None, repeat=20, warmup=2, **kwargs):
+    """
+    直接调用视图 repeat 次并返回每次耗时（毫秒）
+    kwargs 作为URL参数传给视图（如 style_code）
+    """
+    factory = APIRequestFactory(SERVER_NAME='localhost')
+    samples = []
+    for i in range(warmup + repeat):
+        request = factory.get(path, params or {})
+        started = time.perf_counter()
+        response = view(request, **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        elapsed = (time.perf_counter() - started) * 1000
+        if response.status_code >= 400:
+            raise RuntimeError(f'{path} {params} 返回 {response.status_code}')
+        if i >= warmup:
+            samples.append(elapsed)
+    return samples
+
+
+def summarize(samples):
+    return {
+        'p50_ms': round(percentile(samples, 50), 2),
+        'p95_ms': round(percentile(samples, 95), 2),
+        'runs': len(samples),
+    }
+
+
+def measure(call, repeat=20, warmup=2):
+    """
+    调用 call(i) repeat 次（另有 warmup 次预热不计入），返回延迟百分位、
+    顺序执行的吞吐量（次/秒）和每次请求的SQL条数
+    call 返回响应对象，流式响应会被完整读取后才停止计时
+    """
+    samples = []
+    queries = []
+    for i in range(warmup + repeat):
+        with collect_metrics() as metrics:
+            started = time.perf_counter()
+            response = call(i)
+            if hasattr(response, 'render'):
+                response.render()
+            if getattr(response, 'streaming', False):
+                for _ in response.streaming_content:
+                    pass
+            elapsed = time.perf_counter() - started
+        if response.status_code >= 400:
+            raise RuntimeError(f'第 {i} 次调用返回 {response.status_code}')
+        if i >= warmup:
+            samples.append(elapsed * 1000)
+            queries.append(metrics.query_count)
+    total_seconds = sum(samples) / 1000
+    return {
+        **summarize(samples),
+        'p99_ms': round(percentile(samples, 99), 2),
+        'mean_ms': round(sum(samples) / len(samples), 2) if samples else 0.0,
+        'throughput_rps': round(len(samples) / total_seconds, 1) if total_seconds else 0.0,
+        'queries': max(queries) if queries else 0,
+    }
+
+
+def environment():
+    """基准结果附带的环境信息，不同数据库/版本的结果据此区分"""
+    if connection.vendor == 'postgresql':
+        version = str(connection.pg_version)
+    elif connection.vendor == 'sqlite':
+        version = connection.Database.sqlite_version
+    else:
+        version = ''
+    return {
+        'database': connection.vendor,
+        'database_version': version,
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'timestamp': timezone.now().isoformat(),
+        'rows': {
+            'boms': Bom.objects.count(),
+            'details': BomDetail.objects.count(),
+            'size_specs': SizeSpec.objects.count(),
+        },
+    }
+
+
+def workflow_snapshot(style_codes):
+    """
+    压测前的工作流快照：{style_code: (status, version)} 和当前最大事件ID，
+    供 check_workflow_invariants 只检查压测期间新增的事件
+    """
+    states = {
+        code: (status, version) for code, status, version in
+        Bom.objects.filter(pk__in=style_codes).values_list('style_code', 'status', 'version')
+    }
+    last_event = BomEvent.objects.order_by('-id').values_list('id', flat=True).first() or 0
+    return states, last_event
+
+
+def check_workflow_invariants(snapshot, successes):
+    """
+    校验并发工作流操作后的不变量，返回违反项描述列表（为空表示全部满足）
+
+    - snapshot: workflow_snapshot() 的返回值
+    - successes: 成功响应的 [(style_code, 响应中的 version)]
+
+    对每个BOM：
+    - 事件按ID首尾相接：第一条的原状态为压测前状态，每条的原状态等于上一条的新状态，最后一条的新状态为当前状态
+    - 没有原状态与新状态相同的事件（如重复批准）
+    - 版本号增量 = 新增事件数 = 成功响应数，且成功响应的版本号各不相同（没有丢失更新，版本单调递增）
+    """
+    states, last_event = snapshot
+    final = {
+        code: (status, version) for code, status, version in
+        Bom.objects.filter(pk__in=list(states)).values_list('style_code', 'status', 'version')
+    }
+    events = {code: [] for code in states}
+    for code, from_status, to_status in (
+        BomEvent.objects.filter(bom_id__in=list(states), id__gt=last_event)
+        .order_by('id').values_list('bom_id', 'from_status', 'to_status')
+    ):
+        events[code].append((from_status, to_status))
+    versions = {code: [] for code in states}
+    for code, version in successes:
+        versions[code].append(version)
+
+    violations = []
+    for code, (status, version) in states.items():
+        if code not in final:
+            violations.append(f'{code}: BOM已不存在')
+            continue
+        final_status, final_version = final[code]
+        current = status
+        for from_status, to_status in events[code]:
+            if from_status != current:
+                violations.append(f'{code}: 事件链断裂，{current} 之后出现 {from_status} -> {to_status}')
+            if from_status == to_status:
+                violations.append(f'{code}: 重复转换 {from_status} -> {to_status}')
+            current = to_status
+        if current != final_status:
+            violations.append(f'{code}: 当前状态 {final_status} 与事件链终点 {current} 不一致')
+        bumps = final_version - version
+        if bumps != len(events[code]):
+            violations.append(f'{code}: 版本号增加 {bumps}，但新增事件 {len(events[code])} 条')
+        if len(versions[code]) != len(events[code]):
+            violations.append(f'{code}: 成功响应 {len(versions[code])} 次，但新增事件 {len(events[code])} 条')
+        if sorted(versions[code]) != list(range(version + 1, version + 1 + len(versions[code]))):
+            violations.append(f'{code}: 成功响应的版本号不连续或重复 {sorted(versions[code])}')
+    return violations
@@ -0,0 +1,148 @@
+"""
+BOM读缓存（版本号失效）
+
+缓存键包含"代数"(generation)，写入时只递增代数，旧键自然失效、按超时淘汰，
+不需要扫描或删除任何缓存键：
+
+- 列表代数 boms:gen:list —— 任意 Bom/BomDetail/SizeSpec 写入或工作流转换都会递增，
+  列表页键 = 列表代数 + 规范化后的查询参数
+- 单个BOM代数 boms:gen:bom:<款式> —— 该BOM及其明细、尺码写入时递增，
+  文档键 = 全局纪元 + 该BOM代数
+- 全局纪元 boms:gen:epoch —— 导入、重建汇总等不触发信号的批量写入后递增
+
+写入时立即递增一次，并在事务提交后再递增一次，避免并发读在提交前把旧数据写回新键。
+只依赖 Django 缓存框架的 get/set/add/incr，locmem、文件缓存、Redis/Memcached 均可使用。
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+LIST_GENERATION = 'boms:gen:list'
+EPOCH = 'boms:gen:epoch'
+STATS_KEYS = {'hit': 'boms:stats:hit', 'miss': 'boms:stats:miss'}
+
+# 列表缓存键忽略的参数（与返回内容无关）
+IGNORED_PARAMS = ('format',)
+
+
+def get_cache():
+    return caches[getattr(settings, 'BOM_CACHE_ALIAS', 'default')]
+
+
+def is_enabled():
+    return get_timeout() != 0
+
+
+def get_timeout():
+    return getattr(settings, 'BOM_CACHE_TIMEOUT', 300)
+
+
+def _digest(value):
+    return hashlib.sha1(value.encode('utf-8')).hexdigest()
+
+
+def _bom_generation_key(style_code):
+    return f'boms:gen:bom:{_digest(style_code)}'
+
+
+def _generation(cache, key):
+    """读取代数，不存在时以当前纳秒时间初始化（避免淘汰后重置为旧值与残留键冲突）"""
+    value = cache.get(key)
+    if value is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        value = cache.get(key)
+    return value
+
+
+def _bump(cache, key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), timeout=None)
+
+
+def _bump_now(style_codes, everything):
+    cache = get_cache()
+    _bump(cache, LIST_GENERATION)
+    if everything:
+        _bump(cache, EPOCH)
+    for style_code in style_codes:
+        _bump(cache, _bom_generation_key(style_code))
+
+
+def invalidate(style_codes=(), everything=False):
+    """
+    使列表缓存和指定BOM的文档缓存失效；everything=True 时同时使全部文档缓存失效
+    立即生效，并在当前事务提交后再执行一次
+    """
+    if not is_enabled():
+        return
+    style_codes = [code for code in dict.fromkeys(style_codes) if code]
+    _bump_now(style_codes, everything)
+    transaction.on_commit(lambda: _bump_now(style_codes, everything))
+
+
+def list_key(request, prefix='list'):
+    """
+    列表页缓存键：列表代数 + 规范化的查询参数（排序后去掉空值和无关参数）
+    next/previous 为绝对链接，主机名也计入键中
+    """
+    params = sorted(
+        (name, value)
+        for name, values in request.query_params.lists()
+        if name not in IGNORED_PARAMS
+        for value in values
+        if value != ''
+    )
+    normalized = '&'.join(f'{name}={value}' for name, value in params)
+    generation = _generation(get_cache(), LIST_GENERATION)
+    return f'boms:{prefix}:{generation}:{_digest(request.get_host() + "?" + normalized)}'
+
+
+def document_key(style_code):
+    cache = get_cache()
+    epoch = _generation(cache, EPOCH)
+    generation = _generation(cache, _bom_generation_key(style_code))
+    return f'boms:doc:{epoch}:{generation}:{_digest(style_code)}'
+
+
+def lookup(key):
+    """读取缓存并记录命中/未命中"""
+    cache = get_cache()
+    value = cache.get(key)
+    _record(cache, 'hit' if value is not None else 'miss')
+    return value
+
+
+def store(key, value):
+    get_cache().set(key, value, timeout=get_timeout())
+
+
+def _record(cache, outcome):
+    key = STATS_KEYS[outcome]
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def stats():
+    cache = get_cache()
+    hits = cache.get(STATS_KEYS['hit']) or 0
+    misses = cache.get(STATS_KEYS['miss']) or 0
+    total = hits + misses
+    return {
+        'enabled': is_enabled(),
+        'backend': settings.CACHES[getattr(settings, 'BOM_CACHE_ALIAS', 'default')]['BACKEND'],
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 4) if total else 0.0,
+    }
+
+
+def reset_stats():
+    get_cache().delete_many(list(STATS_KEYS.values()))
@@ -0,0 +1,88 @@
+"""
+BOM接口的条件请求（ETag / Last-Modified）
+
+- 详情：由 version、updated_at 和最近一次明细修改时间生成校验值，一条查询完成，
+  未变化时直接返回 304，不做序列化也不读取明细
+- 写入：PATCH/PUT 携带 If-Match 时在行锁内比对校验值，不一致返回 412
+- 列表：由取出的当前页各行的 (style_code, updated_at) 连同查询参数生成校验值，
+  不对整个过滤结果做 COUNT/MAX 聚合（游标分页本身也不需要 COUNT）
+
+明细增删改会通过成本汇总刷新 Bom.updated_at，因此列表校验值只需看BOM主表。
+"""
+import hashlib
+
+from django.db.models import Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .models import Bom
+
+
+def make_etag(*parts):
+    digest = hashlib.sha1('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+    return quote_etag(digest[:32])
+
+
+def bom_validators(style_code, lock=False):
+    """
+    返回 (etag, last_modified)；BOM不存在时返回 (None, None)
+    lock=True 时对BOM行加锁（需在事务中调用），用于 If-Match 写入
+    """
+    queryset = Bom.objects.filter(pk=style_code)
+    if lock:
+        # select_for_update 不能与聚合一起使用，先锁行再单独取明细时间
+        row = queryset.select_for_update().values('version', 'updated_at').first()
+        if row is not None:
+            row['details_updated'] = (
+                Bom.objects.filter(pk=style_code)
+                .aggregate(value=Max('details__updated_at'))['value']
+            )
+    else:
+        row = (
+            queryset.annotate(details_updated=Max('details__updated_at'))
+            .values('version', 'updated_at', 'details_updated')
+            .first()
+        )
+    if row is None:
+        return None, None
+    last_modified = max(filter(None, (row['updated_at'], row['details_updated'])))
+    etag = make_etag(style_code, row['version'], row['updated_at'].isoformat(),
+                     row['details_updated'].isoformat() if row['details_updated'] else '')
+    return etag, last_modified
+
+
+def page_validators(rows, request):
+    """
+    当前页的校验值：查询参数 + 页内各行的主键和 updated_at
+    页内有行新增、删除、修改或顺序变化时 ETag 都会改变；下一页游标由页内行决定，也随之改变
+    rows 可以是 values() 字典或模型实例
+    """
+    keys = []
+    last_modified = None
+    for row in rows:
+        if isinstance(row, dict):
+            style_code, updated_at = row['style_code'], row['updated_at']
+        else:
+            style_code, updated_at = row.style_code, row.updated_at
+        keys.append(f'{style_code}@{updated_at.isoformat()}')
+        if last_modified is None or updated_at > last_modified:
+            last_modified = updated_at
+    etag = make_etag(request.get_full_path(), *keys)
+    return etag, last_modified
+
+
+def conditional_response(request, etag, last_modified):
+    """按请求头判断是否可以直接返回 304/412，否则返回 None"""
+    return get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(last_modified.timestamp()) if last_modified else None,
+    )
+
+
+def set_validators(response, etag, last_modified):
+    if etag:
+        response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
@@ -0,0 +1,185 @@
+"""
+尺码推档（放码）
+
+给定基础码（默认 M）的各部位尺寸和每档的放码量，一次向量化计算出全部尺码：
+
+    尺寸[款式, 尺码, 部位] = 基础尺寸[款式, 部位] + (尺码序号 - 基础码序号) × 档差[款式, 部位]
+
+尺码序号按 SizeSpec.SIZE_CHOICES 的顺序（XXS=0 … XXXL=7），档差按品类模板取值，
+可按部位覆盖；模板中没有的部位档差为 0（各码相同）。结果保留 1 位小数（毫米），
+整数值存为整数，与手工录入的格式一致。非数字的尺寸（如“见附图”）不参与推档，
+其他尺码不生成该部位；基础码本身按原样保留，不做舍入。
+
+批量推档时先用一条查询取出全部基础码，再把所有款式拼成一个
+(款式数, 尺码数, 部位数) 的 NumPy 数组一次算完，最后用一条
+INSERT ... ON CONFLICT (bom_id, size) DO UPDATE 批量写回 SizeSpec。
+"""
+import numpy as np
+from django.db import transaction
+
+from . import cache as bom_cache
+from .models import Bom, SizeMeasurement, SizeSpec, measurement_value
+
+SIZES = [code for code, _ in SizeSpec.SIZE_CHOICES]
+SIZE_INDEX = {size: index for index, size in enumerate(SIZES)}
+DEFAULT_BASE_SIZE = 'M'
+BATCH_SIZE = 1000
+
+# 品类 -> {部位: 每档放码量(cm)}
+GRADE_TEMPLATES = {
+    'TOP': {'胸围': 4, '腰围': 4, '下摆': 4, '肩宽': 1.2, '衣长': 2, '袖长': 1.5, '袖口': 0.5, '领围': 1},
+    'BOTTOM': {'腰围': 4, '臀围': 4, '大腿围': 2.4, '裤长': 2, '裙长': 2, '前裆': 0.8, '后裆': 1, '脚口': 1},
+    'DRESS': {'胸围': 4, '腰围': 4, '臀围': 4, '肩宽': 1.2, '衣长': 2, '裙长': 2, '袖长': 1.5},
+    'OUTERWEAR': {'胸围': 4, '腰围': 4, '下摆': 4, '肩宽': 1.2, '衣长': 2, '袖长': 1.5, '袖口': 1, '领围': 1},
+    'ACCESSORY': {'长度': 1, '宽度': 0.5, '围度': 2},
+}
+
+
+class GradingError(ValueError):
+    """推档参数或基础码数据无效"""
+
+
+def template_for(category, overrides=None):
+    """品类模板叠加按部位覆盖的档差"""
+    increments = dict(GRADE_TEMPLATES.get(category, {}))
+    for part, value in (overrides or {}).items():
+        try:
+            increments[part] = float(value)
+        except (TypeError, ValueError):
+            raise GradingError(f'部位 {part} 的档差 {value!r} 不是数字')
+    return increments
+
+
+def _check_sizes(base_size, sizes):
+    if base_size not in SIZE_INDEX:
+        raise GradingError(f"基础码 {base_size} 无效，可选: {', '.join(SIZES)}")
+    sizes = list(sizes) if sizes else SIZES
+    unknown = [size for size in sizes if size not in SIZE_INDEX]
+    if unknown:
+        raise GradingError(f"未知尺码: {', '.join(unknown)}")
+    return sorted(set(sizes), key=SIZE_INDEX.get)
+
+
+def grade(bases, base_size=DEFAULT_BASE_SIZE, sizes=None, overrides=None):
+    """
+    批量推档（纯计算，不访问数据库）
+
+    - bases: {style_code: (品类, 基础码尺寸 {部位: 数值})}
+    - sizes: 要生成的尺码，缺省为全部 8 个
+    - overrides: {部位: 档差}，覆盖所有款式的品类模板
+    返回 {style_code: [(尺码, 排序号, {部位: 数值}), ...]}，按尺码顺序排列；
+    基础码一行是传入的基础码尺寸本身（含非数字部位）
+    """
+    sizes = _check_sizes(base_size, sizes)
+    codes = list(bases)
+    parts = list(dict.fromkeys(
+        part for _, measurements in bases.values()
+        for part, value in measurements.items() if measurement_value(value) is not None
+    ))
+    if not codes or not parts:
+        return {code: [] for code in codes}
+    part_index = {part: index for index, part in enumerate(parts)}
+
+    base = np.full((len(codes), len(parts)), np.nan)
+    step = np.zeros((len(codes), len(parts)))
+    templates = {}
+    for row, code in enumerate(codes):
+        category, measurements = bases[code]
+        if category not in templates:
+            templates[category] = template_for(category, overrides)
+        increments = templates[category]
+        for part, value in measurements.items():
+            number = measurement_value(value)
+            if number is None:
+                continue
+            base[row, part_index[part]] = number
+            step[row, part_index[part]] = increments.get(part, 0)
+
+    offsets = np.array([SIZE_INDEX[size] for size in sizes]) - SIZE_INDEX[base_size]
+    # (款式, 1, 部位) + (1, 尺码, 1) × (款式, 1, 部位) -> (款式, 尺码, 部位)
+    graded = base[:, None, :] + offsets[None, :, None] * step[:, None, :]
+    graded = np.maximum(np.round(graded, 1), 0)
+
+    result = {}
+    for code, matrix in zip(codes, graded.tolist()):
+        result[code] = [
+            (size, SIZE_INDEX[size], dict(bases[code][1]) if size == base_size else {
+                part: int(value) if value.is_integer() else value
+                for part, value in zip(parts, values) if value == value  # 跳过该款式没有的部位(NaN)
+            })
+            for size, values in zip(sizes, matrix)
+        ]
+    return result
+
+
+def save(graded):
+    """
+    把推档结果批量写回 SizeSpec：已存在的 (BOM, 尺码) 更新尺寸和排序号并重新启用，不存在的新建
+    bulk_create 不触发信号，写入后重建这些BOM的部位尺寸索引并使缓存失效。返回写入的行数
+    """
+    specs = [
+        SizeSpec(bom_id=code, size=size, sort_order=sort_order, measurements=measurements, is_active=True)
+        for code, rows in graded.items()
+        for size, sort_order, measurements in rows
+    ]
+    with transaction.atomic():
+        SizeSpec.objects.bulk_create(
+            specs,
+            batch_size=BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['bom', 'size'],
+            update_fields=['measurements', 'sort_order', 'is_active', 'updated_at'],
+        )
+        SizeMeasurement.rebuild(graded)
+        bom_cache.invalidate(graded)
+    return len(specs)
+
+
+def load_bases(boms, base_size=DEFAULT_BASE_SIZE):
+    """
+    一条查询取出一批BOM的基础码尺寸
+    返回 ({style_code: (品类, 尺寸)}, 没有基础码尺寸的款式编码列表)
+    """
+    boms = boms.order_by().values('style_code')
+    rows = (
+        SizeSpec.objects.filter(bom_id__in=boms, size=base_size)
+        .values_list('bom_id', 'bom__category', 'measurements')
+    )
+    bases = {code: (category, measurements) for code, category, measurements in rows if measurements}
+    missing = sorted(set(boms.values_list('style_code', flat=True)) - set(bases))
+    return bases, missing
+
+
+def grade_bom(bom, measurements=None, base_size=DEFAULT_BASE_SIZE, sizes=None, overrides=None):
+    """
+    单个BOM推档并写回；measurements 缺省时读取该BOM现有的基础码尺寸
+    返回推档结果 [(尺码, 排序号, 尺寸), ...]
+    """
+    if measurements is None:
+        measurements = (
+            SizeSpec.objects.filter(bom=bom, size=base_size)
+            .values_list('measurements', flat=True).first()
+        )
+    if not measurements:
+        raise GradingError(f'{bom.style_code} 没有 {base_size} 码尺寸，请先录入基础码或在请求中提供 measurements')
+    if not isinstance(measurements, dict):
+        raise GradingError('measurements 必须是 {部位: 尺寸} 对象')
+    graded = grade({bom.style_code: (bom.category, measurements)}, base_size, sizes, overrides)
+    save(graded)
+    return graded[bom.style_code]
+
+
+def grade_wave(wave, season=None, year=None, base_size=DEFAULT_BASE_SIZE, sizes=None, overrides=None):
+    """
+    按波段（可再按季节、年份限定）批量重新推档
+    返回 {'boms': 推档的款式数, 'size_specs': 写入行数, 'skipped': 缺少基础码尺寸的款式编码}
+    """
+    boms = Bom.objects.filter(wave=wave)
+    if season:
+        boms = boms.filter(season=season)
+    if year:
+        boms = boms.filter(year=year)
+    bases, skipped = load_bases(boms, base_size)
+    graded = grade(bases, base_size, sizes, overrides)
+    written = save(graded) if graded else 0
+    return {'boms': len(graded), 'size_specs': written, 'skipped': skipped}
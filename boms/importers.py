@@ -0,0 +1,433 @@
+"""
+BOM批量导入
+
+从Excel工作簿（BOM / 明细 / 尺码 三个工作表）或CSV文件导入BOM主表、物料明细
+和尺码规格。数据按 chunk_size 分块读取，每块先用 pandas 做向量化校验，再在
+独立事务中 bulk_create 写入；校验失败的行记录行号和原因后跳过，不影响其他行。
+"""
+import pandas as pd
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+
+from . import cache as bom_cache
+from . import units
+from .models import Bom, BomDetail, SizeMeasurement, SizeSpec
+
+
+# 工作表名称（英文或中文均可）
+SHEET_NAMES = {
+    'boms': ('boms', 'bom', 'BOM', 'BOM主表'),
+    'details': ('details', 'BOM明细', '明细', '物料明细'),
+    'size_specs': ('size_specs', '尺码规格', '尺码'),
+}
+IMPORT_ORDER = ('boms', 'details', 'size_specs')
+
+BOM_FIELDS = (
+    'style_code', 'product_name', 'season', 'year', 'wave', 'category', 'dev_colors',
+    'target_price', 'estimated_cost', 'fabric_composition', 'fabric_weight',
+    'care_instructions', 'status', 'notes',
+)
+DETAIL_FIELDS = (
+    'style_code', 'sequence', 'material_type', 'material_name', 'material_code',
+    'specification', 'supplier_name', 'supplier_code', 'usage_quantity', 'usage_unit',
+    'unit_price', 'color_requirement', 'craft_requirement', 'notes',
+)
+SIZE_SPEC_FIELDS = ('style_code', 'size', 'sort_order', 'is_active')
+
+TRUE_VALUES = {'', '1', 'true', 'yes', 'y', '是'}
+FALSE_VALUES = {'0', 'false', 'no', 'n', '否'}
+
+
+def _header_aliases(model, fields):
+    """表头别名：字段名和 verbose_name 都可以作为列名，关联BOM的列统一为 style_code"""
+    aliases = {'style_code': 'style_code', '款式编码': 'style_code', '所属BOM': 'style_code'}
+    for name in fields:
+        if name == 'style_code':
+            continue
+        aliases[name] = name
+        aliases[str(model._meta.get_field(name).verbose_name)] = name
+    return aliases
+
+
+HEADER_ALIASES = {
+    'boms': _header_aliases(Bom, BOM_FIELDS),
+    'details': _header_aliases(BomDetail, DETAIL_FIELDS),
+    'size_specs': _header_aliases(SizeSpec, SIZE_SPEC_FIELDS),
+}
+
+
+def _choice_map(choices):
+    """选项取值映射：编码和中文显示名都映射到编码"""
+    mapping = {}
+    for code, label in choices:
+        mapping[code] = code
+        mapping[code.lower()] = code
+        mapping[label] = code
+    return mapping
+
+
+def _cell_to_str(value):
+    """把 openpyxl 读出的单元格统一成字符串，整数值的浮点数去掉 .0"""
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+class ImportResult:
+    """导入结果：各类数据的新增数量和逐行错误"""
+
+    def __init__(self, max_errors=1000):
+        self.max_errors = max_errors
+        self.created = {kind: 0 for kind in IMPORT_ORDER}
+        self.errors = []
+        self.error_count = 0
+
+    def add_error(self, sheet, row, message):
+        self.error_count += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'sheet': sheet, 'row': int(row), 'message': message})
+
+    @property
+    def success(self):
+        return self.error_count == 0
+
+    def as_dict(self):
+        return {
+            'success': self.success,
+            'created': dict(self.created),
+            'error_count': self.error_count,
+            'errors': list(self.errors),
+        }
+
+
+class BomImporter:
+    """
+    BOM批量导入器
+
+    用法：
+        importer = BomImporter(user)
+        result = importer.import_workbook(fileobj)
+        result = importer.import_csv(boms=f1, details=f2, size_specs=f3)
+    """
+
+    def __init__(self, user, chunk_size=5000, max_errors=1000):
+        self.user = user
+        self.chunk_size = chunk_size
+        self.result = ImportResult(max_errors=max_errors)
+        # 已确认存在（库中已有或本次导入）的BOM，以及本次导入中已出现的唯一键
+        self._known_boms = set()
+        self._seen_boms = set()
+        self._new_boms = set()
+        self._seen_details = set()
+        self._seen_sizes = set()
+
+    # ---- 读取 ----
+
+    def import_workbook(self, fileobj):
+        """导入 .xlsx 工作簿（只读模式逐行读取，内存占用与分块大小相关）"""
+        from zipfile import BadZipFile
+        from openpyxl import load_workbook
+        from openpyxl.utils.exceptions import InvalidFileException
+
+        try:
+            workbook = load_workbook(fileobj, read_only=True, data_only=True)
+        except (BadZipFile, InvalidFileException) as e:
+            # 非 xlsx 或已损坏的文件，由调用方按读取失败处理
+            raise ValueError(f'不是有效的 xlsx 工作簿（{e}）') from e
+        try:
+            sheets = {name.strip(): workbook[name] for name in workbook.sheetnames}
+            for kind in IMPORT_ORDER:
+                sheet = next(
+                    (sheets[name] for name in SHEET_NAMES[kind] if name in sheets), None
+                )
+                if sheet is not None:
+                    self._import_chunks(kind, self._iter_sheet_chunks(sheet))
+        finally:
+            workbook.close()
+        return self.result
+
+    def import_csv(self, boms=None, details=None, size_specs=None):
+        """导入CSV文件（每类数据一个文件，UTF-8编码，首行为表头）"""
+        sources = {'boms': boms, 'details': details, 'size_specs': size_specs}
+        for kind in IMPORT_ORDER:
+            if sources[kind] is not None:
+                self._import_chunks(kind, self._iter_csv_chunks(sources[kind]))
+        return self.result
+
+    def _iter_sheet_chunks(self, sheet):
+        rows = sheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [_cell_to_str(value) for value in header]
+        buffer, index = [], []
+        for row_number, values in enumerate(rows, start=2):
+            cells = [_cell_to_str(value) for value in values]
+            if not any(cells):
+                continue
+            cells = (cells + [''] * len(columns))[:len(columns)]
+            buffer.append(cells)
+            index.append(row_number)
+            if len(buffer) >= self.chunk_size:
+                yield pd.DataFrame(buffer, columns=columns, index=index)
+                buffer, index = [], []
+        if buffer:
+            yield pd.DataFrame(buffer, columns=columns, index=index)
+
+    def _iter_csv_chunks(self, source):
+        reader = pd.read_csv(
+            source, dtype=str, keep_default_na=False, chunksize=self.chunk_size,
+            encoding='utf-8-sig', skipinitialspace=True
+        )
+        for frame in reader:
+            # 表头占第1行，数据行号从2开始
+            frame.index = frame.index + 2
+            yield frame.apply(lambda column: column.str.strip())
+
+    # ---- 分块处理 ----
+
+    def _import_chunks(self, kind, chunks):
+        prepare = getattr(self, f'_prepare_{kind}')
+        for frame in chunks:
+            frame = self._normalize_columns(kind, frame)
+            errors = {}
+            rows = prepare(frame, errors)
+            for row_number in sorted(errors):
+                self.result.add_error(kind, row_number, '；'.join(errors[row_number]))
+            if rows:
+                self._insert(kind, rows)
+
+    def _normalize_columns(self, kind, frame):
+        aliases = HEADER_ALIASES[kind]
+        frame = frame.rename(columns=lambda name: aliases.get(str(name).strip(), str(name).strip()))
+        # 去掉空表头列，重复列只保留第一列
+        keep = (frame.columns != '') & ~frame.columns.duplicated()
+        return frame.loc[:, keep]
+
+    def _insert(self, kind, rows):
+        """整块在一个事务中 bulk_create；若因并发写入冲突失败，则逐行插入定位出错行"""
+        model = {'boms': Bom, 'details': BomDetail, 'size_specs': SizeSpec}[kind]
+        objects = [obj for _, obj in rows]
+        if kind == 'details':
+            # bulk_create 不触发 pre_save，先换算基础单位用量
+            units.apply(objects)
+        try:
+            with transaction.atomic():
+                model.objects.bulk_create(objects, batch_size=1000)
+                if kind == 'details':
+                    # bulk_create 不触发信号，在同一事务中重算这些BOM的成本汇总
+                    Bom.refresh_cost_rollups({obj.bom_id for obj in objects})
+                elif kind == 'size_specs':
+                    SizeMeasurement.rebuild({obj.bom_id for obj in objects})
+            self.result.created[kind] += len(objects)
+            created = objects
+        except IntegrityError:
+            created = []
+            for row_number, obj in rows:
+                if kind != 'boms':
+                    obj.pk = None
+                obj._state.adding = True
+                try:
+                    with transaction.atomic():
+                        obj.save(force_insert=True)
+                    self.result.created[kind] += 1
+                    created.append(obj)
+                except IntegrityError as exc:
+                    self.result.add_error(kind, row_number, f'写入失败: {exc}')
+        if created:
+            # bulk_create 不触发信号，整体递增缓存纪元（一次操作，不逐个BOM失效）
+            bom_cache.invalidate(everything=True)
+        if kind == 'boms':
+            self._new_boms.update(obj.style_code for obj in created)
+            self._known_boms.update(self._new_boms)
+
+    # ---- 向量化校验 ----
+
+    def _column(self, frame, name):
+        if name in frame.columns:
+            return frame[name].astype(str).str.strip()
+        return pd.Series('', index=frame.index, dtype=object)
+
+    def _label(self, model, name):
+        if name == 'style_code':
+            return '款式编码'
+        return model._meta.get_field(name).verbose_name
+
+    def _flag(self, errors, mask, message):
+        for row_number in mask[mask].index:
+            errors.setdefault(row_number, []).append(message)
+
+    def _require(self, frame, errors, fields, model):
+        for name in fields:
+            mask = self._column(frame, name) == ''
+            self._flag(errors, mask, f'{self._label(model, name)}不能为空')
+
+    def _check_lengths(self, frame, errors, fields, model):
+        for name in fields:
+            field = model._meta.get_field(name)
+            if field.max_length:
+                mask = self._column(frame, name).str.len() > field.max_length
+                self._flag(errors, mask, f'{field.verbose_name}不能超过{field.max_length}个字符')
+
+    def _choice(self, frame, errors, name, model, default=None):
+        field = model._meta.get_field(name)
+        values = self._column(frame, name)
+        if default is not None:
+            values = values.mask(values == '', default)
+        mapped = values.map(_choice_map(field.choices))
+        self._flag(errors, (values != '') & mapped.isna(), f'{field.verbose_name}取值无效')
+        return mapped
+
+    def _decimal(self, frame, errors, name, model):
+        field = model._meta.get_field(name)
+        values = self._column(frame, name)
+        integer_digits = field.max_digits - field.decimal_places
+        pattern = rf'\d{{1,{integer_digits}}}(\.\d{{1,{field.decimal_places}}})?'
+        mask = ~values.str.fullmatch(pattern) & (values != '')
+        self._flag(
+            errors, mask,
+            f'{field.verbose_name}必须为非负数，最多{integer_digits}位整数、{field.decimal_places}位小数'
+        )
+        return values
+
+    def _integer(self, frame, errors, name, model, minimum=0, maximum=2147483647):
+        field = model._meta.get_field(name)
+        values = self._column(frame, name)
+        numbers = pd.to_numeric(values.where(values.str.fullmatch(r'\d+'), None), errors='coerce')
+        mask = (values != '') & (numbers.isna() | (numbers < minimum) | (numbers > maximum))
+        self._flag(errors, mask, f'{field.verbose_name}必须为{minimum}到{maximum}之间的整数')
+        return numbers
+
+    def _duplicates(self, errors, keys, seen, message):
+        """文件内重复（含之前的分块）的唯一键"""
+        duplicated = keys.duplicated(keep='first') | keys.isin(seen)
+        self._flag(errors, duplicated & (keys != ''), message)
+
+    def _resolve_boms(self, frame, errors, codes):
+        """校验关联的BOM是否存在（本次导入或库中已有），每块最多一次查询"""
+        unknown = set(codes.unique()) - self._known_boms - {''}
+        if unknown:
+            self._known_boms.update(
+                Bom.objects.filter(style_code__in=unknown).values_list('style_code', flat=True)
+            )
+        self._flag(errors, (codes != '') & ~codes.isin(self._known_boms), '所属BOM不存在')
+
+    def _records(self, columns, errors):
+        """把已转换的列组装成逐行字典，跳过有错误的行"""
+        table = pd.DataFrame(columns)
+        table = table.loc[~table.index.isin(list(errors))]
+        return zip(table.index, table.to_dict('records'))
+
+    def _prepare_boms(self, frame, errors):
+        columns = {name: self._column(frame, name) for name in BOM_FIELDS}
+        codes = columns['style_code']
+        self._require(frame, errors, ('style_code', 'product_name', 'season', 'year',
+                                      'wave', 'category', 'dev_colors'), Bom)
+        self._check_lengths(frame, errors, BOM_FIELDS, Bom)
+        self._flag(errors, (codes != '') & (codes.str.len() < 5), '款式编码至少5个字符')
+        columns['season'] = self._choice(frame, errors, 'season', Bom)
+        columns['category'] = self._choice(frame, errors, 'category', Bom)
+        columns['status'] = self._choice(frame, errors, 'status', Bom, default='DRAFT')
+        columns['year'] = self._integer(frame, errors, 'year', Bom, minimum=1900, maximum=2100)
+        self._decimal(frame, errors, 'target_price', Bom)
+        self._decimal(frame, errors, 'estimated_cost', Bom)
+
+        self._duplicates(errors, codes, self._seen_boms, '款式编码在文件中重复')
+        existing = set(
+            Bom.objects.filter(style_code__in=set(codes) - {''}).values_list('style_code', flat=True)
+        )
+        self._flag(errors, codes.isin(existing), '款式编码已存在')
+        self._seen_boms.update(codes)
+
+        rows = []
+        for row_number, record in self._records(columns, errors):
+            record['year'] = int(record['year'])
+            for name in ('target_price', 'estimated_cost'):
+                record[name] = Decimal(record[name]) if record[name] else None
+            rows.append((row_number, Bom(created_by=self.user, **record)))
+        return rows
+
+    def _prepare_details(self, frame, errors):
+        columns = {name: self._column(frame, name) for name in DETAIL_FIELDS}
+        codes = columns['style_code']
+        self._require(frame, errors, ('style_code', 'sequence', 'material_type', 'material_name',
+                                      'specification', 'usage_quantity', 'usage_unit',
+                                      'unit_price'), BomDetail)
+        self._check_lengths(frame, errors, DETAIL_FIELDS[1:], BomDetail)
+        self._resolve_boms(frame, errors, codes)
+        columns['sequence'] = self._integer(frame, errors, 'sequence', BomDetail, minimum=1)
+        columns['material_type'] = self._choice(frame, errors, 'material_type', BomDetail)
+        columns['usage_unit'] = self._choice(frame, errors, 'usage_unit', BomDetail)
+        self._decimal(frame, errors, 'usage_quantity', BomDetail)
+        self._decimal(frame, errors, 'unit_price', BomDetail)
+
+        keys = codes + '#' + self._column(frame, 'sequence')
+        self._duplicates(errors, keys, self._seen_details, '同一BOM的明细序号在文件中重复')
+        existing = {
+            f'{code}#{sequence}' for code, sequence in BomDetail.objects.filter(
+                bom_id__in=set(codes) - self._new_boms - {''}
+            ).values_list('bom_id', 'sequence')
+        }
+        self._flag(errors, keys.isin(existing), '同一BOM的明细序号已存在')
+        self._seen_details.update(keys)
+
+        rows = []
+        for row_number, record in self._records(columns, errors):
+            record['bom_id'] = record.pop('style_code')
+            record['sequence'] = int(record['sequence'])
+            record['usage_quantity'] = Decimal(record['usage_quantity'])
+            record['unit_price'] = Decimal(record['unit_price'])
+            rows.append((row_number, BomDetail(**record)))
+        return rows
+
+    def _prepare_size_specs(self, frame, errors):
+        codes = self._column(frame, 'style_code')
+        self._require(frame, errors, ('style_code', 'size'), SizeSpec)
+        self._resolve_boms(frame, errors, codes)
+        sizes = self._column(frame, 'size').str.upper()
+        size_order = {code: index for index, (code, _) in enumerate(SizeSpec.SIZE_CHOICES)}
+        self._flag(errors, (sizes != '') & ~sizes.isin(size_order), '尺码取值无效')
+        sort_orders = self._integer(frame, errors, 'sort_order', SizeSpec)
+        sort_orders = sort_orders.fillna(sizes.map(size_order)).fillna(0)
+
+        flags = self._column(frame, 'is_active').str.lower()
+        self._flag(errors, ~flags.isin(TRUE_VALUES | FALSE_VALUES), '是否启用取值无效')
+        active = ~flags.isin(FALSE_VALUES)
+
+        # 其余列均视为测量部位，值必须为数字
+        parts = [name for name in frame.columns if name not in SIZE_SPEC_FIELDS]
+        measurements = pd.DataFrame(index=frame.index)
+        for part in parts:
+            values = self._column(frame, part)
+            numbers = pd.to_numeric(values.where(values != '', None), errors='coerce')
+            self._flag(errors, (values != '') & numbers.isna(), f'{part}必须为数字')
+            measurements[part] = numbers
+
+        keys = codes + '#' + sizes
+        self._duplicates(errors, keys, self._seen_sizes, '同一BOM的尺码在文件中重复')
+        existing = {
+            f'{code}#{size}' for code, size in SizeSpec.objects.filter(
+                bom_id__in=set(codes) - self._new_boms - {''}
+            ).values_list('bom_id', 'size')
+        }
+        self._flag(errors, keys.isin(existing), '同一BOM的尺码已存在')
+        self._seen_sizes.update(keys)
+
+        columns = {
+            'bom_id': codes, 'size': sizes, 'sort_order': sort_orders, 'is_active': active,
+            'measurements': pd.Series(measurements.to_dict('records'), index=frame.index),
+        }
+        rows = []
+        for row_number, record in self._records(columns, errors):
+            record['sort_order'] = int(record['sort_order'])
+            record['is_active'] = bool(record['is_active'])
+            record['measurements'] = {
+                part: int(value) if float(value).is_integer() else float(value)
+                for part, value in record['measurements'].items() if pd.notna(value)
+            }
+            rows.append((row_number, SizeSpec(**record)))
+        return rows
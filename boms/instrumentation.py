@@ -0,0 +1,213 @@
+"""
+请求级性能埋点
+
+RequestMetricsMiddleware 对每个请求记录：
+- db         SQL 条数和总耗时（每个数据库连接创建时挂上 execute_wrapper，不依赖 DEBUG）
+- serialize  序列化耗时（视图中用 measure('serialize') 包裹 serializer.data）
+- render     DRF 渲染 JSON 的耗时
+- view       视图耗时（含数据库和序列化，不含渲染）
+- total      经过本中间件的总耗时
+
+结果写入 Server-Timing 响应头（浏览器开发者工具的 Timing 面板可直接查看），
+超过 BOM_SLOW_REQUEST_MS 的请求记入 boms.performance 日志，附带重复次数最多的SQL
+（参数化后的语句相同即视为重复，用于发现 N+1 查询）。
+同时按URL名称把请求数、耗时和SQL条数计入 /metrics（见 boms/metrics.py）。
+"""
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from . import metrics as bom_metrics
+
+logger = logging.getLogger('boms.performance')
+
+_current = ContextVar('bom_request_metrics', default=None)
+
+
+class RequestMetrics:
+    """一个请求的耗时和SQL统计"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view_started = None
+        self.query_count = 0
+        self.db_seconds = 0.0
+        self.queries = Counter()
+        self.timings = {}
+
+    def add(self, name, seconds):
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    def record_query(self, sql, seconds):
+        self.query_count += 1
+        self.db_seconds += seconds
+        self.queries[sql] += 1
+
+    def repeated_queries(self, threshold, limit=5):
+        """重复执行不少于 threshold 次的SQL，按次数倒序"""
+        return [
+            {'sql': sql, 'count': count}
+            for sql, count in self.queries.most_common(limit)
+            if count >= threshold
+        ]
+
+    def server_timing(self, total_seconds):
+        entries = [f'db;dur={self.db_seconds * 1000:.1f};desc="{self.query_count} queries"']
+        for name in ('serialize', 'render', 'view'):
+            if name in self.timings:
+                entries.append(f'{name};dur={self.timings[name] * 1000:.1f}')
+        entries.append(f'total;dur={total_seconds * 1000:.1f}')
+        return ', '.join(entries)
+
+
+def current_metrics():
+    return _current.get()
+
+
+@contextmanager
+def collect_metrics():
+    """在请求之外统计一段代码的SQL（基准测试用），返回 RequestMetrics"""
+    metrics = RequestMetrics()
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+
+
+def record_queries(execute, sql, params, many, context):
+    """数据库执行包装：请求进行中时记录SQL和耗时"""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.record_query(sql, time.perf_counter() - started)
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """connection_created 信号：给新建的数据库连接挂上 record_queries（重连时不重复添加）"""
+    if record_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_queries)
+
+
+@contextmanager
+def measure(name):
+    """把代码块的耗时计入当前请求（不在请求中时什么也不做）"""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add(name, time.perf_counter() - started)
+
+
+class RequestMetricsMiddleware:
+    """
+    记录每个请求的SQL条数/耗时、序列化/渲染/视图耗时，输出 Server-Timing 并记录慢请求
+
+    相关设置：
+    - BOM_SERVER_TIMING       是否输出 Server-Timing 响应头（默认 True）
+    - BOM_SLOW_REQUEST_MS     慢请求阈值（毫秒，默认 500，设为 None 关闭）
+    - BOM_REPEATED_QUERY_MIN  同一SQL执行多少次算作重复（默认 5）
+    流式响应（SSE 长连接、导出）只输出 Server-Timing，不记录慢请求。
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        # 同步视图经 sync_to_async 在线程中执行时会复制上下文，SQL 同样计入本请求
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, metrics)
+
+    def _finish(self, request, response, metrics):
+        total = time.perf_counter() - metrics.started
+        if 'view' not in metrics.timings:
+            metrics.add('view', total - metrics.timings.get('render', 0.0))
+        match = getattr(request, 'resolver_match', None)
+        bom_metrics.observe_request(
+            match.view_name if match else 'unmatched', request.method,
+            response.status_code, total, metrics.query_count
+        )
+        if getattr(settings, 'BOM_SERVER_TIMING', True):
+            response['Server-Timing'] = metrics.server_timing(total)
+        if not response.streaming:
+            self._log(request, response, metrics, total)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.view_started = time.perf_counter()
+        return None
+
+    def process_template_response(self, request, response):
+        """DRF Response 在此之后渲染：记下视图结束时间，并在渲染完成后统计渲染耗时"""
+        metrics = _current.get()
+        if metrics is None:
+            return response
+        rendered_at = time.perf_counter()
+        metrics.add('view', rendered_at - (metrics.view_started or metrics.started))
+        response.add_post_render_callback(
+            lambda rendered: metrics.add('render', time.perf_counter() - rendered_at)
+        )
+        return response
+
+    def _log(self, request, response, metrics, total):
+        threshold = getattr(settings, 'BOM_SLOW_REQUEST_MS', 500)
+        total_ms = total * 1000
+        if threshold is None or total_ms < threshold:
+            return
+        repeated = metrics.repeated_queries(getattr(settings, 'BOM_REPEATED_QUERY_MIN', 5))
+        match = getattr(request, 'resolver_match', None)
+        logger.warning(
+            '慢请求 %s %s %s %.1fms，%d 条SQL %.1fms%s',
+            request.method, request.path, response.status_code, total_ms,
+            metrics.query_count, metrics.db_seconds * 1000,
+            '，存在重复SQL（可能是 N+1）' if repeated else '',
+            extra={
+                'request_metrics': {
+                    'method': request.method,
+                    'path': request.path,
+                    'view': match.view_name if match else None,
+                    'status': response.status_code,
+                    'total_ms': round(total_ms, 1),
+                    'db_ms': round(metrics.db_seconds * 1000, 1),
+                    'query_count': metrics.query_count,
+                    'timings_ms': {name: round(value * 1000, 1) for name, value in metrics.timings.items()},
+                    'repeated_queries': repeated,
+                },
+            },
+        )
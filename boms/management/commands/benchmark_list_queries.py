@@ -0,0 +1,75 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from boms import benchmarks
+from boms.views import BomListView
+
+
+# 代表性的列表查询：默认首页、单条件/组合过滤、搜索、按成本排序
+SCENARIOS = (
+    ('默认列表', {}),
+    ('状态过滤', {'status': 'CONFIRMED'}),
+    ('状态+品类', {'status': 'PENDING_CRAFT', 'category': 'TOP'}),
+    ('季节+年份', {'season': 'SUMMER', 'year': 2025}),
+    ('搜索产品名称', {'search': '真丝衬衫'}),
+    ('搜索款式编码', {'search': 'BENCH00123'}),
+    ('成本排序', {'ordering': '-total_cost', 'total_cost__gte': 0}),
+)
+
+
+class Command(BaseCommand):
+    """
+    BOM列表查询基准测试
+
+    生成基准数据（默认50万个BOM）后，分别在删除/创建列表索引的情况下
+    测量代表性列表查询的 p50/p95 延迟。测量时关闭读缓存（缓存键与索引无关，
+    命中缓存就测不到索引的差别）。会修改当前数据库的索引和数据，请只在专用的基准数据库上运行。
+    """
+    help = '生成基准BOM并对比列表索引前后的查询延迟'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--boms', type=int, default=500000, help='基准BOM数量')
+        parser.add_argument('--batch-size', type=int, default=5000, help='bulk_create 每批数量')
+        parser.add_argument('--repeat', type=int, default=20, help='每个场景的测量次数')
+        parser.add_argument('--no-compare', action='store_true', help='只测量当前索引状态，不做前后对比')
+        parser.add_argument('--output', help='将结果写入JSON文件')
+
+    def handle(self, *args, **options):
+        created = benchmarks.seed_boms(
+            options['boms'], batch_size=options['batch_size'], log=self.stdout.write
+        )
+        self.stdout.write(f'新生成 {created} 个基准BOM')
+
+        view = BomListView.as_view()
+        results = {}
+        with override_settings(BOM_CACHE_TIMEOUT=0):
+            try:
+                phases = [('after', True)] if options['no_compare'] else [('before', False), ('after', True)]
+                for phase, enabled in phases:
+                    benchmarks.set_list_indexes(enabled)
+                    results[phase] = {
+                        name: benchmarks.summarize(
+                            benchmarks.time_view(view, '/api/boms/', params, repeat=options['repeat'])
+                        )
+                        for name, params in SCENARIOS
+                    }
+            finally:
+                benchmarks.set_list_indexes(True)
+
+        self._report(results)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as fp:
+                json.dump(results, fp, ensure_ascii=False, indent=2)
+
+    def _report(self, results):
+        header = f"{'场景':<12}" + ''.join(f'{phase:>22}' for phase in results)
+        self.stdout.write(header)
+        for name, _ in SCENARIOS:
+            cells = ''.join(
+                f"{results[phase][name]['p50_ms']:>10.2f} / {results[phase][name]['p95_ms']:>8.2f}"
+                for phase in results
+            )
+            self.stdout.write(f'{name:<12}{cells}')
+        self.stdout.write('（单位：毫秒，p50 / p95）')
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from boms import grading
+
+
+class Command(BaseCommand):
+    """
+    按波段批量重新推档
+
+    用法：
+    - python manage.py grade_sizes --wave 第一波
+    - python manage.py grade_sizes --wave 第一波 --season SPRING --year 2025 --base-size L --sizes S M L XL
+    """
+    help = '以基础码尺寸按品类档差为一个波段内的全部BOM重新生成尺码规格'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wave', required=True, help='波段')
+        parser.add_argument('--season', help='季节，如 SPRING')
+        parser.add_argument('--year', type=int, help='年份')
+        parser.add_argument('--base-size', default=grading.DEFAULT_BASE_SIZE, help='基础码')
+        parser.add_argument('--sizes', nargs='+', help='要生成的尺码，缺省为全部尺码')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            result = grading.grade_wave(
+                options['wave'], season=options['season'], year=options['year'],
+                base_size=options['base_size'], sizes=options['sizes'],
+            )
+        except grading.GradingError as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - started
+
+        if result['skipped']:
+            preview = ', '.join(result['skipped'][:20])
+            self.stdout.write(self.style.WARNING(
+                f"{len(result['skipped'])} 个BOM没有 {options['base_size']} 码尺寸，已跳过: {preview}"
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f"已为 {result['boms']} 个BOM生成 {result['size_specs']} 条尺码规格，耗时 {elapsed:.2f}s"
+        ))
@@ -0,0 +1,60 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from boms.importers import BomImporter
+from boms.models import User
+
+
+class Command(BaseCommand):
+    """
+    从Excel工作簿或CSV文件批量导入BOM
+
+    用法：
+    - python manage.py import_boms boms.xlsx --user admin
+    - python manage.py import_boms --boms boms.csv --details details.csv --size-specs sizes.csv --user admin
+    """
+    help = '从Excel/CSV批量导入BOM主表、物料明细和尺码规格'
+
+    def add_arguments(self, parser):
+        parser.add_argument('workbook', nargs='?', help='.xlsx 工作簿（BOM / 明细 / 尺码 工作表）')
+        parser.add_argument('--boms', help='BOM主表CSV文件')
+        parser.add_argument('--details', help='物料明细CSV文件')
+        parser.add_argument('--size-specs', dest='size_specs', help='尺码规格CSV文件')
+        parser.add_argument('--user', required=True, help='记为创建人的用户名')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='每块校验/写入的行数')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"用户不存在: {options['user']}")
+
+        csv_paths = {kind: options[kind] for kind in ('boms', 'details', 'size_specs')}
+        if not options['workbook'] and not any(csv_paths.values()):
+            raise CommandError('请指定 .xlsx 工作簿或 --boms/--details/--size-specs CSV文件')
+
+        importer = BomImporter(user, chunk_size=options['chunk_size'])
+        started = time.perf_counter()
+        if options['workbook']:
+            result = importer.import_workbook(options['workbook'])
+        else:
+            result = importer.import_csv(**{
+                kind: path for kind, path in csv_paths.items() if path
+            })
+        elapsed = time.perf_counter() - started
+
+        for error in result.errors:
+            self.stderr.write(f"[{error['sheet']}] 第{error['row']}行: {error['message']}")
+        if result.error_count > len(result.errors):
+            self.stderr.write(f'……共 {result.error_count} 行错误，仅显示前 {len(result.errors)} 行')
+
+        created = result.created
+        summary = (
+            f"导入完成（{elapsed:.1f}秒）：BOM {created['boms']} 个，"
+            f"明细 {created['details']} 行，尺码 {created['size_specs']} 行，错误 {result.error_count} 行"
+        )
+        if result.success:
+            self.stdout.write(self.style.SUCCESS(summary))
+        else:
+            self.stdout.write(self.style.WARNING(summary))
@@ -0,0 +1,164 @@
+import asyncio
+import json
+import resource
+import time
+import tracemalloc
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management.base import BaseCommand, CommandError
+
+from boms import benchmarks, streams
+
+
+class Command(BaseCommand):
+    """
+    SSE事件流压测
+
+    在一个事件循环里通过 ASGI 接口直接建立 --connections 个 /api/stream/ 空闲连接
+    （与 uvicorn/daphne 下单个 worker 的情况相同），记录建立连接后的内存增量，
+    再推送 --events 条事件，统计每个连接收到事件的延迟，最后断开全部连接并确认订阅已释放。
+    不需要外部服务，也不写数据库。
+    """
+    help = '建立大量空闲SSE连接，测量单个 worker 的内存占用和推送延迟'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=2000, help='并发空闲连接数')
+        parser.add_argument('--events', type=int, default=20, help='推送的事件数')
+        parser.add_argument('--interval', type=float, default=0.05, help='两次推送的间隔（秒）')
+        parser.add_argument('--timeout', type=float, default=120, help='建立连接/等待送达的超时（秒）')
+        parser.add_argument('--trace-memory', action='store_true',
+                            help='用 tracemalloc 精确统计内存（明显变慢），默认按进程峰值RSS估算')
+        parser.add_argument('--output', help='将结果写入JSON文件')
+
+    def handle(self, *args, **options):
+        result = asyncio.run(self._run(options))
+        self._report(result)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False, indent=2)
+            self.stdout.write(f"结果已写入 {options['output']}")
+        if result['delivered'] != result['expected']:
+            raise CommandError(f"仅送达 {result['delivered']}/{result['expected']} 条事件")
+
+    async def _run(self, options):
+        count = options['connections']
+        timeout = options['timeout']
+        streams.reset_broker()
+        broker = streams.get_broker()
+        application = ASGIHandler()
+
+        published = {}
+        latencies = []
+        received = [0] * count
+        disconnect = asyncio.Event()
+
+        trace_memory = options['trace_memory']
+        if trace_memory:
+            tracemalloc.start()
+        baseline = self._memory(trace_memory)
+        started = time.perf_counter()
+        tasks = [
+            asyncio.create_task(self._client(application, index, disconnect, published, latencies, received))
+            for index in range(count)
+        ]
+        await self._wait_for(lambda: broker.subscriber_count() >= count, timeout, '建立连接超时')
+        connect_seconds = time.perf_counter() - started
+        await asyncio.sleep(0.5)
+        per_connection = (self._memory(trace_memory) - baseline) / count
+        if trace_memory:
+            tracemalloc.stop()
+
+        for event_id in range(options['events']):
+            message = {
+                'type': 'bom.transition', 'id': event_id, 'style_code': f'LOAD{event_id:05d}',
+                'action': 'approve', 'from_status': 'PENDING_CRAFT', 'to_status': 'CONFIRMED',
+            }
+            published[event_id] = time.perf_counter()
+            broker.dispatch((streams.ALL_BOMS,), message)
+            await asyncio.sleep(options['interval'])
+
+        expected = count * options['events']
+        try:
+            await self._wait_for(lambda: sum(received) >= expected, timeout, '等待送达超时')
+        except CommandError:
+            pass
+
+        disconnect.set()
+        await asyncio.wait_for(asyncio.gather(*tasks, return_exceptions=True), timeout)
+        await self._wait_for(lambda: broker.subscriber_count() == 0, timeout, '断开后订阅未释放')
+
+        return {
+            'connections': count,
+            'events': options['events'],
+            'expected': expected,
+            'delivered': sum(received),
+            'connect_seconds': round(connect_seconds, 2),
+            'memory_per_connection_kb': round(per_connection / 1024, 1),
+            'latency': benchmarks.summarize(latencies),
+            'max_latency_ms': round(max(latencies), 2) if latencies else 0.0,
+        }
+
+    async def _client(self, application, index, disconnect, published, latencies, received):
+        """一个模拟的 EventSource 客户端：发出请求后保持空闲，解析收到的 data 行"""
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': '/api/stream/',
+            'raw_path': b'/api/stream/',
+            'query_string': b'',
+            'root_path': '',
+            'headers': [(b'host', b'localhost'), (b'accept', b'text/event-stream')],
+            'server': ('localhost', 80),
+            'client': ('127.0.0.1', 20000 + index % 40000),
+        }
+        request_sent = False
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            await disconnect.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.start' and message['status'] != 200:
+                raise CommandError(f"连接 {index} 返回 {message['status']}")
+            if message['type'] != 'http.response.body':
+                return
+            now = time.perf_counter()
+            for line in message.get('body', b'').decode('utf-8').splitlines():
+                if line.startswith('data: '):
+                    payload = json.loads(line[6:])
+                    if payload.get('type') == 'bom.transition' and payload['id'] in published:
+                        latencies.append((now - published[payload['id']]) * 1000)
+                        received[index] += 1
+
+        await application(scope, receive, send)
+
+    def _memory(self, trace_memory):
+        """当前内存（字节）：tracemalloc 统计值，或进程峰值RSS（Linux 上 ru_maxrss 单位为KB）"""
+        if trace_memory:
+            return tracemalloc.get_traced_memory()[0]
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    async def _wait_for(self, predicate, timeout, message):
+        deadline = time.perf_counter() + timeout
+        while not predicate():
+            if time.perf_counter() > deadline:
+                raise CommandError(message)
+            await asyncio.sleep(0.05)
+
+    def _report(self, result):
+        self.stdout.write(
+            f"{result['connections']} 个连接，建立耗时 {result['connect_seconds']}s，"
+            f"每个连接约 {result['memory_per_connection_kb']} KB"
+        )
+        latency = result['latency']
+        self.stdout.write(
+            f"送达 {result['delivered']}/{result['expected']} 条事件，"
+            f"延迟 p50 {latency['p50_ms']}ms / p95 {latency['p95_ms']}ms / 最大 {result['max_latency_ms']}ms"
+        )
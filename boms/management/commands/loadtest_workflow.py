@@ -0,0 +1,257 @@
+import itertools
+import json
+import logging
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+
+from django.db import close_old_connections, connections
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from boms import benchmarks
+from boms.models import Bom
+
+LOAD_PREFIX = 'LOAD'
+
+# 工作流操作 -> (URL后缀, 请求角色, 可执行的状态)，与 Bom 上各转换方法的规则一致
+ACTIONS = {
+    'submit_for_details': ('submit-for-details', 'pattern_maker', ('PENDING_CRAFT',)),
+    'submit_to_craft': ('submit-to-craft', 'designer', ('PENDING_DETAILS',)),
+    'approve': ('approve', 'admin', tuple(code for code, _ in Bom.STATUS_CHOICES if code != 'CONFIRMED')),
+    'reject': ('reject', 'admin', tuple(code for code, _ in Bom.STATUS_CHOICES if code != 'REVISED')),
+}
+# 提交类操作远多于批准/驳回，BOM会在 待填写工艺 ⇄ 待填写明细 之间反复流转；
+# 批准/驳回之后只会在 已确认 ⇄ 已修订 之间往返，压测时间较长时应增加 --boms
+ACTION_WEIGHTS = {'submit_for_details': 4, 'submit_to_craft': 4, 'approve': 1, 'reject': 1}
+
+
+class Command(BaseCommand):
+    """
+    工作流接口并发压测
+
+    重建 --boms 个 LOAD 开头的BOM（待填写工艺），再由 --concurrency 个线程共发出 --requests 次操作。
+    每次操作模拟前端：先 GET 详情读取状态和版本号，再按当前状态随机选择一个可执行的
+    提交明细/提交工艺/批准/驳回，携带读取到的 version 提交。BOM数远少于线程数，操作集中在少数热点上。
+
+    默认用进程内的 Django 测试客户端（经过完整中间件，使用当前配置的数据库）；
+    --url 时向运行中的服务发送HTTP请求，此时本命令必须与服务连接同一个数据库，才能检查不变量。
+
+    统计吞吐量、延迟百分位和各操作的结果（成功 / 409冲突 / 400拒绝 / 错误），
+    最后校验不变量（见 benchmarks.check_workflow_invariants），有违反时命令失败。
+    会删除并重建 LOAD 开头的BOM，请使用专用的压测数据库。
+    """
+    help = '多线程并发调用工作流接口，统计吞吐量、延迟、错误率并校验最终状态不变量'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--boms', type=int, default=10, help='参与压测的BOM数（越少竞争越激烈）')
+        parser.add_argument('--concurrency', type=int, default=16, help='并发线程数')
+        parser.add_argument('--requests', type=int, default=2000, help='工作流操作总次数')
+        parser.add_argument('--url', help='服务地址，如 http://127.0.0.1:8000，缺省时使用进程内测试客户端')
+        parser.add_argument('--timeout', type=float, default=30, help='HTTP请求超时（秒）')
+        parser.add_argument('--no-version', action='store_true',
+                            help='提交时不携带读取到的版本号，只依赖服务端的条件 UPDATE 防止并发覆盖')
+        parser.add_argument('--seed', type=int, default=42, help='随机种子')
+        parser.add_argument('--output', help='将结果写入JSON文件')
+
+    def handle(self, *args, **options):
+        if options['boms'] < 1 or options['concurrency'] < 1 or options['requests'] < 1:
+            raise CommandError('--boms、--concurrency、--requests 必须大于0')
+        # 冲突(409)和竞争导致的慢请求是压测的预期结果；错误响应（如 SQLite 的 database table is locked）
+        # 已计入错误率并在结果中保留前20条，默认都不逐条打印日志和堆栈
+        loggers = [logging.getLogger(name) for name in ('django.request', 'boms.performance', 'boms.views')]
+        levels = [logger.level for logger in loggers]
+        if options['verbosity'] < 2:
+            for logger in loggers:
+                logger.setLevel(logging.CRITICAL)
+        try:
+            self._run(options)
+        finally:
+            for logger, level in zip(loggers, levels):
+                logger.setLevel(level)
+
+    def _run(self, options):
+        codes = self._prepare(options['boms'])
+        snapshot = benchmarks.workflow_snapshot(codes)
+
+        samples = defaultdict(list)
+        outcomes = defaultdict(lambda: defaultdict(int))
+        successes = []
+        errors = []
+        lock = threading.Lock()
+        counter = itertools.count()
+
+        def worker(index):
+            rng = random.Random(f"{options['seed']}:{index}")
+            send = self._transport(options)
+            try:
+                while next(counter) < options['requests']:
+                    action, outcome, elapsed, result = self._operation(send, rng, codes, options)
+                    with lock:
+                        samples[action].append(elapsed)
+                        outcomes[action][outcome] += 1
+                        if outcome == 'ok':
+                            successes.append(result)
+                        elif outcome == 'error' and len(errors) < 20:
+                            errors.append(result)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker, args=(index,)) for index in range(options['concurrency'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        close_old_connections()
+        violations = benchmarks.check_workflow_invariants(snapshot, successes)
+        result = self._result(options, elapsed, samples, outcomes, errors, violations)
+        self._report(result)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False, indent=2)
+            self.stdout.write(f"结果已写入 {options['output']}")
+        if violations:
+            raise CommandError(f'{len(violations)} 项不变量被违反')
+
+    def _prepare(self, count):
+        """删除并重建压测BOM，全部从 待填写工艺、版本 1 开始"""
+        Bom.objects.filter(style_code__startswith=LOAD_PREFIX).delete()
+        user = benchmarks.get_bench_user()
+        boms = Bom.objects.bulk_create([
+            Bom(
+                style_code=f'{LOAD_PREFIX}{i:05d}', product_name=f'压测款{i:05d}', season='SPRING',
+                year=2025, wave='压测', category='TOP', dev_colors='黑色', status='PENDING_CRAFT',
+                created_by=user,
+            )
+            for i in range(count)
+        ])
+        return [bom.style_code for bom in boms]
+
+    def _transport(self, options):
+        """返回 send(method, path, body, headers) -> (状态码, JSON)，每个线程各自一个"""
+        if options['url']:
+            base = options['url'].rstrip('/')
+
+            def send(method, path, body=None, headers=None):
+                request = urllib.request.Request(
+                    base + path,
+                    data=json.dumps(body).encode('utf-8') if body is not None else None,
+                    method=method,
+                    headers={'Content-Type': 'application/json', 'Accept': 'application/json', **(headers or {})},
+                )
+                try:
+                    with urllib.request.urlopen(request, timeout=options['timeout']) as response:
+                        return response.status, json.loads(response.read() or b'null')
+                except urllib.error.HTTPError as e:
+                    try:
+                        payload = json.loads(e.read() or b'null')
+                    except ValueError:
+                        payload = None
+                    return e.code, payload
+            return send
+
+        client = Client(SERVER_NAME='localhost', raise_request_exception=False)
+
+        def send(method, path, body=None, headers=None):
+            extra = {f"HTTP_{name.upper().replace('-', '_')}": value for name, value in (headers or {}).items()}
+            if method == 'GET':
+                response = client.get(path, **extra)
+            else:
+                response = client.post(path, body, content_type='application/json', **extra)
+            is_json = response.get('Content-Type', '').startswith('application/json')
+            return response.status_code, response.json() if is_json else None
+        return send
+
+    def _operation(self, send, rng, codes, options):
+        """
+        读取一个BOM后执行一次工作流操作
+        返回 (操作名, 结果, 提交耗时毫秒, 成功时为 (style_code, version)、出错时为错误描述)
+        """
+        code = rng.choice(codes)
+        try:
+            started = time.perf_counter()
+            status_code, bom = send('GET', f'/api/boms/{code}/')
+            if status_code != 200:
+                return 'read', 'error', (time.perf_counter() - started) * 1000, f'GET {code} 返回 {status_code}'
+
+            candidates = [name for name, (_, _, states) in ACTIONS.items() if bom['status'] in states]
+            action = rng.choices(candidates, [ACTION_WEIGHTS[name] for name in candidates])[0]
+            suffix, role, _ = ACTIONS[action]
+            body = {'reason': '并发压测'}
+            if not options['no_version']:
+                body['version'] = bom['version']
+
+            started = time.perf_counter()
+            status_code, payload = send(
+                'POST', f'/api/boms/{code}/{suffix}/', body, {'X-User-Role': role}
+            )
+            elapsed = (time.perf_counter() - started) * 1000
+        except Exception as e:  # 连接失败、超时等
+            return 'read', 'error', 0.0, f'{code}: {e.__class__.__name__}: {e}'
+
+        if status_code == 200:
+            return action, 'ok', elapsed, (code, payload['data']['version'])
+        if status_code == 409:
+            return action, 'conflict', elapsed, None
+        if status_code == 400:
+            return action, 'rejected', elapsed, None
+        message = (payload or {}).get('message', '') if isinstance(payload, dict) else ''
+        return action, 'error', elapsed, f'{action} {code} 返回 {status_code} {message}'.strip()
+
+    def _result(self, options, elapsed, samples, outcomes, errors, violations):
+        total = sum(sum(counts.values()) for counts in outcomes.values())
+        error_count = sum(counts['error'] for counts in outcomes.values())
+        all_samples = [value for action, values in samples.items() if action != 'read' for value in values]
+        return {
+            'environment': benchmarks.environment(),
+            'target': options['url'] or 'in-process',
+            'boms': options['boms'],
+            'concurrency': options['concurrency'],
+            'requests': total,
+            'seconds': round(elapsed, 2),
+            'throughput_rps': round(total / elapsed, 1) if elapsed else 0.0,
+            'error_rate': round(error_count / total, 4) if total else 0.0,
+            'latency': {
+                **benchmarks.summarize(all_samples),
+                'p99_ms': round(benchmarks.percentile(all_samples, 99), 2),
+            },
+            'actions': {
+                action: {
+                    **dict(outcomes[action]),
+                    **benchmarks.summarize(samples[action]),
+                    'p99_ms': round(benchmarks.percentile(samples[action], 99), 2),
+                }
+                for action in sorted(outcomes)
+            },
+            'errors': errors,
+            'violations': violations,
+        }
+
+    def _report(self, result):
+        latency = result['latency']
+        self.stdout.write(
+            f"{result['requests']} 次操作（{result['concurrency']} 线程、{result['boms']} 个BOM），"
+            f"耗时 {result['seconds']}s，{result['throughput_rps']} 次/秒，错误率 {result['error_rate']:.2%}"
+        )
+        self.stdout.write(
+            f"提交延迟 p50 {latency['p50_ms']}ms / p95 {latency['p95_ms']}ms / p99 {latency['p99_ms']}ms"
+        )
+        self.stdout.write(f"{'操作':<20}{'成功':>7}{'冲突':>7}{'拒绝':>7}{'错误':>7}{'p50':>9}{'p95':>9}")
+        for action, stats in result['actions'].items():
+            self.stdout.write(
+                f"{action:<20}{stats.get('ok', 0):>7}{stats.get('conflict', 0):>7}{stats.get('rejected', 0):>7}"
+                f"{stats.get('error', 0):>7}{stats['p50_ms']:>9.2f}{stats['p95_ms']:>9.2f}"
+            )
+        for error in result['errors']:
+            self.stdout.write(self.style.WARNING(error))
+        if result['violations']:
+            for violation in result['violations']:
+                self.stdout.write(self.style.ERROR(violation))
+        else:
+            self.stdout.write(self.style.SUCCESS('不变量检查通过：事件链连续、无重复转换、版本号单调递增且无丢失更新'))
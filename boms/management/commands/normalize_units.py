@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from boms import units
+
+
+class Command(BaseCommand):
+    """
+    批量重算明细的基础单位用量（base_quantity / base_unit）
+
+    用法：
+    - python manage.py normalize_units                       # 全部明细
+    - python manage.py normalize_units --material F-001 T-02  # 只重算这些物料编码
+    用 UPDATE 语句按单位、按换算系数批量写入，适合回填或直接修改数据库后修复
+    """
+    help = '按单位换算规则批量重算BOM明细的基础单位用量'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--material', nargs='+', help='只重算这些物料编码的明细')
+
+    def handle(self, *args, **options):
+        touched = units.renormalize(options['material'])
+        self.stdout.write(self.style.SUCCESS(f'已重算 {touched} 条明细的基础单位用量'))
@@ -0,0 +1,89 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from boms import cache as bom_cache
+from boms.models import Bom
+
+
+class Command(BaseCommand):
+    """
+    批量重建并校验BOM成本汇总（total_cost / detail_count / material_costs）
+
+    用法：
+    - python manage.py rebuild_bom_rollups             # 重建全部汇总后校验
+    - python manage.py rebuild_bom_rollups --verify-only  # 只校验，不写库
+    """
+    help = '批量重建并校验BOM成本汇总字段'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='每批处理的BOM数量')
+        parser.add_argument('--verify-only', action='store_true', help='只校验汇总是否一致，不做修改')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        verify_only = options['verify_only']
+
+        checked = 0
+        mismatched = []
+        for style_codes in self._batches(batch_size):
+            with transaction.atomic():
+                boms = list(
+                    Bom.objects.select_for_update()
+                    .filter(pk__in=style_codes)
+                    .only('style_code', *Bom.ROLLUP_FIELDS)
+                )
+                rollups = Bom.compute_cost_rollups(style_codes)
+                stale = []
+                for bom in boms:
+                    total_cost, detail_count, material_costs = rollups[bom.style_code]
+                    if not self._matches(bom, total_cost, detail_count, material_costs):
+                        mismatched.append(bom.style_code)
+                        bom.total_cost = total_cost
+                        bom.detail_count = detail_count
+                        bom.material_costs = material_costs
+                        stale.append(bom)
+                if stale and not verify_only:
+                    now = timezone.now()
+                    for bom in stale:
+                        bom.updated_at = now
+                    Bom.objects.bulk_update(stale, Bom.ROLLUP_FIELDS + ('updated_at',))
+                    bom_cache.invalidate([bom.style_code for bom in stale])
+                checked += len(boms)
+
+        if verify_only:
+            if mismatched:
+                preview = ', '.join(mismatched[:20])
+                raise CommandError(f'{len(mismatched)}/{checked} 个BOM汇总不一致: {preview}')
+            self.stdout.write(self.style.SUCCESS(f'已校验 {checked} 个BOM，汇总全部一致'))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'已校验 {checked} 个BOM，重建 {len(mismatched)} 个不一致的汇总'
+            ))
+
+    def _batches(self, batch_size):
+        """按主键顺序分批返回 style_code，避免一次加载全部BOM"""
+        last = None
+        while True:
+            queryset = Bom.objects.order_by('style_code')
+            if last is not None:
+                queryset = queryset.filter(style_code__gt=last)
+            style_codes = list(queryset.values_list('style_code', flat=True)[:batch_size])
+            if not style_codes:
+                return
+            yield style_codes
+            last = style_codes[-1]
+
+    def _matches(self, bom, total_cost, detail_count, material_costs):
+        stored_costs = {
+            key: Decimal(value).quantize(Bom.COST_QUANTIZE)
+            for key, value in (bom.material_costs or {}).items()
+        }
+        expected_costs = {key: Decimal(value) for key, value in material_costs.items()}
+        return (
+            Decimal(bom.total_cost).quantize(Bom.COST_QUANTIZE) == total_cost
+            and bom.detail_count == detail_count
+            and stored_costs == expected_costs
+        )
@@ -0,0 +1,140 @@
+import json
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory
+
+from boms import benchmarks
+from boms.models import Bom
+from boms.views import (
+    ApproveBomView, BomDetailView, BomDocumentView, BomExportView, BomListView, RejectBomView, SizeSpecQueryView,
+)
+
+
+class Command(BaseCommand):
+    """
+    BOM接口基准测试
+
+    在已有数据（通常由 generate_bom_data 生成）上依次测量列表、搜索、详情、文档、导出和
+    工作流接口，输出每个场景的 p50/p95/p99 延迟、顺序执行吞吐量和SQL条数，并写入JSON。
+    默认关闭读缓存，测的是数据库路径；--cache 时测缓存路径。
+    传入 --baseline 时与之前的结果对比（同一数据库类型、同一数据规模才有可比性）。
+
+    工作流场景会在基准BOM上交替执行批准/驳回，产生事件和通知，请使用专用的基准数据库。
+    """
+    help = '测量主要接口的延迟、吞吐量和SQL条数，结果写入JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=50, help='每个场景的测量次数')
+        parser.add_argument('--warmup', type=int, default=3, help='预热次数')
+        parser.add_argument('--only', nargs='*', help='只运行这些场景')
+        parser.add_argument('--cache', action='store_true', help='开启读缓存')
+        parser.add_argument('--seed', type=int, default=7, help='详情/工作流场景抽样的随机种子')
+        parser.add_argument('--output', default='bench_results.json', help='结果JSON文件')
+        parser.add_argument('--baseline', help='对比的基准结果JSON文件')
+
+    def handle(self, *args, **options):
+        codes = list(
+            Bom.objects.filter(style_code__startswith=benchmarks.BENCH_PREFIX, detail_count__gt=0)
+            .order_by('style_code').values_list('style_code', flat=True)[:5000]
+        )
+        if not codes:
+            raise CommandError('没有基准数据，请先运行 generate_bom_data')
+        rng = random.Random(options['seed'])
+        sample = rng.sample(codes, min(len(codes), 200))
+        scenarios = self._scenarios(sample)
+        if options['only']:
+            unknown = set(options['only']) - set(scenarios)
+            if unknown:
+                raise CommandError(f"未知场景: {', '.join(sorted(unknown))}，可选: {', '.join(scenarios)}")
+            scenarios = {name: scenarios[name] for name in options['only']}
+
+        overrides = {} if options['cache'] else {'BOM_CACHE_TIMEOUT': 0}
+        results = {'environment': benchmarks.environment(), 'cache': options['cache'], 'scenarios': {}}
+        with override_settings(**overrides):
+            for name, call in scenarios.items():
+                self.stdout.write(f'{name} ...', ending='')
+                self.stdout.flush()
+                result = benchmarks.measure(call, repeat=options['repeat'], warmup=options['warmup'])
+                results['scenarios'][name] = result
+                self.stdout.write(f" p50 {result['p50_ms']}ms")
+
+        baseline = self._load(options['baseline']) if options['baseline'] else None
+        self._report(results, baseline)
+        with open(options['output'], 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        self.stdout.write(f"结果已写入 {options['output']}")
+
+    def _scenarios(self, sample):
+        """场景名 -> call(i)，i 为调用序号"""
+        factory = APIRequestFactory(SERVER_NAME='localhost')
+        list_view = BomListView.as_view()
+        detail_view = BomDetailView.as_view()
+        document_view = BomDocumentView.as_view()
+        export_view = BomExportView.as_view()
+        approve_view = ApproveBomView.as_view()
+        reject_view = RejectBomView.as_view()
+        size_spec_view = SizeSpecQueryView.as_view()
+
+        def get(view, path, params=None, **kwargs):
+            return lambda i: view(factory.get(path, params or {}), **kwargs)
+
+        def per_bom(view, suffix):
+            def call(i):
+                code = sample[i % len(sample)]
+                return view(factory.get(f'/api/boms/{code}/{suffix}'), style_code=code)
+            return call
+
+        states = dict(Bom.objects.filter(pk__in=sample).values_list('style_code', 'status'))
+
+        def workflow(i):
+            # 已确认的BOM驳回，其余批准，每个BOM每次都真实发生状态转换
+            code = sample[i % len(sample)]
+            approve = states[code] != 'CONFIRMED'
+            view, path = (approve_view, 'approve') if approve else (reject_view, 'reject')
+            request = factory.post(f'/api/boms/{code}/{path}/', {'reason': '基准测试'}, format='json',
+                                   HTTP_X_USER_ROLE='admin')
+            response = view(request, style_code=code)
+            states[code] = 'CONFIRMED' if approve else 'REVISED'
+            return response
+
+        return {
+            'list': get(list_view, '/api/boms/'),
+            'list_large_page': get(list_view, '/api/boms/', {'page_size': 500}),
+            'list_filtered': get(list_view, '/api/boms/', {'status': 'CONFIRMED', 'category': 'TOP'}),
+            'list_cost_ordering': get(list_view, '/api/boms/', {'ordering': '-total_cost'}),
+            'search': get(list_view, '/api/boms/', {'search': '真丝衬衫'}),
+            'detail': per_bom(detail_view, ''),
+            'document': per_bom(document_view, 'document/'),
+            'export_csv': get(export_view, '/api/boms/export/', {
+                'status': 'CONFIRMED', 'season': 'SPRING', 'year': 2025, 'sheet': 'details',
+            }),
+            'size_spec_range': get(size_spec_view, '/api/size-specs/', {
+                'size': 'M', 'bom__category': 'TOP', 'measurement': '胸围:95:96',
+            }),
+            'workflow': workflow,
+        }
+
+    def _load(self, path):
+        with open(path, encoding='utf-8') as f:
+            baseline = json.load(f)
+        env = baseline.get('environment', {})
+        current = benchmarks.environment()
+        if env.get('database') != current['database'] or env.get('rows') != current['rows']:
+            self.stdout.write(self.style.WARNING(
+                f"基准结果的数据库/数据规模不同（{env.get('database')} {env.get('rows')}），对比仅供参考"
+            ))
+        return baseline
+
+    def _report(self, results, baseline):
+        self.stdout.write(f"{'场景':<20}{'p50':>9}{'p95':>9}{'p99':>9}{'次/秒':>9}{'SQL':>5}")
+        for name, result in results['scenarios'].items():
+            line = (f"{name:<20}{result['p50_ms']:>9.2f}{result['p95_ms']:>9.2f}{result['p99_ms']:>9.2f}"
+                    f"{result['throughput_rps']:>9.1f}{result['queries']:>5}")
+            before = (baseline or {}).get('scenarios', {}).get(name)
+            if before and before['p50_ms']:
+                change = (result['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100
+                line += f"  p50 {change:+.1f}%  SQL {before['queries']}→{result['queries']}"
+            self.stdout.write(line)
+        self.stdout.write('（延迟单位：毫秒）')
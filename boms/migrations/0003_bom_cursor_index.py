@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boms', '0002_alter_bom_status'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bom',
+            index=models.Index(fields=['created_at', 'style_code'], name='bom_main_created_cursor_idx'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:32
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+def backfill_cost_rollups(apps, schema_editor):
+    """根据已有明细回填成本汇总"""
+    Bom = apps.get_model('boms', 'Bom')
+    BomDetail = apps.get_model('boms', 'BomDetail')
+    quantize = Decimal('0.0000001')
+    rollups = {}
+    rows = (
+        BomDetail.objects.values('bom_id', 'material_type')
+        .annotate(
+            cost=models.Sum(models.F('unit_price') * models.F('usage_quantity')),
+            count=models.Count('id')
+        )
+        .order_by()
+    )
+    for row in rows:
+        cost = Decimal(str(row['cost'] or 0)).quantize(quantize)
+        rollup = rollups.setdefault(row['bom_id'], [Decimal('0'), 0, {}])
+        rollup[0] += cost
+        rollup[1] += row['count']
+        if cost:
+            rollup[2][row['material_type']] = str(cost)
+    for style_code, (total_cost, detail_count, material_costs) in rollups.items():
+        Bom.objects.filter(pk=style_code).update(
+            total_cost=total_cost, detail_count=detail_count, material_costs=material_costs
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boms', '0003_bom_cursor_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bom',
+            name='detail_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='明细数量'),
+        ),
+        migrations.AddField(
+            model_name='bom',
+            name='material_costs',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='按物料类型汇总的成本，如：{"FABRIC": "35.1000000"}', verbose_name='物料类型成本'),
+        ),
+        migrations.AddField(
+            model_name='bom',
+            name='total_cost',
+            field=models.DecimalField(db_index=True, decimal_places=7, default=Decimal('0'), editable=False, max_digits=20, verbose_name='总成本'),
+        ),
+        migrations.RunPython(backfill_cost_rollups, migrations.RunPython.noop),
+    ]
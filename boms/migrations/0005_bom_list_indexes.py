@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:34
+
+from django.db import migrations, models
+
+
+# SearchFilter 的 icontains 在 PostgreSQL 上生成 UPPER(col::text) LIKE UPPER('%kw%')，
+# 需要同样表达式的 pg_trgm GIN 索引才能走索引
+TRIGRAM_INDEXES = (
+    ('bom_main_style_code_trgm', 'style_code'),
+    ('bom_main_product_name_trgm', 'product_name'),
+    ('bom_main_wave_trgm', 'wave'),
+)
+
+
+def create_trigram_indexes(apps, schema_editor):
+    """PostgreSQL 创建 pg_trgm 索引；SQLite 等其他数据库跳过（前导 % 的 LIKE 无法使用 B-tree 索引）"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON bom_main '
+            f'USING gin ((UPPER({column}::text)) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _ in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boms', '0004_bom_cost_rollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bom',
+            index=models.Index(fields=['status', '-created_at', '-style_code'], name='bom_main_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bom',
+            index=models.Index(fields=['category', '-created_at', '-style_code'], name='bom_main_cat_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bom',
+            index=models.Index(fields=['status', 'category', '-created_at', '-style_code'], name='bom_main_stat_cat_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bom',
+            index=models.Index(fields=['season', 'year', '-created_at', '-style_code'], name='bom_main_season_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bom',
+            index=models.Index(fields=['year', '-created_at', '-style_code'], name='bom_main_year_created_idx'),
+        ),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:49
+
+import re
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+# 旧版工作流方法追加到 notes 的固定格式： [用户名] 文本
+LEGACY_NOTE_PATTERNS = (
+    (re.compile(r'^\[(?P<actor>[^\]]*)\] 版房师傅已完成规格尺寸设计，提交进行明细填写。$'), 'submit_for_details', 'PENDING_CRAFT', 'PENDING_DETAILS'),
+    (re.compile(r'^\[(?P<actor>[^\]]*)\] 设计助理已完成物料明细填写，提交给工艺团队。$'), 'submit_to_craft', 'PENDING_DETAILS', 'PENDING_CRAFT'),
+    (re.compile(r'^\[(?P<actor>[^\]]*)\] BOM管理员已批准此BOM。$'), 'approve', '', 'CONFIRMED'),
+    (re.compile(r'^\[(?P<actor>[^\]]*)\] BOM被驳回(，原因：(?P<reason>.*))?$'), 'reject', '', 'REVISED'),
+)
+
+
+def move_workflow_notes_to_events(apps, schema_editor):
+    """
+    把 notes 中由工作流自动追加的历史行迁移为 BomEvent，notes 只保留人工备注
+
+    旧数据没有逐条时间，事件时间统一取BOM的 updated_at，按原有行顺序写入
+    """
+    Bom = apps.get_model('boms', 'Bom')
+    BomEvent = apps.get_model('boms', 'BomEvent')
+    candidates = Bom.objects.filter(notes__contains='] ').only('style_code', 'notes', 'updated_at')
+    for bom in candidates.iterator(chunk_size=1000):
+        kept, events = [], []
+        for line in bom.notes.split('\n'):
+            for pattern, action, from_status, to_status in LEGACY_NOTE_PATTERNS:
+                match = pattern.match(line.strip())
+                if match:
+                    events.append(BomEvent(
+                        bom_id=bom.style_code,
+                        action=action,
+                        actor=match.group('actor'),
+                        from_status=from_status,
+                        to_status=to_status,
+                        reason=match.groupdict().get('reason') or '',
+                        created_at=bom.updated_at,
+                    ))
+                    break
+            else:
+                kept.append(line)
+        if events:
+            BomEvent.objects.bulk_create(events)
+            Bom.objects.filter(pk=bom.style_code).update(notes='\n'.join(kept).strip())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boms', '0005_bom_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BomEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('action', models.CharField(choices=[('submit_for_details', '提交明细填写'), ('submit_to_craft', '提交工艺'), ('approve', '批准'), ('reject', '驳回')], max_length=30, verbose_name='操作')),
+                ('actor', models.CharField(blank=True, max_length=150, verbose_name='操作人')),
+                ('actor_role', models.CharField(blank=True, max_length=20, verbose_name='操作人角色')),
+                ('from_status', models.CharField(blank=True, choices=[('DRAFT', '草稿'), ('PENDING_CRAFT', '待填写工艺'), ('PENDING_PATTERN', '待版房确认'), ('PENDING_DETAILS', '待填写明细'), ('CONFIRMED', '已确认'), ('REVISED', '已修订'), ('CANCELLED', '已取消')], max_length=20, verbose_name='原状态')),
+                ('to_status', models.CharField(choices=[('DRAFT', '草稿'), ('PENDING_CRAFT', '待填写工艺'), ('PENDING_PATTERN', '待版房确认'), ('PENDING_DETAILS', '待填写明细'), ('CONFIRMED', '已确认'), ('REVISED', '已修订'), ('CANCELLED', '已取消')], max_length=20, verbose_name='新状态')),
+                ('reason', models.TextField(blank=True, verbose_name='原因')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='发生时间')),
+                ('bom', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='events', to='boms.bom', verbose_name='所属BOM')),
+            ],
+            options={
+                'verbose_name': 'BOM工作流事件',
+                'verbose_name_plural': 'BOM工作流事件',
+                'db_table': 'bom_event',
+                'ordering': ['-created_at', '-id'],
+                'indexes': [models.Index(fields=['bom', '-created_at', '-id'], name='bom_event_bom_created_idx'), models.Index(fields=['to_status', '-created_at', '-id'], name='bom_event_status_created_idx'), models.Index(fields=['action', '-created_at', '-id'], name='bom_event_action_created_idx')],
+            },
+        ),
+        migrations.RunPython(move_workflow_notes_to_events, migrations.RunPython.noop),
+    ]
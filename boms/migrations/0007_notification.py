@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:57
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boms', '0006_bom_event'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('notification_type', models.CharField(choices=[('status_change', '状态变更'), ('approval', '批准'), ('rejection', '驳回'), ('message', '消息')], default='message', max_length=20, verbose_name='通知类型')),
+                ('title', models.CharField(max_length=100, verbose_name='标题')),
+                ('message', models.TextField(blank=True, verbose_name='内容')),
+                ('is_read', models.BooleanField(default=False, verbose_name='是否已读')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='创建时间')),
+                ('read_at', models.DateTimeField(blank=True, null=True, verbose_name='阅读时间')),
+                ('bom', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='boms.bom', verbose_name='相关BOM')),
+                ('recipient', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to=settings.AUTH_USER_MODEL, verbose_name='接收人')),
+            ],
+            options={
+                'verbose_name': '通知',
+                'verbose_name_plural': '通知',
+                'db_table': 'bom_notification',
+                'ordering': ['-created_at', '-id'],
+                'indexes': [models.Index(fields=['recipient', 'is_read', '-created_at', '-id'], name='bom_notif_recipient_read_idx'), models.Index(fields=['recipient', '-created_at', '-id'], name='bom_notif_recipient_idx')],
+            },
+        ),
+    ]
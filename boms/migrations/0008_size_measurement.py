@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_size_measurements(apps, schema_editor):
+    """把已有尺码规格的 measurements 展开写入索引表"""
+    SizeSpec = apps.get_model('boms', 'SizeSpec')
+    SizeMeasurement = apps.get_model('boms', 'SizeMeasurement')
+    rows = []
+    specs = SizeSpec.objects.values_list('id', 'bom_id', 'size', 'measurements').order_by('id')
+    for spec_id, bom_id, size, measurements in specs.iterator(chunk_size=2000):
+        for part, value in (measurements or {}).items():
+            if isinstance(value, bool):
+                continue
+            try:
+                number = float(value)
+            except (TypeError, ValueError):
+                continue
+            if number == number and abs(number) != float('inf'):
+                rows.append(SizeMeasurement(spec_id=spec_id, bom_id=bom_id, size=size, part=str(part)[:50], value=number))
+        if len(rows) >= 5000:
+            SizeMeasurement.objects.bulk_create(rows)
+            rows = []
+    SizeMeasurement.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boms', '0007_notification'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SizeMeasurement',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('size', models.CharField(choices=[('XXS', 'XXS'), ('XS', 'XS'), ('S', 'S'), ('M', 'M'), ('L', 'L'), ('XL', 'XL'), ('XXL', 'XXL'), ('XXXL', 'XXXL')], max_length=10, verbose_name='尺码')),
+                ('part', models.CharField(max_length=50, verbose_name='部位')),
+                ('value', models.FloatField(verbose_name='尺寸')),
+                ('bom', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='boms.bom', verbose_name='所属BOM')),
+                ('spec', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='measurement_rows', to='boms.sizespec', verbose_name='尺码规格')),
+            ],
+            options={
+                'verbose_name': '尺码部位尺寸',
+                'verbose_name_plural': '尺码部位尺寸',
+                'db_table': 'bom_size_measurement',
+                'indexes': [models.Index(fields=['part', 'size', 'value'], name='bom_size_measure_range_idx')],
+                'unique_together': {('spec', 'part')},
+            },
+        ),
+        migrations.RunPython(backfill_size_measurements, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:34
+
+import django.core.validators
+from decimal import Decimal
+from django.db import migrations, models
+
+
+def backfill_base_quantities(apps, schema_editor):
+    """按固定换算回填已有明细的基础单位用量（此时还没有物料换算系数），每个单位一条 UPDATE"""
+    BomDetail = apps.get_model('boms', 'BomDetail')
+    conversions = {
+        'M': ('M', Decimal('1')),
+        'YARD': ('M', Decimal('0.9144')),
+        'KG': ('KG', Decimal('1')),
+        'PCS': ('PCS', Decimal('1')),
+        'PAIR': ('PCS', Decimal('2')),
+        'SET': ('SET', Decimal('1')),
+    }
+    output = models.DecimalField(max_digits=20, decimal_places=6)
+    for unit, (base_unit, factor) in conversions.items():
+        BomDetail.objects.filter(usage_unit=unit).update(
+            base_unit=base_unit,
+            base_quantity=models.F('usage_quantity') * models.Value(factor, output_field=output),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boms', '0008_size_measurement'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MaterialUnitFactor',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('material_code', models.CharField(max_length=100, verbose_name='物料编码')),
+                ('unit', models.CharField(choices=[('M', '米'), ('KG', '千克'), ('PCS', '个'), ('PAIR', '对'), ('SET', '套'), ('ROLL', '卷'), ('YARD', '码')], max_length=10, verbose_name='单位')),
+                ('base_unit', models.CharField(choices=[('M', '米'), ('KG', '千克'), ('PCS', '个'), ('PAIR', '对'), ('SET', '套'), ('ROLL', '卷'), ('YARD', '码')], max_length=10, verbose_name='基础单位')),
+                ('factor', models.DecimalField(decimal_places=6, help_text='1 单位 = factor 基础单位', max_digits=16, validators=[django.core.validators.MinValueValidator(Decimal('0.000001'))], verbose_name='换算系数')),
+                ('notes', models.CharField(blank=True, max_length=200, verbose_name='备注')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': '物料单位换算',
+                'verbose_name_plural': '物料单位换算',
+                'db_table': 'bom_material_unit_factor',
+                'ordering': ['material_code', 'unit'],
+            },
+        ),
+        migrations.AddField(
+            model_name='bomdetail',
+            name='base_quantity',
+            field=models.DecimalField(blank=True, decimal_places=6, editable=False, max_digits=20, null=True, verbose_name='基础单位用量'),
+        ),
+        migrations.AddField(
+            model_name='bomdetail',
+            name='base_unit',
+            field=models.CharField(blank=True, editable=False, max_length=10, verbose_name='基础单位'),
+        ),
+        migrations.AddIndex(
+            model_name='bomdetail',
+            index=models.Index(fields=['material_type', 'base_unit', 'base_quantity'], name='bom_detail_base_qty_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bomdetail',
+            index=models.Index(fields=['material_code', 'usage_unit'], name='bom_detail_material_unit_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='materialunitfactor',
+            unique_together={('material_code', 'unit')},
+        ),
+        migrations.RunPython(backfill_base_quantities, migrations.RunPython.noop),
+    ]
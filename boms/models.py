@@ -1,8 +1,25 @@
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 from django.core.validators import MinLengthValidator, MaxValueValidator, MinValueValidator
 from decimal import Decimal
 
+from . import cache as bom_cache
+from . import metrics as bom_metrics
+from . import streams
+
+
+class WorkflowConflictError(Exception):
+    """工作流状态转换冲突 - BOM在读取后已被其他人修改"""
+
+    def __init__(self, style_code, expected_status, expected_version):
+        self.style_code = style_code
+        self.expected_status = expected_status
+        self.expected_version = expected_version
+        super().__init__(
+            f"BOM {style_code} 已被其他人修改（期望状态 {expected_status}、版本 {expected_version}），请刷新后重试"
+        )
+
 
 class User(AbstractUser):
     """自定义用户模型 - 扩展Django默认用户模型"""
@@ -129,11 +146,49 @@ class Bom(models.Model):
     # 备注
     notes = models.TextField(blank=True, verbose_name='备注')
 
+    # 成本汇总（由BomDetail写入时增量维护，见 signals.py）
+    total_cost = models.DecimalField(
+        max_digits=20,
+        decimal_places=7,
+        default=Decimal('0'),
+        db_index=True,
+        editable=False,
+        verbose_name='总成本'
+    )
+    detail_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='明细数量')
+    material_costs = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='物料类型成本',
+        help_text='按物料类型汇总的成本，如：{"FABRIC": "35.1000000"}'
+    )
+
+    # 汇总字段只能通过明细增量维护或 rebuild_bom_rollups 重建
+    ROLLUP_FIELDS = ('total_cost', 'detail_count', 'material_costs')
+    COST_QUANTIZE = Decimal('0.0000001')
+
     class Meta:
         verbose_name = 'BOM'
         verbose_name_plural = 'BOM列表'
         db_table = 'bom_main'
         ordering = ['-created_at']
+        indexes = [
+            # 列表游标分页键 (created_at, style_code)
+            models.Index(fields=['created_at', 'style_code'], name='bom_main_created_cursor_idx'),
+            # 列表常用过滤条件 + 默认排序 -created_at（style_code 为游标决胜字段）
+            models.Index(fields=['status', '-created_at', '-style_code'], name='bom_main_status_created_idx'),
+            models.Index(fields=['category', '-created_at', '-style_code'], name='bom_main_cat_created_idx'),
+            models.Index(
+                fields=['status', 'category', '-created_at', '-style_code'],
+                name='bom_main_stat_cat_created_idx'
+            ),
+            models.Index(
+                fields=['season', 'year', '-created_at', '-style_code'],
+                name='bom_main_season_created_idx'
+            ),
+            models.Index(fields=['year', '-created_at', '-style_code'], name='bom_main_year_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.style_code} - {self.product_name}"
@@ -145,13 +200,134 @@ class Bom(models.Model):
             return []
         return [color.strip() for color in self.dev_colors.split('/')]
 
+    def save(self, *args, **kwargs):
+        # 更新已有BOM时不写回成本汇总字段，避免用内存中的旧值覆盖明细刚维护的汇总
+        if (not self._state.adding and kwargs.get('update_fields') is None
+                and not kwargs.get('force_insert')):
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.ROLLUP_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
     def get_total_cost(self):
-        """计算总成本（所有BomDetail的成本之和）"""
-        return self.details.aggregate(
-            total=models.Sum(
-                models.F('unit_price') * models.F('usage_quantity')
+        """获取总成本（所有BomDetail的成本之和，读取已维护的汇总字段）"""
+        return self.total_cost or Decimal('0.00')
+
+    @classmethod
+    def compute_cost_rollups(cls, style_codes):
+        """
+        从明细表重新计算一批BOM的成本汇总，一条分组查询完成
+        返回 {style_code: (total_cost, detail_count, material_costs)}
+        """
+        rollups = {code: [Decimal('0'), 0, {}] for code in style_codes}
+        rows = (
+            BomDetail.objects.filter(bom_id__in=style_codes)
+            .values('bom_id', 'material_type')
+            .annotate(
+                cost=models.Sum(models.F('unit_price') * models.F('usage_quantity')),
+                count=models.Count('id')
+            )
+            .order_by()
+        )
+        for row in rows:
+            cost = Decimal(str(row['cost'] or 0)).quantize(cls.COST_QUANTIZE)
+            rollup = rollups[row['bom_id']]
+            rollup[0] += cost
+            rollup[1] += row['count']
+            if cost:
+                rollup[2][row['material_type']] = str(cost)
+        return {code: tuple(value) for code, value in rollups.items()}
+
+    @classmethod
+    def refresh_cost_rollups(cls, style_codes):
+        """按明细表重算并批量写回一批BOM的成本汇总（用于 bulk_create 等不触发信号的写入）"""
+        rollups = cls.compute_cost_rollups(style_codes)
+        now = timezone.now()
+        cls.objects.bulk_update(
+            [
+                cls(style_code=code, total_cost=total_cost, detail_count=detail_count,
+                    material_costs=material_costs, updated_at=now)
+                for code, (total_cost, detail_count, material_costs) in rollups.items()
+            ],
+            cls.ROLLUP_FIELDS + ('updated_at',)
+        )
+
+    @classmethod
+    def apply_cost_delta(cls, style_code, material_type, cost, count):
+        """
+        在当前事务中增量更新BOM成本汇总
+        cost/count 为变化量，删除明细时传入负值
+        """
+        with transaction.atomic():
+            bom = (
+                cls.objects.select_for_update()
+                .only(*cls.ROLLUP_FIELDS)
+                .filter(pk=style_code)
+                .first()
             )
-        )['total'] or Decimal('0.00')
+            if bom is None:
+                return
+            cost = Decimal(cost).quantize(cls.COST_QUANTIZE)
+            material_costs = dict(bom.material_costs or {})
+            subtotal = Decimal(material_costs.get(material_type, '0')) + cost
+            if subtotal:
+                material_costs[material_type] = str(subtotal.quantize(cls.COST_QUANTIZE))
+            else:
+                material_costs.pop(material_type, None)
+            # 汇总变化也刷新 updated_at，BOM的 ETag/列表校验值随之失效
+            cls.objects.filter(pk=style_code).update(
+                total_cost=bom.total_cost + cost,
+                detail_count=max(bom.detail_count + count, 0),
+                material_costs=material_costs,
+                updated_at=timezone.now()
+            )
+
+    def _transition(self, to_status, action, user, reason="", **changes):
+        """
+        原子状态转换：单条条件 UPDATE，只写入变化的字段并递增版本号，
+        同一事务内追加一条 BomEvent 记录
+
+        UPDATE bom_main SET status=..., version=version+1, ...
+        WHERE style_code=... AND status=<当前状态> AND version=<当前版本>
+
+        若BOM已被他人修改（状态或版本不一致）则抛出 WorkflowConflictError
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            updated = Bom.objects.filter(
+                pk=self.pk, status=self.status, version=self.version
+            ).update(
+                status=to_status,
+                version=models.F('version') + 1,
+                updated_at=now,
+                **changes
+            )
+            if not updated:
+                raise WorkflowConflictError(self.pk, self.status, self.version)
+            event = BomEvent.objects.create(
+                bom_id=self.pk,
+                action=action,
+                actor=getattr(user, 'username', ''),
+                actor_role=getattr(user, 'role', ''),
+                from_status=self.status,
+                to_status=to_status,
+                reason=reason,
+                created_at=now
+            )
+            notifications = Notification.notify_transition(
+                action, user, [self.pk], [self.created_by_id], reason
+            )
+            bom_cache.invalidate([self.pk])
+            streams.publish_on_commit([event], notifications)
+            bom_metrics.count_transitions_on_commit([event])
+
+        self.status = to_status
+        self.version += 1
+        self.updated_at = now
+        for name, value in changes.items():
+            setattr(self, name, value)
+        return True
 
     def submit_for_details(self, user):
         """
@@ -159,11 +335,8 @@ class Bom(models.Model):
         从 PENDING_CRAFT 状态转换为 PENDING_DETAILS 状态
         """
         if self.status == 'PENDING_CRAFT' and hasattr(user, 'role') and user.role == 'pattern_maker':
-            self.status = 'PENDING_DETAILS'
-            self.assigned_to = None  # 清空当前负责人，等待设计助理接手
-            self.notes = f"{self.notes}\n[{user.username}] 版房师傅已完成规格尺寸设计，提交进行明细填写。" if self.notes else f"[{user.username}] 版房师傅已完成规格尺寸设计，提交进行明细填写。"
-            self.save()
-            # TODO: 在未来这里可以触发发送通知的逻辑
+            # 清空当前负责人，等待设计助理接手（同时通知设计助理）
+            self._transition('PENDING_DETAILS', 'submit_for_details', user, assigned_to=None)
             return True
         return False
 
@@ -173,40 +346,122 @@ class Bom(models.Model):
         从 PENDING_DETAILS 状态转换为 PENDING_CRAFT 状态
         """
         if self.status == 'PENDING_DETAILS' and hasattr(user, 'role') and user.role == 'designer':
-            self.status = 'PENDING_CRAFT'
-            self.notes = f"{self.notes}\n[{user.username}] 设计助理已完成物料明细填写，提交给工艺团队。" if self.notes else f"[{user.username}] 设计助理已完成物料明细填写，提交给工艺团队。"
-            self.save()
+            self._transition('PENDING_CRAFT', 'submit_to_craft', user)
             return True
         return False
 
     def approve_bom(self, user):
         """
         BOM管理员批准BOM
-        将BOM状态设置为 CONFIRMED
+        将BOM状态设置为 CONFIRMED（已确认的BOM不能重复批准）
         """
-        if hasattr(user, 'role') and user.role == 'admin':
-            from django.utils import timezone
-            self.status = 'CONFIRMED'
-            self.confirmed_at = timezone.now()
-            self.notes = f"{self.notes}\n[{user.username}] BOM管理员已批准此BOM。" if self.notes else f"[{user.username}] BOM管理员已批准此BOM。"
-            self.save()
+        if self.status != 'CONFIRMED' and hasattr(user, 'role') and user.role == 'admin':
+            self._transition('CONFIRMED', 'approve', user, confirmed_at=timezone.now())
             return True
         return False
 
     def reject_bom(self, user, reason=""):
         """
-        驳回BOM，将状态设置为需要修订
+        驳回BOM，将状态设置为需要修订（已修订的BOM不能重复驳回）
         """
-        if hasattr(user, 'role') and user.role in ['admin', 'pattern_maker']:
-            self.status = 'REVISED'
-            rejection_note = f"[{user.username}] BOM被驳回"
-            if reason:
-                rejection_note += f"，原因：{reason}"
-            self.notes = f"{self.notes}\n{rejection_note}" if self.notes else rejection_note
-            self.save()
+        if self.status != 'REVISED' and hasattr(user, 'role') and user.role in ['admin', 'pattern_maker']:
+            self._transition('REVISED', 'reject', user, reason)
             return True
         return False
 
+    # 批量操作：动作 -> (目标状态, 允许的角色)，与 approve_bom / reject_bom 的规则一致
+    BULK_ACTIONS = {
+        'approve': ('CONFIRMED', ('admin',)),
+        'reject': ('REVISED', ('admin', 'pattern_maker')),
+    }
+    BULK_CHUNK_SIZE = 500
+
+    @classmethod
+    def bulk_transition(cls, style_codes, action, user, reason="", versions=None):
+        """
+        批量批准/驳回BOM
+
+        在一个事务内锁定并读取目标BOM的状态和版本，再分块执行集合式 UPDATE
+        并批量写入 BomEvent 和汇总通知（每块一条SQL），1000个BOM只需要几次查询。
+
+        - versions: 可选的 {style_code: 版本号}，与数据库不一致的条目视为冲突
+        - 返回与 style_codes 顺序一致的逐条结果：
+          [{'style_code', 'success', 'message', 'version'}]
+        """
+        if action not in cls.BULK_ACTIONS:
+            raise ValueError(f"不支持的批量操作: {action}")
+        to_status, roles = cls.BULK_ACTIONS[action]
+        versions = versions or {}
+        style_codes = list(dict.fromkeys(style_codes))
+
+        if getattr(user, 'role', None) not in roles:
+            return [
+                {'style_code': code, 'success': False, 'message': '无法执行此操作，请检查用户权限', 'version': None}
+                for code in style_codes
+            ]
+
+        results = dict.fromkeys(style_codes)
+        with transaction.atomic():
+            current = {}
+            for start in range(0, len(style_codes), cls.BULK_CHUNK_SIZE):
+                chunk = style_codes[start:start + cls.BULK_CHUNK_SIZE]
+                current.update(
+                    (code, (status, version, creator_id)) for code, status, version, creator_id in
+                    cls.objects.select_for_update().filter(pk__in=chunk)
+                    .values_list('style_code', 'status', 'version', 'created_by_id')
+                )
+
+            eligible = {}
+            for code in style_codes:
+                if code not in current:
+                    results[code] = (False, 'BOM不存在', None)
+                    continue
+                status, version, _ = current[code]
+                expected = versions.get(code)
+                if expected is not None and str(expected) != str(version):
+                    results[code] = (False, str(WorkflowConflictError(code, status, expected)), version)
+                elif status == to_status:
+                    results[code] = (False, f"BOM已是{dict(cls.STATUS_CHOICES)[to_status]}状态", version)
+                else:
+                    eligible[code] = status
+                    results[code] = (True, '操作成功', version + 1)
+
+            now = timezone.now()
+            changes = {'confirmed_at': now} if action == 'approve' else {}
+            codes = list(eligible)
+            for start in range(0, len(codes), cls.BULK_CHUNK_SIZE):
+                chunk = codes[start:start + cls.BULK_CHUNK_SIZE]
+                cls.objects.filter(pk__in=chunk).update(
+                    status=to_status,
+                    version=models.F('version') + 1,
+                    updated_at=now,
+                    **changes
+                )
+            events = BomEvent.objects.bulk_create([
+                BomEvent(
+                    bom_id=code,
+                    action=action,
+                    actor=getattr(user, 'username', ''),
+                    actor_role=user.role,
+                    from_status=from_status,
+                    to_status=to_status,
+                    reason=reason,
+                    created_at=now
+                )
+                for code, from_status in eligible.items()
+            ], batch_size=cls.BULK_CHUNK_SIZE)
+            notifications = Notification.notify_transition(
+                action, user, codes, {current[code][2] for code in codes}, reason
+            )
+            bom_cache.invalidate(codes)
+            streams.publish_on_commit(events, notifications)
+            bom_metrics.count_transitions_on_commit(events)
+
+        return [
+            {'style_code': code, 'success': ok, 'message': message, 'version': version}
+            for code, (ok, message, version) in results.items()
+        ]
+
     def can_edit_by_user(self, user):
         """
         检查用户是否可以编辑此BOM
@@ -347,6 +602,17 @@ class BomDetail(models.Model):
         verbose_name='单价'
     )
     
+    # 换算到基础单位的用量（米 / 千克 / 个 / 套），由 units.py 在写入时维护；无法换算时为空
+    base_quantity = models.DecimalField(
+        max_digits=20,
+        decimal_places=6,
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='基础单位用量'
+    )
+    base_unit = models.CharField(max_length=10, blank=True, editable=False, verbose_name='基础单位')
+
     # 颜色相关
     color_requirement = models.CharField(
         max_length=200, 
@@ -370,16 +636,57 @@ class BomDetail(models.Model):
         db_table = 'bom_detail'
         unique_together = ['bom', 'sequence']
         ordering = ['bom', 'sequence']
+        indexes = [
+            # 跨款式物料用量汇总：按物料类型、基础单位分组 SUM(base_quantity)
+            models.Index(fields=['material_type', 'base_unit', 'base_quantity'], name='bom_detail_base_qty_idx'),
+            # 物料换算系数变化后重算该物料的明细
+            models.Index(fields=['material_code', 'usage_unit'], name='bom_detail_material_unit_idx'),
+        ]
 
     def __str__(self):
         return f"{self.bom.style_code} - {self.sequence:02d} - {self.material_name}"
 
+    def save(self, *args, **kwargs):
+        # 明细与BOM成本汇总在同一事务内写入（汇总由 signals.py 中的处理器维护）
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     @property
     def total_cost(self):
         """计算该明细的总成本"""
         return self.usage_quantity * self.unit_price
 
 
+class MaterialUnitFactor(models.Model):
+    """
+    物料单位换算系数 - 按物料编码覆盖固定换算（见 units.FIXED_CONVERSIONS）
+    例如某缝纫线 1 ROLL = 5000 M，某面料 1 KG = 3.2 M
+    """
+    id = models.AutoField(primary_key=True)
+    material_code = models.CharField(max_length=100, verbose_name='物料编码')
+    unit = models.CharField(max_length=10, choices=BomDetail.UNIT_CHOICES, verbose_name='单位')
+    base_unit = models.CharField(max_length=10, choices=BomDetail.UNIT_CHOICES, verbose_name='基础单位')
+    factor = models.DecimalField(
+        max_digits=16,
+        decimal_places=6,
+        validators=[MinValueValidator(Decimal('0.000001'))],
+        verbose_name='换算系数',
+        help_text='1 单位 = factor 基础单位'
+    )
+    notes = models.CharField(max_length=200, blank=True, verbose_name='备注')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+
+    class Meta:
+        verbose_name = '物料单位换算'
+        verbose_name_plural = '物料单位换算'
+        db_table = 'bom_material_unit_factor'
+        unique_together = ['material_code', 'unit']
+        ordering = ['material_code', 'unit']
+
+    def __str__(self):
+        return f"{self.material_code}: 1 {self.unit} = {self.factor} {self.base_unit}"
+
+
 class SizeSpec(models.Model):
     """尺码规格模型 - 管理每个BOM的尺码规格表"""
     SIZE_CHOICES = (
@@ -441,3 +748,248 @@ class SizeSpec(models.Model):
     def get_measurement(self, part_name):
         """获取指定部位的尺寸"""
         return self.measurements.get(part_name, 0)
+
+
+def measurement_value(value):
+    """尺寸值转为浮点数，非数字（含布尔、NaN、空字符串）返回 None"""
+    if isinstance(value, bool):
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if number == number and abs(number) != float('inf') else None
+
+
+class SizeMeasurement(models.Model):
+    """
+    尺码部位尺寸索引表 - SizeSpec.measurements 按部位展开，每个 (尺码规格, 部位) 一行
+
+    JSONField 无法建索引做范围查询；展开后 (部位, 尺码, 尺寸) 组合索引可以直接回答
+    "M码胸围在100到110之间的款式"。只由 SizeSpec 保存信号和 rebuild() 维护，不要直接写入。
+    """
+    id = models.BigAutoField(primary_key=True)
+
+    spec = models.ForeignKey(
+        SizeSpec,
+        on_delete=models.CASCADE,
+        related_name='measurement_rows',
+        db_index=False,  # 由 (spec, part) 唯一约束覆盖
+        verbose_name='尺码规格'
+    )
+    bom = models.ForeignKey(Bom, on_delete=models.CASCADE, related_name='+', verbose_name='所属BOM')
+    size = models.CharField(max_length=10, choices=SizeSpec.SIZE_CHOICES, verbose_name='尺码')
+    part = models.CharField(max_length=50, verbose_name='部位')
+    value = models.FloatField(verbose_name='尺寸')
+
+    class Meta:
+        verbose_name = '尺码部位尺寸'
+        verbose_name_plural = '尺码部位尺寸'
+        db_table = 'bom_size_measurement'
+        unique_together = ['spec', 'part']
+        indexes = [
+            models.Index(fields=['part', 'size', 'value'], name='bom_size_measure_range_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.bom_id} - {self.size} - {self.part}"
+
+    @classmethod
+    def rows_for(cls, spec_id, bom_id, size, measurements):
+        """由一条尺码规格展开出索引行（跳过非数字的尺寸）"""
+        rows = []
+        for part, value in (measurements or {}).items():
+            number = measurement_value(value)
+            if number is not None:
+                rows.append(cls(spec_id=spec_id, bom_id=bom_id, size=size, part=str(part)[:50], value=number))
+        return rows
+
+    @classmethod
+    def sync(cls, spec):
+        """单条尺码规格保存后重建其索引行"""
+        with transaction.atomic():
+            cls.objects.filter(spec_id=spec.pk).delete()
+            cls.objects.bulk_create(cls.rows_for(spec.pk, spec.bom_id, spec.size, spec.measurements))
+
+    @classmethod
+    def rebuild(cls, style_codes=None, batch_size=1000):
+        """
+        按BOM批量重建索引行（用于 bulk_create 等不触发信号的写入，以及全量回填）
+        style_codes 为 None 时重建全部。返回写入的行数
+        """
+        if style_codes is None:
+            style_codes = Bom.objects.order_by('style_code').values_list('style_code', flat=True)
+        written = 0
+        codes = iter(list(style_codes))
+        while True:
+            chunk = [code for _, code in zip(range(batch_size), codes)]
+            if not chunk:
+                return written
+            with transaction.atomic():
+                cls.objects.filter(bom_id__in=chunk).delete()
+                rows = []
+                specs = SizeSpec.objects.filter(bom_id__in=chunk).values_list('id', 'bom_id', 'size', 'measurements')
+                for spec_id, bom_id, size, measurements in specs.iterator():
+                    rows.extend(cls.rows_for(spec_id, bom_id, size, measurements))
+                cls.objects.bulk_create(rows, batch_size=batch_size)
+            written += len(rows)
+
+
+class BomEvent(models.Model):
+    """BOM工作流事件 - 只追加的状态变更记录，替代在 notes 中拼接历史"""
+    ACTION_CHOICES = (
+        ('submit_for_details', '提交明细填写'),
+        ('submit_to_craft', '提交工艺'),
+        ('approve', '批准'),
+        ('reject', '驳回'),
+    )
+
+    id = models.BigAutoField(primary_key=True)
+
+    bom = models.ForeignKey(
+        Bom,
+        on_delete=models.CASCADE,
+        related_name='events',
+        db_index=False,  # 由 (bom, created_at) 组合索引覆盖
+        verbose_name='所属BOM'
+    )
+    action = models.CharField(max_length=30, choices=ACTION_CHOICES, verbose_name='操作')
+    actor = models.CharField(max_length=150, blank=True, verbose_name='操作人')
+    actor_role = models.CharField(max_length=20, blank=True, verbose_name='操作人角色')
+    from_status = models.CharField(max_length=20, blank=True, choices=Bom.STATUS_CHOICES, verbose_name='原状态')
+    to_status = models.CharField(max_length=20, choices=Bom.STATUS_CHOICES, verbose_name='新状态')
+    reason = models.TextField(blank=True, verbose_name='原因')
+    created_at = models.DateTimeField(default=timezone.now, verbose_name='发生时间')
+
+    class Meta:
+        verbose_name = 'BOM工作流事件'
+        verbose_name_plural = 'BOM工作流事件'
+        db_table = 'bom_event'
+        ordering = ['-created_at', '-id']
+        indexes = [
+            # 单个BOM的历史（按时间倒序分页）
+            models.Index(fields=['bom', '-created_at', '-id'], name='bom_event_bom_created_idx'),
+            # 审计查询，如某段时间内的全部驳回
+            models.Index(fields=['to_status', '-created_at', '-id'], name='bom_event_status_created_idx'),
+            models.Index(fields=['action', '-created_at', '-id'], name='bom_event_action_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.bom_id} {self.from_status} -> {self.to_status}"
+
+
+class Notification(models.Model):
+    """站内通知 - 工作流转换时按角色批量写入收件箱"""
+    TYPE_CHOICES = (
+        ('status_change', '状态变更'),
+        ('approval', '批准'),
+        ('rejection', '驳回'),
+        ('message', '消息'),
+    )
+
+    # 工作流操作 -> (通知类型, 接收角色, 标题)；BOM创建人总会收到通知
+    TRANSITION_RULES = {
+        'submit_for_details': ('status_change', ('designer',), 'BOM待填写明细'),
+        'submit_to_craft': ('status_change', ('pattern_maker',), 'BOM待工艺处理'),
+        'approve': ('approval', ('designer', 'pattern_maker'), 'BOM已批准'),
+        'reject': ('rejection', ('pattern_maker',), 'BOM被驳回'),
+    }
+    BATCH_SIZE = 1000
+
+    id = models.BigAutoField(primary_key=True)
+
+    recipient = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='notifications',
+        db_index=False,  # 由 (recipient, ...) 组合索引覆盖
+        verbose_name='接收人'
+    )
+    bom = models.ForeignKey(
+        Bom,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='notifications',
+        verbose_name='相关BOM'
+    )
+    notification_type = models.CharField(
+        max_length=20, choices=TYPE_CHOICES, default='message', verbose_name='通知类型'
+    )
+    title = models.CharField(max_length=100, verbose_name='标题')
+    message = models.TextField(blank=True, verbose_name='内容')
+    is_read = models.BooleanField(default=False, verbose_name='是否已读')
+    created_at = models.DateTimeField(default=timezone.now, verbose_name='创建时间')
+    read_at = models.DateTimeField(null=True, blank=True, verbose_name='阅读时间')
+
+    class Meta:
+        verbose_name = '通知'
+        verbose_name_plural = '通知'
+        db_table = 'bom_notification'
+        ordering = ['-created_at', '-id']
+        indexes = [
+            # 未读收件箱、未读数、全部已读
+            models.Index(
+                fields=['recipient', 'is_read', '-created_at', '-id'],
+                name='bom_notif_recipient_read_idx'
+            ),
+            # 完整收件箱按时间倒序分页
+            models.Index(fields=['recipient', '-created_at', '-id'], name='bom_notif_recipient_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.recipient_id} - {self.title}"
+
+    @classmethod
+    def notify_transition(cls, action, user, style_codes, creator_ids=(), reason=""):
+        """
+        工作流转换后的通知扇出：一次查询取接收人，一次 bulk_create 写入
+
+        单个BOM转换时每人一条针对该BOM的通知；批量转换时每人只收到一条汇总通知，
+        避免 BOM数 × 用户数 的写放大
+        """
+        if action not in cls.TRANSITION_RULES or not style_codes:
+            return []
+        notification_type, roles, title = cls.TRANSITION_RULES[action]
+        actor = getattr(user, 'username', '')
+
+        recipients = (
+            User.objects.filter(is_active=True)
+            .filter(models.Q(role__in=roles) | models.Q(pk__in=[pk for pk in creator_ids if pk]))
+            .exclude(username=actor)
+            .values_list('pk', flat=True)
+        )
+
+        if len(style_codes) == 1:
+            bom_id = style_codes[0]
+            message = f"[{actor}] {title}：{bom_id}"
+        else:
+            bom_id = None
+            preview = '、'.join(style_codes[:5])
+            message = f"[{actor}] {title}：{preview} 等 {len(style_codes)} 个BOM"
+        if reason:
+            message += f"，原因：{reason}"
+
+        now = timezone.now()
+        return cls.objects.bulk_create([
+            cls(
+                recipient_id=recipient_id,
+                bom_id=bom_id,
+                notification_type=notification_type,
+                title=title,
+                message=message,
+                created_at=now
+            )
+            for recipient_id in recipients.iterator()
+        ], batch_size=cls.BATCH_SIZE)
+
+    @classmethod
+    def unread_count(cls, user):
+        return cls.objects.filter(recipient=user, is_read=False).count()
+
+    @classmethod
+    def mark_all_read(cls, user):
+        """一条 UPDATE 把该用户的未读通知全部标记为已读，返回更新条数"""
+        return cls.objects.filter(recipient=user, is_read=False).update(
+            is_read=True, read_at=timezone.now()
+        )
@@ -0,0 +1,158 @@
+"""
+物料需求展开（MRP）
+
+把订单行（款式 × 颜色 × 尺码 × 件数）乘以BOM明细用量，按 (物料编码, 供应商, 单位) 汇总物料需求。
+
+计算步骤：
+1. 按款式汇总订单件数（BOM用量按件计，不区分颜色和尺码）
+2. 一条查询读取涉及款式的全部 BomDetail
+3. 用量（3位小数）、单价（4位小数）换算为整数（×1000、×10000），
+   需求 = 用量 × 件数、成本 = 用量 × 件数 × 单价 全部用整数数组计算后按物料分组累加，没有浮点误差
+
+舍入规则：
+- demand（需求量）：Σ 用量 × 件数，件数为整数，结果精确为3位小数，不做舍入
+- purchase_quantity（采购量）：需求量向上取整到整数单位（ROUND_CEILING），不足一个单位按一个单位采购
+- cost（成本）：每个物料先精确累加 Σ 用量 × 件数 × 单价（7位小数），再四舍五入（ROUND_HALF_UP）到分；
+  total_cost 为各物料未舍入成本之和再舍入一次，因此可能与各物料舍入后的和相差几分
+- 物料编码为空时以物料名称代替编码参与分组
+"""
+from decimal import ROUND_CEILING, ROUND_HALF_UP, Decimal
+
+import numpy as np
+
+from .models import BomDetail
+
+MAX_LINES = 100000
+MAX_LINE_QUANTITY = 10 ** 7
+USAGE_SCALE = 3   # BomDetail.usage_quantity 的小数位数
+PRICE_SCALE = 4   # BomDetail.unit_price 的小数位数
+DEMAND_QUANTIZE = Decimal('0.001')
+COST_QUANTIZE = Decimal('0.01')
+INT64_LIMIT = 2 ** 63 - 1
+
+
+class ExplosionError(ValueError):
+    """订单行格式无效"""
+
+
+def parse_lines(lines):
+    """
+    校验订单行 [{style_code, color, size, quantity}, ...]，color、size 可省略
+    返回 (款式编码列表, 件数列表)，与订单行一一对应
+    """
+    if not isinstance(lines, list) or not lines:
+        raise ExplosionError('lines 必须是非空的订单行列表')
+    if len(lines) > MAX_LINES:
+        raise ExplosionError(f'一次最多展开 {MAX_LINES} 个订单行')
+    codes, quantities = [], []
+    for index, line in enumerate(lines, start=1):
+        if not isinstance(line, dict):
+            raise ExplosionError(f'第 {index} 行必须是对象')
+        code = str(line.get('style_code') or '').strip()
+        if not code:
+            raise ExplosionError(f'第 {index} 行缺少 style_code')
+        quantity = line.get('quantity')
+        if isinstance(quantity, str) and quantity.strip().isdigit():
+            quantity = int(quantity)
+        if isinstance(quantity, bool) or not isinstance(quantity, int) or not 0 < quantity <= MAX_LINE_QUANTITY:
+            raise ExplosionError(f'第 {index} 行 quantity 必须是 1 到 {MAX_LINE_QUANTITY} 之间的整数')
+        codes.append(code)
+        quantities.append(quantity)
+    return codes, quantities
+
+
+def _int_array(values, limit):
+    """整数数组：可能超出 int64 时改用 Python 整数（object），保证精确"""
+    return np.array(values, dtype=np.int64 if limit <= INT64_LIMIT else object)
+
+
+def explode(lines):
+    """
+    展开订单行，返回：
+    {
+        'materials': [{material_code, material_name, supplier_name, usage_unit, demand,
+                       purchase_quantity, cost, styles}],   # 按物料编码、供应商、单位排序
+        'total_cost': 总成本, 'order_lines': 订单行数, 'order_quantity': 总件数,
+        'missing_styles': 不存在或没有明细的款式编码,
+    }
+    数量和金额均为字符串，避免 JSON 浮点数丢失精度
+    """
+    codes, quantities = parse_lines(lines)
+
+    # 1. 按款式汇总件数
+    style_index = {}
+    style_ids = np.array([style_index.setdefault(code, len(style_index)) for code in codes])
+    style_quantity = np.zeros(len(style_index), dtype=np.int64)
+    np.add.at(style_quantity, style_ids, np.array(quantities, dtype=np.int64))
+
+    # 2. 一条查询读取全部明细
+    details = list(
+        BomDetail.objects.filter(bom_id__in=list(style_index))
+        .order_by('bom_id', 'sequence')
+        .values_list('bom_id', 'material_code', 'material_name', 'supplier_name', 'usage_unit',
+                     'usage_quantity', 'unit_price')
+    )
+    found = {row[0] for row in details}
+    result = {
+        'materials': [],
+        'total_cost': str(Decimal(0).quantize(COST_QUANTIZE)),
+        'order_lines': len(codes),
+        'order_quantity': int(style_quantity.sum()),
+        'missing_styles': sorted(set(style_index) - found),
+    }
+    if not details:
+        return result
+
+    # 3. 整数化后逐行计算需求和成本，按物料分组累加
+    groups, group_ids, names, styles = {}, [], [], []
+    usage, price = [], []
+    for code, material_code, material_name, supplier_name, unit, usage_quantity, unit_price in details:
+        key = (material_code or material_name, supplier_name, unit)
+        group = groups.setdefault(key, len(groups))
+        if group == len(names):
+            names.append((material_code, material_name))
+            styles.append(set())
+        styles[group].add(code)
+        group_ids.append(group)
+        usage.append(int(usage_quantity.scaleb(USAGE_SCALE)))
+        price.append(int(unit_price.scaleb(PRICE_SCALE)))
+
+    line_quantity = style_quantity[[style_index[row[0]] for row in details]]
+    max_quantity = int(style_quantity.max())
+    max_usage, max_price = max(usage), max(price)
+    # 分组累加的上限按全部行之和估计
+    demand_limit = max_usage * max_quantity * len(details)
+    cost_limit = demand_limit * max(max_price, 1)
+    demand = _int_array(usage, demand_limit) * _int_array(line_quantity.tolist(), demand_limit)
+    cost = demand.astype(object if cost_limit > INT64_LIMIT else np.int64) * _int_array(price, cost_limit)
+
+    group_ids = np.array(group_ids)
+    demand_total = np.zeros(len(groups), dtype=demand.dtype)
+    cost_total = np.zeros(len(groups), dtype=cost.dtype)
+    np.add.at(demand_total, group_ids, demand)
+    np.add.at(cost_total, group_ids, cost)
+
+    materials = []
+    for (_, supplier_name, unit), group in groups.items():
+        quantity = Decimal(int(demand_total[group])).scaleb(-USAGE_SCALE).quantize(DEMAND_QUANTIZE)
+        material_code, material_name = names[group]
+        materials.append({
+            'material_code': material_code,
+            'material_name': material_name,
+            'supplier_name': supplier_name,
+            'usage_unit': unit,
+            'demand': str(quantity),
+            'purchase_quantity': str(quantity.to_integral_value(rounding=ROUND_CEILING)),
+            'cost': str(_cost(cost_total[group])),
+            'styles': len(styles[group]),
+        })
+    materials.sort(key=lambda item: (item['material_code'] or item['material_name'],
+                                     item['supplier_name'], item['usage_unit']))
+    result['materials'] = materials
+    result['total_cost'] = str(_cost(sum(int(value) for value in cost_total)))
+    return result
+
+
+def _cost(scaled):
+    """整数化的成本（用量×单价 共7位小数）换算为金额，四舍五入到分"""
+    return Decimal(int(scaled)).scaleb(-(USAGE_SCALE + PRICE_SCALE)).quantize(COST_QUANTIZE, rounding=ROUND_HALF_UP)
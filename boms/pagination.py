@@ -0,0 +1,195 @@
+import base64
+import datetime
+import json
+from collections import OrderedDict
+from decimal import Decimal
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class BomCursorPagination(BasePagination):
+    """
+    BOM列表游标分页（键集分页）
+
+    以当前排序字段加主键 style_code 作为复合游标，例如默认排序下为
+    (created_at, style_code)。翻页条件直接落在排序列上，深页与首页的
+    查询代价一致，不需要 OFFSET 也不需要 COUNT(*)。
+
+    支持参数：
+    - ?cursor=<不透明游标>
+    - ?page_size=50（不超过 max_page_size）
+    - 与 OrderingFilter 配合：?ordering=-updated_at
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    tiebreaker = 'style_code'
+    invalid_cursor_message = '无效的分页游标'
+
+    def __init__(self):
+        self.page_size = api_settings.PAGE_SIZE or 50
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.model = queryset.model
+        self.ordering = self.get_ordering(queryset)
+
+        cursor = self.decode_cursor(request)
+        reverse = bool(cursor and cursor['reverse'])
+
+        # 向前翻页时反转排序方向，取到结果后再倒序还原
+        query_ordering = [(name, desc != reverse) for name, desc in self.ordering]
+        queryset = queryset.order_by(
+            *[f'-{name}' if desc else name for name, desc in query_ordering]
+        )
+        if cursor is not None:
+            queryset = queryset.filter(self._position_filter(query_ordering, cursor['position']))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+
+        if reverse:
+            rows.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = cursor is not None
+
+        self.page = rows
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def get_ordering(self, queryset):
+        """
+        从查询集中读取排序（OrderingFilter 已校验过 ordering_fields），
+        并追加 style_code 作为唯一的决胜字段
+        """
+        order_by = list(queryset.query.order_by) or list(queryset.model._meta.ordering)
+        ordering = []
+        for item in order_by:
+            if not isinstance(item, str):
+                continue
+            desc = item.startswith('-')
+            name = item.lstrip('-')
+            if name == 'pk':
+                name = self.tiebreaker
+            if name not in [n for n, _ in ordering]:
+                ordering.append((name, desc))
+        if self.tiebreaker not in [n for n, _ in ordering]:
+            last_desc = ordering[-1][1] if ordering else False
+            ordering.append((self.tiebreaker, last_desc))
+        return ordering
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def encode_cursor(self, obj, reverse):
+        # 页面中可以是模型实例，也可以是 values() 的字典（列表快速序列化路径）
+        get = obj.get if isinstance(obj, dict) else lambda name: getattr(obj, name)
+        position = [self._dump_value(get(name)) for name, _ in self.ordering]
+        payload = json.dumps({'p': position, 'r': int(reverse)}, separators=(',', ':'))
+        encoded = base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            position = payload['p']
+            if len(position) != len(self.ordering):
+                raise ValueError('cursor length mismatch')
+            return {
+                'position': [
+                    self._load_value(name, value)
+                    for (name, _), value in zip(self.ordering, position)
+                ],
+                'reverse': bool(payload.get('r')),
+            }
+        except (TypeError, ValueError, KeyError, UnicodeError, ValidationError, FieldDoesNotExist):
+            raise NotFound(self.invalid_cursor_message)
+
+    def _position_filter(self, ordering, position):
+        """
+        构造字典序比较条件：
+        (a > x) OR (a = x AND b > y) OR (a = x AND b = y AND c > z) ...
+        """
+        condition = Q()
+        equal_prefix = Q()
+        for (name, desc), value in zip(ordering, position):
+            lookup = 'lt' if desc else 'gt'
+            condition |= equal_prefix & Q(**{f'{name}__{lookup}': value})
+            equal_prefix &= Q(**{name: value})
+        return condition
+
+    def _dump_value(self, value):
+        if isinstance(value, (datetime.datetime, datetime.date)):
+            return value.isoformat()
+        if isinstance(value, Decimal):
+            return str(value)
+        return value
+
+    def _load_value(self, name, value):
+        field = self.model._meta.get_field(name)
+        return field.to_python(value)
+
+
+class BomEventPagination(BomCursorPagination):
+    """BOM工作流事件游标分页，按 (created_at, id) 倒序翻页"""
+    tiebreaker = 'id'
+
+
+class NotificationPagination(BomCursorPagination):
+    """通知收件箱游标分页，按 (created_at, id) 倒序翻页"""
+    tiebreaker = 'id'
+
+
+class SizeSpecPagination(BomCursorPagination):
+    """尺码规格查询游标分页，按 id 翻页"""
+    tiebreaker = 'id'
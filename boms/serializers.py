@@ -1,5 +1,8 @@
+import decimal
+
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Bom, BomDetail, SizeSpec, User
+from .models import Bom, BomDetail, BomEvent, Notification, SizeSpec, User
 
 
 class BomSerializer(serializers.ModelSerializer):
@@ -12,11 +15,197 @@ class BomSerializer(serializers.ModelSerializer):
         fields = [
             'style_code', 'product_name', 'season', 'year', 'wave', 'category',
             'dev_colors', 'dev_colors_list', 'target_price', 'estimated_cost', 
-            'total_cost', 'fabric_composition', 'fabric_weight', 'care_instructions', 
+            'total_cost', 'detail_count', 'material_costs',
+            'fabric_composition', 'fabric_weight', 'care_instructions', 
             'status', 'version', 'notes', 'created_at', 'updated_at', 'confirmed_at'
         ]
-        read_only_fields = ['created_at', 'updated_at', 'confirmed_at', 'total_cost']
+        read_only_fields = [
+            'created_at', 'updated_at', 'confirmed_at', 'total_cost', 'detail_count', 'material_costs'
+        ]
     
+    def __init__(self, *args, fields=None, **kwargs):
+        """fields: 只输出这些字段（稀疏字段集，见 select_fields），缺省输出全部"""
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
     def get_total_cost(self, obj):
-        """计算BOM总成本"""
+        """BOM总成本（读取明细维护的汇总字段）"""
         return obj.get_total_cost()
+
+
+# 预定义的字段集合（?profile=），compact 为前端BOM列表页实际展示的列
+BOM_FIELD_PROFILES = {
+    'compact': [
+        'style_code', 'product_name', 'season', 'year', 'wave', 'category',
+        'dev_colors_list', 'target_price', 'total_cost', 'status', 'version', 'updated_at',
+    ],
+}
+
+
+def select_fields(query_params, available, profiles=BOM_FIELD_PROFILES):
+    """
+    解析稀疏字段集参数，返回按 available 顺序排列的字段列表；未指定任何参数时返回 None（全部字段）
+
+    - ?fields=style_code,status 只返回这些字段
+    - ?profile=compact 使用预定义的字段集合（同时给出 fields 时以 fields 为准）
+    - ?omit=notes,care_instructions 在以上结果中去掉这些字段
+    未知字段或集合名抛出 ValidationError（400）
+    """
+    def names(param):
+        value = query_params.get(param, '')
+        return [name.strip() for name in value.split(',') if name.strip()]
+
+    requested, omitted, profile = names('fields'), names('omit'), query_params.get('profile', '')
+    if not (requested or omitted or profile):
+        return None
+    if profile and profile not in profiles:
+        raise serializers.ValidationError({'profile': f"未知的字段集合 {profile}，可选: {', '.join(profiles)}"})
+    unknown = [name for name in requested + omitted if name not in available]
+    if unknown:
+        raise serializers.ValidationError({'fields': f"未知字段: {', '.join(unknown)}"})
+
+    selected = set(requested or (profiles[profile] if profile else available)) - set(omitted)
+    return [name for name in available if name in selected]
+
+
+def bom_columns(fields):
+    """输出字段 -> 需要读取的 Bom 列（dev_colors_list 由 dev_colors 计算）"""
+    columns = [name for name in fields if name != 'dev_colors_list']
+    if 'dev_colors_list' in fields and 'dev_colors' not in columns:
+        columns.append('dev_colors')
+    return columns
+
+
+class BomListRowSerializer:
+    """
+    BomSerializer 的只读快速路径，用于列表响应
+
+    只用 values() 取 BomSerializer 需要的列，在一个循环里把每行转换成与 BomSerializer
+    输出相同的字段顺序和JSON类型，跳过 ModelSerializer 逐字段的 get_attribute/to_representation。
+    渲染出的JSON与 BomSerializer 逐字节一致（见 tests.BomFastListTests）：
+    - DecimalField 按模型的小数位数量化后输出字符串，total_cost 与 JSON 编码器一样转成数值
+    - 时间按当前时区输出 ISO 8601（UTC 以 Z 结尾）
+    行中不含 Decimal/datetime，JSON 编码时不会回调编码器的 default()
+    """
+
+    def __init__(self, fields=None):
+        """fields: 稀疏字段集（见 select_fields），缺省为 BomSerializer 的全部字段"""
+        self.fields = BomSerializer.Meta.fields if fields is None else fields
+        self.columns = bom_columns(self.fields)
+        self.timezone = timezone.get_current_timezone()
+        self.converters = []
+        for name in self.columns:
+            field = Bom._meta.get_field(name)
+            if name == 'total_cost':
+                # 与 BomSerializer.get_total_cost 返回 Decimal、再由 JSON 编码器 float() 一致
+                converter = float
+            elif field.get_internal_type() == 'DecimalField':
+                converter = self._decimal_converter(field)
+            elif field.get_internal_type() == 'DateTimeField':
+                converter = self._datetime
+            else:
+                converter = None
+            if converter is not None:
+                self.converters.append((name, converter))
+
+    def _decimal_converter(self, field):
+        exponent = decimal.Decimal('.1') ** field.decimal_places
+        context = decimal.getcontext().copy()
+        context.prec = field.max_digits
+
+        def convert(value):
+            return f'{value.quantize(exponent, context=context):f}'
+        return convert
+
+    def _datetime(self, value):
+        value = value.astimezone(self.timezone).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+
+    def to_representation(self, row):
+        """values() 的一行 -> 与 BomSerializer(instance).data 相同的字典（不修改原行，分页游标还要用）"""
+        data = dict(row)
+        for name, convert in self.converters:
+            value = data[name]
+            if value is not None:
+                data[name] = convert(value)
+        if 'dev_colors' in data:
+            dev_colors = data['dev_colors']
+            data['dev_colors_list'] = [color.strip() for color in dev_colors.split('/')] if dev_colors else []
+        return {name: data[name] for name in self.fields}
+
+    def serialize(self, rows):
+        return [self.to_representation(row) for row in rows]
+
+
+class BomDetailSerializer(serializers.ModelSerializer):
+    """BOM明细序列化器"""
+    total_cost = serializers.ReadOnlyField()  # 使用模型中的属性
+
+    class Meta:
+        model = BomDetail
+        fields = [
+            'id', 'sequence', 'material_type', 'material_name', 'material_code', 'specification',
+            'supplier_name', 'supplier_code', 'usage_quantity', 'usage_unit', 'base_quantity', 'base_unit',
+            'unit_price', 'total_cost', 'color_requirement', 'craft_requirement', 'notes',
+            'created_at', 'updated_at'
+        ]
+        read_only_fields = ['base_quantity', 'base_unit', 'created_at', 'updated_at']
+
+
+class SizeSpecSerializer(serializers.ModelSerializer):
+    """尺码规格序列化器"""
+
+    class Meta:
+        model = SizeSpec
+        fields = ['id', 'size', 'measurements', 'sort_order', 'is_active', 'created_at', 'updated_at']
+        read_only_fields = ['created_at', 'updated_at']
+
+
+class SizeSpecQuerySerializer(SizeSpecSerializer):
+    """尺码规格查询结果 - 附带所属款式编码"""
+    style_code = serializers.CharField(source='bom_id', read_only=True)
+
+    class Meta(SizeSpecSerializer.Meta):
+        fields = ['style_code'] + SizeSpecSerializer.Meta.fields
+
+
+class BomDocumentSerializer(BomSerializer):
+    """
+    BOM完整文档序列化器 - BOM主表 + 按序号排列的明细 + 启用的尺码规格
+    需配合 views.bom_document_queryset() 的预取使用，避免逐个BOM查询
+    """
+    details = BomDetailSerializer(many=True, read_only=True)
+    size_specs = SizeSpecSerializer(many=True, read_only=True, source='active_size_specs')
+
+    class Meta(BomSerializer.Meta):
+        fields = BomSerializer.Meta.fields + ['details', 'size_specs']
+
+
+class BomEventSerializer(serializers.ModelSerializer):
+    """BOM工作流事件序列化器（只读）"""
+    style_code = serializers.CharField(source='bom_id', read_only=True)
+
+    class Meta:
+        model = BomEvent
+        fields = [
+            'id', 'style_code', 'action', 'actor', 'actor_role',
+            'from_status', 'to_status', 'reason', 'created_at'
+        ]
+        read_only_fields = fields
+
+
+class NotificationSerializer(serializers.ModelSerializer):
+    """通知序列化器"""
+    style_code = serializers.CharField(source='bom_id', read_only=True)
+
+    class Meta:
+        model = Notification
+        fields = [
+            'id', 'notification_type', 'title', 'message', 'style_code',
+            'is_read', 'created_at', 'read_at'
+        ]
+        read_only_fields = fields
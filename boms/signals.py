@@ -0,0 +1,117 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import cache as bom_cache
+from . import instrumentation, units
+from .models import Bom, BomDetail, MaterialUnitFactor, SizeMeasurement, SizeSpec
+
+
+def _detail_cost(detail):
+    """明细成本（与 BomDetail.total_cost 一致）"""
+    return (detail.usage_quantity or 0) * (detail.unit_price or 0)
+
+
+@receiver(pre_save, sender=BomDetail)
+def remember_previous_detail(sender, instance, raw=False, **kwargs):
+    """记录更新前的明细，用于计算汇总变化量"""
+    instance._rollup_previous = None
+    if raw or instance.pk is None:
+        return
+    instance._rollup_previous = (
+        BomDetail.objects.filter(pk=instance.pk)
+        .only('bom_id', 'material_type', 'usage_quantity', 'unit_price')
+        .first()
+    )
+
+
+@receiver(pre_save, sender=BomDetail)
+def normalize_detail_quantity(sender, instance, raw=False, **kwargs):
+    """保存明细前换算基础单位用量"""
+    if not raw:
+        units.apply([instance])
+
+
+@receiver(pre_save, sender=MaterialUnitFactor)
+def remember_previous_factor_code(sender, instance, raw=False, **kwargs):
+    instance._previous_material_code = None
+    if not raw and instance.pk is not None:
+        instance._previous_material_code = (
+            MaterialUnitFactor.objects.filter(pk=instance.pk).values_list('material_code', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=MaterialUnitFactor)
+@receiver(post_delete, sender=MaterialUnitFactor)
+def renormalize_on_factor_change(sender, instance, raw=False, **kwargs):
+    """换算系数增删改后重算该物料（修改物料编码时新旧物料都重算）的明细"""
+    if raw:
+        return
+    previous = getattr(instance, '_previous_material_code', None)
+    units.renormalize({instance.material_code, previous} - {None})
+
+
+@receiver(post_save, sender=BomDetail)
+def update_rollup_on_detail_save(sender, instance, created, raw=False, **kwargs):
+    """明细新增/修改后增量更新所属BOM的成本汇总"""
+    if raw:
+        return
+    previous = getattr(instance, '_rollup_previous', None)
+    instance._rollup_previous = None
+    instance._cache_previous_bom_id = previous.bom_id if previous is not None else None
+    if (previous is not None and previous.bom_id == instance.bom_id
+            and previous.material_type == instance.material_type):
+        # 同一BOM、同一物料类型的修改只需更新一次差额
+        delta = _detail_cost(instance) - _detail_cost(previous)
+        if delta:
+            Bom.apply_cost_delta(instance.bom_id, instance.material_type, delta, 0)
+        return
+    if previous is not None:
+        Bom.apply_cost_delta(previous.bom_id, previous.material_type, -_detail_cost(previous), -1)
+    Bom.apply_cost_delta(instance.bom_id, instance.material_type, _detail_cost(instance), 1)
+
+
+@receiver(post_delete, sender=BomDetail)
+def update_rollup_on_detail_delete(sender, instance, **kwargs):
+    """明细删除后（包括查询集批量删除）扣减所属BOM的成本汇总"""
+    Bom.apply_cost_delta(instance.bom_id, instance.material_type, -_detail_cost(instance), -1)
+
+
+@receiver(post_save, sender=Bom)
+@receiver(post_delete, sender=Bom)
+def invalidate_bom_cache(sender, instance, raw=False, **kwargs):
+    """BOM主表写入后使列表和该BOM的文档缓存失效"""
+    if not raw:
+        bom_cache.invalidate([instance.pk])
+
+
+@receiver(post_save, sender=BomDetail)
+@receiver(post_delete, sender=BomDetail)
+@receiver(post_save, sender=SizeSpec)
+@receiver(post_delete, sender=SizeSpec)
+def invalidate_parent_bom_cache(sender, instance, raw=False, **kwargs):
+    """明细、尺码写入后使所属BOM的缓存失效（修改所属BOM时新旧BOM都失效）"""
+    if raw:
+        return
+    previous = getattr(instance, '_cache_previous_bom_id', None)
+    bom_cache.invalidate([instance.bom_id, previous])
+
+
+@receiver(pre_save, sender=SizeSpec)
+def remember_previous_size_spec_bom(sender, instance, raw=False, **kwargs):
+    instance._cache_previous_bom_id = None
+    if not raw and instance.pk is not None:
+        instance._cache_previous_bom_id = (
+            SizeSpec.objects.filter(pk=instance.pk).values_list('bom_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=SizeSpec)
+def sync_size_measurements(sender, instance, raw=False, **kwargs):
+    """尺码保存后重建部位尺寸索引行（删除由外键级联完成）"""
+    if not raw:
+        SizeMeasurement.sync(instance)
+
+
+# 每个新建的数据库连接都挂上请求级SQL统计（见 boms/instrumentation.py）
+connection_created.connect(instrumentation.install_query_recorder, dispatch_uid='boms.install_query_recorder')
@@ -0,0 +1,83 @@
+"""
+尺码表透视
+
+把一个BOM的多条 SizeSpec（每个尺码一行、measurements 为 {部位: 尺寸}）转成列式矩阵：
+
+    {"style_code": "A", "sizes": ["S", "M"], "parts": ["胸围", "衣长"], "values": [[96, 66], [100, 68]]}
+
+sizes 按 sort_order（再按尺码顺序）排列，parts 为该BOM全部尺码部位的并集（按首次出现的顺序），
+values[i][j] 为第 i 个尺码第 j 个部位的尺寸，缺失为 null。只包含启用的尺码和数字尺寸。
+
+多个BOM用一条查询读出全部尺码，展开后在一个 (尺码行数, 部位数) 的 NumPy 矩阵中一次填充，
+再按BOM切片取出各自的行和出现过的列。
+"""
+import numpy as np
+
+from .models import SizeSpec, measurement_value
+
+MAX_STYLE_CODES = 500
+
+
+def _size_rows(style_codes):
+    """一条查询读取这些BOM的启用尺码，按BOM、排序号、尺码顺序排列"""
+    size_order = {code: index for index, (code, _) in enumerate(SizeSpec.SIZE_CHOICES)}
+    rows = list(
+        SizeSpec.objects.filter(bom_id__in=style_codes, is_active=True)
+        .values_list('bom_id', 'size', 'sort_order', 'measurements')
+    )
+    rows.sort(key=lambda row: (row[0], row[2], size_order.get(row[1], len(size_order))))
+    return rows
+
+
+def _output(value):
+    if value != value:  # NaN
+        return None
+    return int(value) if value.is_integer() else value
+
+
+def pivot(style_codes):
+    """
+    返回 {style_code: {'style_code', 'sizes', 'parts', 'values'}}；
+    没有启用尺码的BOM返回空矩阵
+    """
+    style_codes = list(dict.fromkeys(style_codes))
+    rows = _size_rows(style_codes)
+    charts = {code: {'style_code': code, 'sizes': [], 'parts': [], 'values': []} for code in style_codes}
+    if not rows:
+        return charts
+
+    # 展开为 (行号, 部位号, 尺寸) 三元组，部位按全局首次出现编号
+    part_index = {}
+    row_ids, part_ids, numbers = [], [], []
+    for row_id, (_, _, _, measurements) in enumerate(rows):
+        for part, value in (measurements or {}).items():
+            number = measurement_value(value)
+            if number is None:
+                continue
+            row_ids.append(row_id)
+            part_ids.append(part_index.setdefault(part, len(part_index)))
+            numbers.append(number)
+    parts = np.array(list(part_index), dtype=object)
+
+    matrix = np.full((len(rows), len(parts)), np.nan)
+    # 每个单元格在展开序列中的位置，用于按BOM内首次出现的顺序排列部位
+    first_seen = np.full((len(rows), len(parts)), len(numbers))
+    if numbers:
+        matrix[row_ids, part_ids] = numbers
+        np.minimum.at(first_seen, (row_ids, part_ids), np.arange(len(numbers)))
+
+    # 每个BOM在 rows 中是连续的一段
+    boms = np.array([row[0] for row in rows], dtype=object)
+    starts = np.flatnonzero(np.r_[True, boms[1:] != boms[:-1]])
+    ends = np.r_[starts[1:], len(rows)]
+    for start, end in zip(starts, ends):
+        order = first_seen[start:end].min(axis=0)
+        columns = np.argsort(order, kind='stable')[:int((order < len(numbers)).sum())]
+        block = matrix[start:end][:, columns]
+        charts[boms[start]] = {
+            'style_code': boms[start],
+            'sizes': [row[1] for row in rows[start:end]],
+            'parts': parts[columns].tolist(),
+            'values': [[_output(value) for value in line] for line in block.tolist()],
+        }
+    return charts
@@ -0,0 +1,287 @@
+"""
+BOM实时事件流（Server-Sent Events）的发布/订阅
+
+频道：
+- boms                 所有BOM的工作流转换
+- bom:<style_code>     单个BOM的工作流转换
+- user:<id>            某个用户的通知
+
+后端通过 settings.BOM_STREAM_BACKEND 指定（点分路径，可自行扩展）：
+- LocalBroker     进程内分发，单进程部署或开发环境使用；工作流转换提交后直接推送
+- DatabaseBroker  多个 worker 时使用：每个 worker 一个轮询任务按自增 id 读取
+                  bom_event / bom_notification 的新行再分发给本进程的订阅者，
+                  轮询开销与连接数无关；晚提交的小 id 行见 IdCursor
+
+每个订阅者只占用一个有界 asyncio.Queue，空闲连接不占线程，单个 worker 可保持数千连接。
+订阅者处理不过来（队列满）时丢弃后续消息并标记 overflowed，由流接口通知客户端重新拉取。
+"""
+import asyncio
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+ALL_BOMS = 'boms'
+QUEUE_SIZE = 256
+
+
+def bom_channel(style_code):
+    return f'bom:{style_code}'
+
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+
+class Subscription:
+    """一个SSE连接的订阅：绑定创建它的事件循环，可从任意线程安全地投递消息"""
+
+    def __init__(self, broker, channels, loop):
+        self.broker = broker
+        self.channels = frozenset(channels)
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.overflowed = False
+
+    def deliver(self, message):
+        """在订阅者自己的事件循环中入队（publish 可能来自同步视图的工作线程）"""
+        if self.loop.is_closed():
+            return
+        self.loop.call_soon_threadsafe(self._put, message)
+
+    def _put(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def get(self, timeout):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class LocalBroker:
+    """进程内发布/订阅"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._channels = {}
+
+    def subscribe(self, channels):
+        subscription = Subscription(self, channels, asyncio.get_running_loop())
+        with self._lock:
+            for channel in subscription.channels:
+                self._channels.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._channels.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._channels[channel]
+
+    def subscriber_count(self):
+        with self._lock:
+            return len({sub for subscribers in self._channels.values() for sub in subscribers})
+
+    def dispatch(self, channels, message):
+        """把消息投递给订阅了任一频道的连接（每个连接只投递一次）"""
+        with self._lock:
+            targets = {
+                subscription
+                for channel in channels
+                for subscription in self._channels.get(channel, ())
+            }
+        for subscription in targets:
+            subscription.deliver(message)
+        return len(targets)
+
+    def publish(self, channels, message):
+        return self.dispatch(channels, message)
+
+
+class IdCursor:
+    """
+    按自增 id 读取一张表新行的位置
+
+    PostgreSQL 的序列值在插入时分配，提交顺序却不确定：id 较小的行可能晚于较大的行才可见，
+    只按 id > 已读最大 id 轮询会永久漏掉它。因此只把“连续读到”的最大 id 作为水位 last_id，
+    水位之上已分发的 id 记在 seen 中，下次仍从水位开始查询并跳过已分发的行；
+    水位后缺的 id 最多等待 gap_timeout 秒，超时仍未出现（回滚的事务会留下空号）则跳过这一段空号
+    """
+
+    def __init__(self, last_id, gap_timeout):
+        self.last_id = last_id
+        self.gap_timeout = gap_timeout
+        self.seen = set()
+        self._gap = None  # (缺的第一个 id, 发现时间)
+
+    def accept(self, rows, now):
+        """从 id > last_id 的查询结果中返回尚未分发的行，并推进水位"""
+        fresh = [row for row in rows if row.id not in self.seen]
+        self.seen.update(row.id for row in fresh)
+        self._advance(now)
+        return fresh
+
+    def _advance(self, now):
+        while self.seen:
+            next_id = self.last_id + 1
+            if next_id in self.seen:
+                self.seen.discard(next_id)
+                self.last_id = next_id
+                continue
+            if self._gap is None or self._gap[0] != next_id:
+                self._gap = (next_id, now)
+            if now - self._gap[1] < self.gap_timeout:
+                return
+            self.last_id = min(self.seen) - 1
+        self._gap = None
+
+
+class DatabaseBroker(LocalBroker):
+    """
+    多 worker 部署：publish 不做任何事（数据已经写入事件表和通知表），
+    由每个进程的轮询任务读取新行后在本进程内分发；最后一个订阅者离开时轮询结束，
+    下次有订阅者时从当时的最大 id 重新开始，不补发无人订阅期间的旧行
+    """
+    poll_interval = 1.0
+    gap_timeout = 10.0
+    batch_size = 1000
+
+    def __init__(self):
+        super().__init__()
+        self.poll_interval = getattr(settings, 'BOM_STREAM_POLL_INTERVAL', self.poll_interval)
+        self.gap_timeout = getattr(settings, 'BOM_STREAM_GAP_TIMEOUT', self.gap_timeout)
+        self._poller = None
+        self._cursors = None
+
+    def publish(self, channels, message):
+        return 0
+
+    def subscribe(self, channels):
+        subscription = super().subscribe(channels)
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.get_running_loop().create_task(self._poll())
+        return subscription
+
+    async def _poll(self):
+        try:
+            await self._start()
+            while self.subscriber_count():
+                await asyncio.sleep(self.poll_interval)
+                await self.poll_once()
+        finally:
+            self._cursors = None
+
+    async def _start(self):
+        from .models import BomEvent, Notification
+
+        self._cursors = {
+            BomEvent: IdCursor(await _max_id(BomEvent), self.gap_timeout),
+            Notification: IdCursor(await _max_id(Notification), self.gap_timeout),
+        }
+
+    async def poll_once(self, now=None):
+        """读取一次两张表的新行并分发"""
+        from .models import BomEvent
+
+        now = time.monotonic() if now is None else now
+        for model, cursor in self._cursors.items():
+            rows = [
+                row async for row in
+                model.objects.filter(id__gt=cursor.last_id).order_by('id')[:self.batch_size]
+            ]
+            to_message = transition_message if model is BomEvent else notification_message
+            for row in cursor.accept(rows, now):
+                self.dispatch(*to_message(row))
+
+
+async def _max_id(model):
+    from django.db.models import Max
+
+    result = await model.objects.aaggregate(value=Max('id'))
+    return result['value'] or 0
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            path = getattr(settings, 'BOM_STREAM_BACKEND', 'boms.streams.LocalBroker')
+            _broker = import_string(path)()
+        return _broker
+
+
+def reset_broker():
+    """切换后端设置后重新创建（测试用）"""
+    global _broker
+    with _broker_lock:
+        _broker = None
+
+
+def transition_message(event):
+    """BomEvent -> (频道, 消息)"""
+    return (ALL_BOMS, bom_channel(event.bom_id)), {
+        'type': 'bom.transition',
+        'id': event.id,
+        'style_code': event.bom_id,
+        'action': event.action,
+        'actor': event.actor,
+        'from_status': event.from_status,
+        'to_status': event.to_status,
+        'reason': event.reason,
+        'created_at': event.created_at.isoformat(),
+    }
+
+
+def notification_message(notification):
+    """Notification -> (频道, 消息)"""
+    return (user_channel(notification.recipient_id),), {
+        'type': 'notification',
+        'id': notification.id,
+        'notification_type': notification.notification_type,
+        'title': notification.title,
+        'message': notification.message,
+        'style_code': notification.bom_id,
+        'created_at': notification.created_at.isoformat(),
+    }
+
+
+def publish_on_commit(events=(), notifications=()):
+    """
+    在当前事务提交后推送工作流事件和通知（回滚的转换不会被推送）
+    """
+    events, notifications = list(events), list(notifications)
+    if not events and not notifications:
+        return
+
+    def send():
+        broker = get_broker()
+        for event in events:
+            broker.publish(*transition_message(event))
+        for notification in notifications:
+            broker.publish(*notification_message(notification))
+
+    transaction.on_commit(send)
+
+
+def format_sse(message):
+    """按 text/event-stream 格式编码一条消息（不带 event 字段，客户端统一用 onmessage 接收）"""
+    lines = []
+    if 'id' in message:
+        lines.append(f"id: {message['type']}-{message['id']}")
+    data = json.dumps(message, ensure_ascii=False, separators=(',', ':'))
+    lines.append(f'data: {data}')
+    return '\n'.join(lines) + '\n\n'
@@ -1,7 +1,22 @@
+import asyncio
+from decimal import Decimal
+from io import BytesIO, StringIO
+from openpyxl import Workbook, load_workbook
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.models import F
 from django.urls import reverse
 from rest_framework import status
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APITestCase
-from .models import User, Bom
+from .models import (
+    User, Bom, BomDetail, BomEvent, MaterialUnitFactor, Notification, SizeMeasurement, SizeSpec, WorkflowConflictError,
+)
+from . import grading
 
 
 class BomAPITests(APITestCase):
@@ -33,8 +48,8 @@ class BomAPITests(APITestCase):
         self.client.login(username='testuser', password='password')
         response_authenticated = self.client.get(url, format='json')
         self.assertEqual(response_authenticated.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response_authenticated.data), 1)
-        self.assertEqual(response_authenticated.data[0]['style_code'], 'TEST001')
+        self.assertEqual(len(response_authenticated.data['results']), 1)
+        self.assertEqual(response_authenticated.data['results'][0]['style_code'], 'TEST001')
 
     def test_can_retrieve_bom_detail(self):
         """
@@ -65,3 +80,1951 @@ class BomAPITests(APITestCase):
         # 验证数据库中的数据是否真的被更新
         self.bom.refresh_from_db()
         self.assertEqual(self.bom.product_name, '更新后的产品名称')
+
+
+class BomTotalCostQueryTests(APITestCase):
+    """列表/详情接口的总成本注解测试"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='costuser', password='password')
+
+    def _create_boms(self, start, count):
+        for i in range(start, start + count):
+            bom = Bom.objects.create(
+                style_code=f'COST{i:04d}',
+                product_name=f'成本测试{i}',
+                season='SPRING',
+                year=2025,
+                wave='第一波',
+                category='TOP',
+                dev_colors='黑色',
+                created_by=self.user
+            )
+            for seq in (1, 2):
+                BomDetail.objects.create(
+                    bom=bom,
+                    sequence=seq,
+                    material_type='FABRIC',
+                    material_name='棉布',
+                    specification='180g',
+                    usage_quantity=Decimal('1.500'),
+                    usage_unit='M',
+                    unit_price=Decimal('10.0000')
+                )
+
+    def test_list_query_count_is_constant(self):
+        """无论BOM数量多少，列表接口的查询次数保持不变"""
+        url = reverse('bom-list')
+
+        self._create_boms(0, 2)
+        with self.assertNumQueries(1):  # 缓存未命中：一次数据查询
+            response = self.client.get(url, format='json')
+        self.assertEqual(len(response.data['results']), 2)
+
+        self._create_boms(2, 20)
+        with self.assertNumQueries(1):  # 缓存未命中：一次数据查询
+            response = self.client.get(url, format='json')
+        self.assertEqual(len(response.data['results']), 22)
+
+    def test_total_cost_matches_details(self):
+        """列表返回的总成本与明细重新计算的结果一致，无明细时为0"""
+        self._create_boms(0, 1)
+        Bom.objects.create(
+            style_code='EMPTY001', product_name='无明细', season='SPRING', year=2025,
+            wave='第一波', category='TOP', dev_colors='黑色', created_by=self.user
+        )
+        response = self.client.get(reverse('bom-list'), format='json')
+        costs = {row['style_code']: row['total_cost'] for row in response.data['results']}
+
+        rollups = Bom.compute_cost_rollups(list(costs))
+        for style_code, (total_cost, _, _) in rollups.items():
+            self.assertEqual(Decimal(str(costs[style_code])), total_cost)
+        self.assertEqual(Decimal(str(costs['EMPTY001'])), Decimal('0.00'))
+
+    def test_detail_reads_total_cost_without_aggregate(self):
+        """详情接口直接读取汇总字段返回总成本（校验值查询 + 一次数据查询）"""
+        self._create_boms(0, 1)
+        url = reverse('bom-detail', kwargs={'style_code': 'COST0000'})
+        with self.assertNumQueries(2):  # 条件请求校验值 + 数据查询
+            response = self.client.get(url, format='json')
+        self.assertEqual(Decimal(str(response.data['total_cost'])), Decimal('30'))
+
+
+class BomCursorPaginationTests(APITestCase):
+    """BOM列表游标分页测试"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='pageuser', password='password')
+        # 所有BOM使用同一个创建时间，验证 style_code 决胜字段保证顺序稳定
+        for i in range(25):
+            Bom.objects.create(
+                style_code=f'PAGE{i:04d}', product_name=f'分页测试{i % 3}', season='SPRING',
+                year=2025, wave='第一波', category='TOP', dev_colors='黑色', created_by=self.user
+            )
+        Bom.objects.update(created_at=Bom.objects.first().created_at)
+
+    def _walk(self, url):
+        """沿 next 链接遍历所有页"""
+        codes, pages = [], 0
+        while url:
+            response = self.client.get(url, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            codes.extend(row['style_code'] for row in response.data['results'])
+            url = response.data['next']
+            pages += 1
+        return codes, pages
+
+    def test_pages_cover_all_rows_once(self):
+        """按 next 链接翻页，每个BOM恰好出现一次"""
+        codes, pages = self._walk(reverse('bom-list') + '?page_size=10')
+        self.assertEqual(pages, 3)
+        self.assertEqual(len(codes), 25)
+        self.assertEqual(codes, sorted(codes, reverse=True))
+
+    def test_honours_ordering_param(self):
+        """排序参数参与游标，重复值按 style_code 稳定排序"""
+        codes, _ = self._walk(reverse('bom-list') + '?page_size=7&ordering=product_name')
+        expected = list(
+            Bom.objects.order_by('product_name', 'style_code').values_list('style_code', flat=True)
+        )
+        self.assertEqual(codes, expected)
+
+    def test_previous_link_returns_prior_page(self):
+        """previous 链接返回上一页的同样数据"""
+        first = self.client.get(reverse('bom-list') + '?page_size=10', format='json')
+        second = self.client.get(first.data['next'], format='json')
+        back = self.client.get(second.data['previous'], format='json')
+        self.assertEqual(
+            [row['style_code'] for row in back.data['results']],
+            [row['style_code'] for row in first.data['results']]
+        )
+        self.assertIsNone(back.data['previous'])
+
+    def test_deep_page_query_count(self):
+        """深页与首页的查询次数相同"""
+        first = self.client.get(reverse('bom-list') + '?page_size=5', format='json')
+        url = first.data['next']
+        for _ in range(3):
+            url = self.client.get(url, format='json').data['next']
+        with self.assertNumQueries(1):  # 缓存未命中：一次数据查询
+            self.client.get(url, format='json')
+
+    def test_invalid_cursor(self):
+        """无效游标返回404"""
+        response = self.client.get(reverse('bom-list') + '?cursor=not-a-cursor', format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class BomCostRollupTests(APITestCase):
+    """BOM成本汇总增量维护测试"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='rollupuser', password='password')
+        self.bom = self._create_bom('ROLL001')
+
+    def _create_bom(self, style_code):
+        return Bom.objects.create(
+            style_code=style_code, product_name='汇总测试', season='SPRING', year=2025,
+            wave='第一波', category='TOP', dev_colors='黑色', created_by=self.user
+        )
+
+    def _add_detail(self, bom, sequence, material_type, quantity, price):
+        return BomDetail.objects.create(
+            bom=bom, sequence=sequence, material_type=material_type, material_name='物料',
+            specification='规格', usage_quantity=Decimal(quantity), usage_unit='M',
+            unit_price=Decimal(price)
+        )
+
+    def assertRollup(self, bom, total_cost, detail_count, material_costs):
+        bom.refresh_from_db()
+        self.assertEqual(bom.total_cost, Decimal(total_cost))
+        self.assertEqual(bom.detail_count, detail_count)
+        self.assertEqual(
+            {key: Decimal(value) for key, value in bom.material_costs.items()},
+            {key: Decimal(value) for key, value in material_costs.items()}
+        )
+
+    def test_create_update_delete(self):
+        """明细新增、修改、删除后汇总随之变化"""
+        fabric = self._add_detail(self.bom, 1, 'FABRIC', '1.500', '20.0000')
+        button = self._add_detail(self.bom, 2, 'BUTTON', '6.000', '0.5000')
+        self.assertRollup(self.bom, '33', 2, {'FABRIC': '30', 'BUTTON': '3'})
+
+        fabric.usage_quantity = Decimal('2.000')
+        fabric.save()
+        self.assertRollup(self.bom, '43', 2, {'FABRIC': '40', 'BUTTON': '3'})
+
+        button.material_type = 'TRIM'
+        button.save()
+        self.assertRollup(self.bom, '43', 2, {'FABRIC': '40', 'TRIM': '3'})
+
+        button.delete()
+        self.assertRollup(self.bom, '40', 1, {'FABRIC': '40'})
+
+        BomDetail.objects.filter(bom=self.bom).delete()
+        self.assertRollup(self.bom, '0', 0, {})
+
+    def test_move_detail_between_boms(self):
+        """明细改挂到其他BOM时两边汇总都正确"""
+        other = self._create_bom('ROLL002')
+        detail = self._add_detail(self.bom, 1, 'FABRIC', '1.000', '10.0000')
+        detail.bom = other
+        detail.save()
+        self.assertRollup(self.bom, '0', 0, {})
+        self.assertRollup(other, '10', 1, {'FABRIC': '10'})
+
+    def test_bom_save_does_not_overwrite_rollup(self):
+        """用旧实例保存BOM不会覆盖明细维护的汇总"""
+        stale = Bom.objects.get(pk=self.bom.pk)
+        self._add_detail(self.bom, 1, 'FABRIC', '1.000', '10.0000')
+        stale.product_name = '新名称'
+        stale.save()
+        self.assertRollup(self.bom, '10', 1, {'FABRIC': '10'})
+        self.assertEqual(self.bom.product_name, '新名称')
+
+    def test_admin_inline_updates_rollup(self):
+        """通过后台 BomDetailInline 保存明细同样维护汇总"""
+        admin = User.objects.create_superuser(username='rollupadmin', password='password')
+        self.client.force_login(admin)
+        url = reverse('admin:boms_bom_change', args=[self.bom.pk])
+        data = {
+            'style_code': self.bom.style_code, 'product_name': '汇总测试', 'category': 'TOP',
+            'season': 'SPRING', 'year': 2025, 'wave': '第一波', 'dev_colors': '黑色',
+            'status': 'DRAFT', 'version': 1, 'created_by': self.user.pk,
+            'details-TOTAL_FORMS': 1, 'details-INITIAL_FORMS': 0,
+            'details-MIN_NUM_FORMS': 0, 'details-MAX_NUM_FORMS': 1000,
+            'details-0-sequence': 1, 'details-0-material_type': 'FABRIC',
+            'details-0-material_name': '棉布', 'details-0-specification': '180g',
+            'details-0-usage_quantity': '2.000', 'details-0-usage_unit': 'M',
+            'details-0-unit_price': '12.5000',
+            'size_specs-TOTAL_FORMS': 0, 'size_specs-INITIAL_FORMS': 0,
+            'size_specs-MIN_NUM_FORMS': 0, 'size_specs-MAX_NUM_FORMS': 1000,
+            'events-TOTAL_FORMS': 0, 'events-INITIAL_FORMS': 0,
+            'events-MIN_NUM_FORMS': 0, 'events-MAX_NUM_FORMS': 1000,
+        }
+        response = self.client.post(url, data)
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        self.assertRollup(self.bom, '25', 1, {'FABRIC': '25'})
+
+    def test_filter_and_order_by_total_cost(self):
+        """列表支持按总成本过滤和排序"""
+        cheap = self._create_bom('ROLL002')
+        self._add_detail(self.bom, 1, 'FABRIC', '1.000', '100.0000')
+        self._add_detail(cheap, 1, 'FABRIC', '1.000', '5.0000')
+
+        response = self.client.get(reverse('bom-list') + '?total_cost__gte=50', format='json')
+        self.assertEqual([row['style_code'] for row in response.data['results']], ['ROLL001'])
+
+        response = self.client.get(reverse('bom-list') + '?ordering=total_cost', format='json')
+        self.assertEqual(
+            [row['style_code'] for row in response.data['results']], ['ROLL002', 'ROLL001']
+        )
+
+    def test_rebuild_command(self):
+        """重建命令能发现并修复不一致的汇总"""
+        self._add_detail(self.bom, 1, 'FABRIC', '1.000', '10.0000')
+        Bom.objects.filter(pk=self.bom.pk).update(total_cost=0, detail_count=0, material_costs={})
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_bom_rollups', '--verify-only', stdout=StringIO())
+
+        call_command('rebuild_bom_rollups', batch_size=1, stdout=StringIO())
+        self.assertRollup(self.bom, '10', 1, {'FABRIC': '10'})
+        call_command('rebuild_bom_rollups', '--verify-only', stdout=StringIO())
+
+
+class BomImportTests(APITestCase):
+    """BOM批量导入测试"""
+
+    BOM_HEADER = ['style_code', 'product_name', 'season', 'year', 'wave', 'category', 'dev_colors']
+    DETAIL_HEADER = ['款式编码', '序号', '物料类型', '物料名称', '规格描述', '用量', '单位', '单价']
+    SIZE_HEADER = ['style_code', 'size', '胸围', '衣长']
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='importer', password='password')
+        self.client.login(username='importer', password='password')
+
+    def _workbook(self, boms, details, sizes):
+        workbook = Workbook()
+        workbook.remove(workbook.active)
+        for title, header, rows in (('BOM', self.BOM_HEADER, boms),
+                                    ('明细', self.DETAIL_HEADER, details),
+                                    ('尺码', self.SIZE_HEADER, sizes)):
+            sheet = workbook.create_sheet(title)
+            sheet.append(header)
+            for row in rows:
+                sheet.append(row)
+        buffer = BytesIO()
+        workbook.save(buffer)
+        return SimpleUploadedFile(
+            'boms.xlsx', buffer.getvalue(),
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
+
+    def test_import_workbook(self):
+        """导入工作簿：创建BOM、明细、尺码，并维护成本汇总"""
+        upload = self._workbook(
+            boms=[['IMP0001', '导入T恤', 'SPRING', 2025, '第一波', 'TOP', '黑色/白色'],
+                  ['IMP0002', '导入长裤', '夏季', 2025, '第二波', '下装', '蓝色']],
+            details=[['IMP0001', 1, 'FABRIC', '棉布', '180g', 1.5, 'M', 20],
+                     ['IMP0001', 2, '纽扣', '树脂扣', '12mm', 6, 'PCS', 0.5],
+                     ['IMP0002', 1, 'FABRIC', '牛仔布', '12oz', 1.2, '米', 30]],
+            sizes=[['IMP0001', 'S', 100, 66], ['IMP0001', 'M', 104, 68.5], ['IMP0002', 'M', 90, None]],
+        )
+        response = self.client.post(reverse('bom-import'), {'file': upload}, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['success'], response.data['errors'])
+        self.assertEqual(response.data['created'], {'boms': 2, 'details': 3, 'size_specs': 3})
+
+        pants = Bom.objects.get(pk='IMP0002')
+        self.assertEqual((pants.season, pants.category, pants.created_by), ('SUMMER', 'BOTTOM', self.user))
+        tee = Bom.objects.get(pk='IMP0001')
+        self.assertEqual(tee.total_cost, Decimal('33'))
+        self.assertEqual(tee.detail_count, 2)
+        spec = SizeSpec.objects.get(bom=tee, size='M')
+        self.assertEqual(spec.measurements, {'胸围': 104, '衣长': 68.5})
+        self.assertEqual(spec.sort_order, 3)
+        self.assertEqual(SizeSpec.objects.get(bom=pants).measurements, {'胸围': 90})
+        self.assertEqual(SizeMeasurement.objects.filter(part='胸围').count(), 3)
+
+    def test_corrupt_workbook_is_rejected(self):
+        """损坏或非 xlsx 的文件返回 400，而不是 500"""
+        upload = SimpleUploadedFile('x.xlsx', b'not a zip file at all', content_type='application/octet-stream')
+        response = self.client.post(reverse('bom-import'), {'file': upload}, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('无法读取导入文件', response.data['message'])
+        self.assertFalse(Bom.objects.exists())
+
+    def test_row_errors_do_not_abort_batch(self):
+        """错误行逐行报告，其余行照常导入"""
+        Bom.objects.create(
+            style_code='IMP0009', product_name='已有', season='SPRING', year=2025,
+            wave='第一波', category='TOP', dev_colors='黑色', created_by=self.user
+        )
+        upload = self._workbook(
+            boms=[['IMP0001', '导入T恤', 'SPRING', 2025, '第一波', 'TOP', '黑色'],
+                  ['IMP0001', '重复编码', 'SPRING', 2025, '第一波', 'TOP', '黑色'],
+                  ['IMP0009', '已存在', 'SPRING', 2025, '第一波', 'TOP', '黑色'],
+                  ['BAD', '编码太短', 'WINTERS', 'abc', '第一波', 'TOP', '黑色']],
+            details=[['IMP0001', 1, 'FABRIC', '棉布', '180g', 1.5, 'M', 20],
+                     ['IMP0001', 1, 'FABRIC', '重复序号', '180g', 1, 'M', 1],
+                     ['NOPE001', 1, 'FABRIC', '无BOM', '180g', 1, 'M', 1],
+                     ['IMP0001', 2, 'FABRIC', '负数', '180g', -1, 'M', 1.23456]],
+            sizes=[['IMP0001', 'XXXXL', 1, 2], ['IMP0001', 'L', '宽', 2]],
+        )
+        response = self.client.post(reverse('bom-import'), {'file': upload}, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data['success'])
+        self.assertEqual(response.data['created'], {'boms': 1, 'details': 1, 'size_specs': 0})
+        errors = {(e['sheet'], e['row']) for e in response.data['errors']}
+        self.assertEqual(errors, {
+            ('boms', 3), ('boms', 4), ('boms', 5),
+            ('details', 3), ('details', 4), ('details', 5),
+            ('size_specs', 2), ('size_specs', 3),
+        })
+        bad_row = next(e for e in response.data['errors'] if e['row'] == 5 and e['sheet'] == 'boms')
+        self.assertIn('季节取值无效', bad_row['message'])
+        self.assertIn('年份', bad_row['message'])
+        self.assertEqual(Bom.objects.get(pk='IMP0001').total_cost, Decimal('30'))
+
+    def test_import_requires_file(self):
+        response = self.client.post(reverse('bom-import'), {}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_import_command_with_csv(self):
+        """管理命令按块导入CSV文件"""
+        import tempfile, os
+        with tempfile.TemporaryDirectory() as tmp:
+            boms_path = os.path.join(tmp, 'boms.csv')
+            details_path = os.path.join(tmp, 'details.csv')
+            with open(boms_path, 'w', encoding='utf-8') as fp:
+                fp.write(','.join(self.BOM_HEADER) + '\n')
+                for i in range(7):
+                    fp.write(f'CSV{i:04d},CSV产品{i},AUTUMN,2025,第三波,OUTERWEAR,灰色\n')
+            with open(details_path, 'w', encoding='utf-8') as fp:
+                fp.write(','.join(self.DETAIL_HEADER) + '\n')
+                for i in range(7):
+                    fp.write(f'CSV{i:04d},1,LINING,里布,薄款,2.000,M,5.5000\n')
+            out = StringIO()
+            call_command('import_boms', boms=boms_path, details=details_path, user='importer',
+                         chunk_size=3, stdout=out, stderr=StringIO())
+
+        self.assertEqual(Bom.objects.filter(style_code__startswith='CSV').count(), 7)
+        self.assertEqual(BomDetail.objects.filter(bom__style_code__startswith='CSV').count(), 7)
+        self.assertEqual(Bom.objects.get(pk='CSV0006').total_cost, Decimal('11'))
+        call_command('rebuild_bom_rollups', '--verify-only', stdout=StringIO())
+
+
+class BomExportTests(APITestCase):
+    """BOM批量导出测试"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='exporter', password='password')
+        for code, bom_status in (('EXP0001', 'CONFIRMED'), ('EXP0002', 'CONFIRMED'), ('EXP0003', 'DRAFT')):
+            bom = Bom.objects.create(
+                style_code=code, product_name=f'导出{code}', season='SPRING', year=2025,
+                wave='第一波', category='TOP', dev_colors='黑色', status=bom_status,
+                created_by=self.user
+            )
+            for seq in (1, 2):
+                BomDetail.objects.create(
+                    bom=bom, sequence=seq, material_type='FABRIC', material_name='棉布',
+                    specification='180g', usage_quantity=Decimal('1.500'), usage_unit='M',
+                    unit_price=Decimal('10.0000')
+                )
+            SizeSpec.objects.create(bom=bom, size='M', sort_order=3, measurements={'胸围': 104})
+        SizeSpec.objects.create(
+            bom_id='EXP0001', size='L', sort_order=4, measurements={'胸围': 108, '衣长': 70}
+        )
+
+    def _csv_rows(self, response):
+        import csv
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content).decode('utf-8-sig')
+        return list(csv.reader(content.splitlines()))
+
+    def test_export_details_csv_with_filters(self):
+        """CSV导出使用与列表相同的过滤条件"""
+        response = self.client.get(reverse('bom-export') + '?status=CONFIRMED')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rows = self._csv_rows(response)
+        self.assertEqual(rows[0][:3], ['style_code', 'sequence', 'material_type'])
+        self.assertEqual([(row[0], row[1]) for row in rows[1:]], [
+            ('EXP0001', '1'), ('EXP0001', '2'), ('EXP0002', '1'), ('EXP0002', '2')
+        ])
+
+    def test_export_size_specs_csv(self):
+        """尺码规格导出为宽表，每个测量部位一列"""
+        response = self.client.get(reverse('bom-export') + '?sheet=size_specs&search=EXP0001')
+        rows = self._csv_rows(response)
+        self.assertEqual(rows[0], ['style_code', 'size', 'sort_order', 'is_active', '胸围', '衣长'])
+        self.assertEqual(rows[1:], [
+            ['EXP0001', 'M', '3', '1', '104', ''],
+            ['EXP0001', 'L', '4', '1', '108', '70'],
+        ])
+
+    def test_export_xlsx(self):
+        """xlsx导出包含BOM、明细、尺码三个工作表"""
+        response = self.client.get(reverse('bom-export') + '?export_format=xlsx&status=CONFIRMED')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        workbook = load_workbook(BytesIO(b''.join(response.streaming_content)), read_only=True)
+        self.assertEqual(workbook.sheetnames, ['BOM', '明细', '尺码'])
+        self.assertEqual(len(list(workbook['BOM'].iter_rows())), 3)
+        self.assertEqual(len(list(workbook['明细'].iter_rows())), 5)
+        self.assertEqual(len(list(workbook['尺码'].iter_rows())), 4)
+
+    def test_exported_workbook_can_be_imported(self):
+        """导出的工作簿可以原样导入"""
+        response = self.client.get(reverse('bom-export') + '?export_format=xlsx')
+        content = b''.join(response.streaming_content)
+        Bom.objects.all().delete()
+
+        from .importers import BomImporter
+        result = BomImporter(self.user).import_workbook(BytesIO(content))
+        self.assertTrue(result.success, result.errors)
+        self.assertEqual(result.created, {'boms': 3, 'details': 6, 'size_specs': 4})
+        self.assertEqual(SizeSpec.objects.get(bom_id='EXP0001', size='L').measurements,
+                         {'胸围': 108, '衣长': 70})
+
+    def test_invalid_export_format(self):
+        response = self.client.get(reverse('bom-export') + '?export_format=pdf')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class BomDocumentTests(APITestCase):
+    """BOM完整文档接口测试"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='docuser', password='password')
+
+    def _create_boms(self, start, count):
+        for i in range(start, start + count):
+            bom = Bom.objects.create(
+                style_code=f'DOC{i:04d}', product_name=f'文档{i}', season='SPRING', year=2025,
+                wave='第一波', category='TOP', dev_colors='黑色', created_by=self.user
+            )
+            for seq in (2, 1):
+                BomDetail.objects.create(
+                    bom=bom, sequence=seq, material_type='FABRIC', material_name=f'物料{seq}',
+                    specification='规格', usage_quantity=Decimal('1.000'), usage_unit='M',
+                    unit_price=Decimal('2.0000')
+                )
+            SizeSpec.objects.create(bom=bom, size='L', sort_order=4, measurements={'胸围': 108})
+            SizeSpec.objects.create(bom=bom, size='S', sort_order=2, measurements={'胸围': 100})
+            SizeSpec.objects.create(bom=bom, size='XXS', sort_order=0, is_active=False)
+
+    def test_single_document(self):
+        """单个文档：明细按序号、只含启用的尺码，固定3次查询"""
+        self._create_boms(0, 1)
+        url = reverse('bom-document', kwargs={'style_code': 'DOC0000'})
+        with self.assertNumQueries(3):
+            response = self.client.get(url, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([d['sequence'] for d in response.data['details']], [1, 2])
+        self.assertEqual([s['size'] for s in response.data['size_specs']], ['S', 'L'])
+        self.assertEqual(response.data['size_specs'][1]['measurements'], {'胸围': 108})
+
+    def test_document_list_query_count_is_constant(self):
+        """文档列表的查询次数与BOM数量无关"""
+        url = reverse('bom-document-list')
+        self._create_boms(0, 2)
+        with self.assertNumQueries(3):
+            response = self.client.get(url, format='json')
+        self.assertEqual(len(response.data['results']), 2)
+
+        self._create_boms(2, 15)
+        with self.assertNumQueries(3):
+            response = self.client.get(url, format='json')
+        self.assertEqual(len(response.data['results']), 17)
+        for document in response.data['results']:
+            self.assertEqual(len(document['details']), 2)
+            self.assertEqual(len(document['size_specs']), 2)
+
+
+class WorkflowRole:
+    """工作流测试用的角色对象（与视图中的 MockUser 一致）"""
+
+    def __init__(self, role, username='tester'):
+        self.role = role
+        self.username = username
+
+
+class BomWorkflowConcurrencyTests(APITestCase):
+    """工作流状态转换的原子性和乐观锁测试"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='flowuser', password='password')
+        self.bom = Bom.objects.create(
+            style_code='FLOW001', product_name='流程测试', season='SPRING', year=2025,
+            wave='第一波', category='TOP', dev_colors='黑色', status='PENDING_CRAFT',
+            notes='人工备注', created_by=self.user
+        )
+
+    def test_transition_bumps_version_and_updates_only_changed_fields(self):
+        """状态转换为一条 UPDATE 加一条事件 INSERT，递增版本号且不改动人工备注"""
+        with self.assertNumQueries(6) as context:  # 保存点 + UPDATE + 事件 + 查通知接收人 + 批量写通知 + 释放保存点
+            self.assertTrue(self.bom.submit_for_details(WorkflowRole('pattern_maker', 'pm')))
+        statements = [query['sql'] for query in context.captured_queries]
+        update = next(sql for sql in statements if sql.startswith('UPDATE'))
+        self.assertNotIn('product_name', update)
+        self.assertNotIn('notes', update)
+
+        self.bom.refresh_from_db()
+        self.assertEqual((self.bom.status, self.bom.version), ('PENDING_DETAILS', 2))
+        self.assertEqual(self.bom.notes, '人工备注')
+        event = self.bom.events.get()
+        self.assertEqual(
+            (event.action, event.actor, event.from_status, event.to_status),
+            ('submit_for_details', 'pm', 'PENDING_CRAFT', 'PENDING_DETAILS')
+        )
+
+    def test_stale_instance_raises_conflict(self):
+        """两个用户基于同一版本操作时，后提交者得到冲突"""
+        first = Bom.objects.get(pk='FLOW001')
+        second = Bom.objects.get(pk='FLOW001')
+        self.assertTrue(first.submit_for_details(WorkflowRole('pattern_maker')))
+        with self.assertRaises(WorkflowConflictError):
+            second.reject_bom(WorkflowRole('admin'), '尺寸有误')
+        self.bom.refresh_from_db()
+        self.assertEqual((self.bom.status, self.bom.version), ('PENDING_DETAILS', 2))
+
+    def test_api_returns_409_for_stale_version(self):
+        """请求携带的版本号过期时接口返回 409"""
+        url = reverse('approve-bom', kwargs={'style_code': 'FLOW001'})
+        response = self.client.post(url, {'version': 5}, format='json', HTTP_X_USER_ROLE='admin')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+        response = self.client.post(url, {'version': 1}, format='json', HTTP_X_USER_ROLE='admin')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['data']['version'], 2)
+
+
+class BomWorkflowThreadedTests(TransactionTestCase):
+    """多线程并发操作同一个BOM"""
+
+    def test_concurrent_transitions_apply_once(self):
+        import threading
+        from concurrent.futures import ThreadPoolExecutor
+        from django.db import connection, OperationalError
+
+        user = User.objects.create_user(username='threaduser', password='password')
+        Bom.objects.create(
+            style_code='FLOW002', product_name='并发测试', season='SPRING', year=2025,
+            wave='第一波', category='TOP', dev_colors='黑色', status='PENDING_CRAFT',
+            created_by=user
+        )
+        workers = 8
+        barrier = threading.Barrier(workers)
+
+        def worker(index):
+            try:
+                bom = Bom.objects.get(pk='FLOW002')
+                barrier.wait()
+                if index % 2:
+                    bom.approve_bom(WorkflowRole('admin', f'admin{index}'))
+                else:
+                    bom.reject_bom(WorkflowRole('admin', f'admin{index}'), '并发驳回')
+                return 'ok'
+            except WorkflowConflictError:
+                return 'conflict'
+            except OperationalError:
+                # SQLite 写锁竞争时视同冲突（PostgreSQL 上由行锁串行化）
+                return 'conflict'
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            outcomes = list(pool.map(worker, range(workers)))
+
+        self.assertEqual(outcomes.count('ok'), 1)
+        self.assertEqual(outcomes.count('conflict'), workers - 1)
+        bom = Bom.objects.get(pk='FLOW002')
+        self.assertEqual(bom.version, 2)
+        self.assertEqual(bom.events.count(), 1)
+
+
+class BomBulkWorkflowTests(APITestCase):
+    """批量批准/驳回接口测试"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='bulkuser', password='password')
+        Bom.objects.bulk_create([
+            Bom(
+                style_code=f'BULK{i:03d}', product_name=f'批量{i}', season='SPRING', year=2025,
+                wave='第一波', category='TOP', dev_colors='黑色', status='PENDING_CRAFT',
+                created_by=self.user
+            )
+            for i in range(30)
+        ])
+        Bom.objects.filter(pk='BULK000').update(status='CONFIRMED')
+        self.url = reverse('bom-bulk-actions')
+
+    def test_bulk_approve_uses_constant_queries(self):
+        """批量批准只需固定次数的查询，并返回逐条结果"""
+        codes = [f'BULK{i:03d}' for i in range(30)] + ['MISSING']
+        with self.assertNumQueries(7):  # 保存点 + 锁定读取 + UPDATE + 批量写事件 + 查通知接收人 + 批量写通知 + 释放保存点
+            results = Bom.bulk_transition(codes, 'approve', WorkflowRole('admin', 'boss'))
+
+        self.assertEqual([item['style_code'] for item in results], codes)
+        by_code = {item['style_code']: item for item in results}
+        self.assertFalse(by_code['BULK000']['success'])
+        self.assertFalse(by_code['MISSING']['success'])
+        self.assertTrue(by_code['BULK001']['success'])
+        self.assertEqual(by_code['BULK001']['version'], 2)
+
+        bom = Bom.objects.get(pk='BULK001')
+        self.assertEqual(bom.status, 'CONFIRMED')
+        self.assertIsNotNone(bom.confirmed_at)
+        self.assertEqual(bom.notes, '')
+        self.assertEqual(BomEvent.objects.filter(action='approve', actor='boss').count(), 29)
+        self.assertEqual(Bom.objects.filter(status='CONFIRMED').count(), 30)
+
+    def test_bulk_reject_api_reports_version_conflicts(self):
+        """携带过期版本号的条目失败，其余条目正常驳回"""
+        response = self.client.post(self.url, {
+            'action': 'reject',
+            'style_codes': ['BULK001', 'BULK002'],
+            'reason': '面料待定',
+            'versions': {'BULK001': 1, 'BULK002': 7},
+        }, format='json', HTTP_X_USER_ROLE='pattern_maker')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.data['data']
+        self.assertEqual((data['succeeded'], data['failed']), (1, 1))
+        self.assertFalse(response.data['success'])
+        self.assertEqual(Bom.objects.get(pk='BULK001').status, 'REVISED')
+        self.assertEqual(BomEvent.objects.get(bom_id='BULK001').reason, '面料待定')
+        self.assertEqual(Bom.objects.get(pk='BULK002').status, 'PENDING_CRAFT')
+
+    def test_bulk_api_validates_request(self):
+        response = self.client.post(self.url, {'action': 'delete', 'style_codes': ['BULK001']},
+                                    format='json', HTTP_X_USER_ROLE='admin')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.post(self.url, {'action': 'approve', 'style_codes': ['BULK001']},
+                                    format='json', HTTP_X_USER_ROLE='designer')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Bom.objects.get(pk='BULK001').status, 'PENDING_CRAFT')
+
+
+class BomEventHistoryTests(APITestCase):
+    """工作流事件表和历史接口测试"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='eventuser', password='password')
+        self.bom = Bom.objects.create(
+            style_code='EVT001', product_name='历史测试', season='SPRING', year=2025,
+            wave='第一波', category='TOP', dev_colors='黑色', status='PENDING_CRAFT',
+            created_by=self.user
+        )
+        self.other = Bom.objects.create(
+            style_code='EVT002', product_name='其他波段', season='SPRING', year=2025,
+            wave='第二波', category='TOP', dev_colors='黑色', status='PENDING_CRAFT',
+            created_by=self.user
+        )
+        self.bom.submit_for_details(WorkflowRole('pattern_maker', 'pm'))
+        self.bom.reject_bom(WorkflowRole('admin', 'boss'), '面料不符')
+        self.other.reject_bom(WorkflowRole('admin', 'boss'), '尺码缺失')
+
+    def test_history_endpoint_is_paginated_newest_first(self):
+        url = reverse('bom-history', kwargs={'style_code': 'EVT001'})
+        response = self.client.get(url, {'page_size': 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['action'], 'reject')
+        self.assertEqual(response.data['results'][0]['reason'], '面料不符')
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual(
+            [event['to_status'] for event in response.data['results']], ['PENDING_DETAILS']
+        )
+        self.assertIsNone(response.data['next'])
+
+        missing = self.client.get(reverse('bom-history', kwargs={'style_code': 'NOPE'}))
+        self.assertEqual(missing.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_audit_query_filters_by_status_and_wave(self):
+        response = self.client.get(reverse('bom-event-list'), {'to_status': 'REVISED', 'bom__wave': '第二波'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([event['style_code'] for event in response.data['results']], ['EVT002'])
+
+    def test_transitions_leave_notes_untouched(self):
+        self.bom.refresh_from_db()
+        self.assertEqual(self.bom.notes, '')
+        response = self.client.get(reverse('bom-detail', kwargs={'style_code': 'EVT001'}))
+        self.assertEqual(response.data['notes'], '')
+
+
+class BomConditionalRequestTests(APITestCase):
+    """ETag / Last-Modified 条件请求测试"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='etaguser', password='password')
+        self.bom = Bom.objects.create(
+            style_code='ETAG001', product_name='缓存测试', season='SPRING', year=2025,
+            wave='第一波', category='TOP', dev_colors='黑色', status='DRAFT',
+            created_by=self.user
+        )
+        self.url = reverse('bom-detail', kwargs={'style_code': 'ETAG001'})
+
+    def test_unchanged_detail_returns_304_without_serialization(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_detail_change_invalidates_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        BomDetail.objects.create(
+            bom=self.bom, sequence=1, material_type='FABRIC', material_name='棉布',
+            specification='180g', usage_quantity=Decimal('1.000'), usage_unit='M',
+            unit_price=Decimal('10.0000')
+        )
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(Decimal(str(response.data['total_cost'])), Decimal('10'))
+
+    def test_patch_with_stale_if_match_returns_412(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.patch(self.url, {'product_name': '第一次修改'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+        response = self.client.patch(self.url, {'product_name': '基于旧版本的修改'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.bom.refresh_from_db()
+        self.assertEqual(self.bom.product_name, '第一次修改')
+
+        # 不带 If-Match 的写入保持原有行为
+        response = self.client.patch(self.url, {'product_name': '无条件修改'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_list_validator_short_circuits_unchanged_polls(self):
+        url = reverse('bom-list')
+        response = self.client.get(url, {'status': 'DRAFT'})
+        etag = response['ETag']
+
+        with self.assertNumQueries(0):  # 校验值来自缓存代数，不访问数据库
+            response = self.client.get(url, {'status': 'DRAFT'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # 不同的查询参数有不同的校验值
+        response = self.client.get(url, {'status': 'CONFIRMED'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        Bom.objects.filter(pk='ETAG001').update(product_name='改名')
+        self.bom.refresh_from_db()
+        self.bom.save()
+        response = self.client.get(url, {'status': 'DRAFT'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @override_settings(BOM_CACHE_TIMEOUT=0)
+    def test_uncached_list_validator_comes_from_fetched_page(self):
+        url = reverse('bom-list')
+        etag = self.client.get(url)['ETag']
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        # 只取当前页，不对整个过滤结果做 COUNT/MAX
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('COUNT(', queries[0]['sql'].upper())
+
+        self.bom.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class BomReadCacheTests(APITestCase):
+    """BOM列表/文档读缓存与代数失效测试"""
+
+    def setUp(self):
+        from . import cache as bom_cache
+        self.bom_cache = bom_cache
+        bom_cache.get_cache().clear()
+        self.user = User.objects.create_user(username='cacheuser', password='password')
+        self.bom = Bom.objects.create(
+            style_code='CACHE001', product_name='缓存测试', season='SPRING', year=2025,
+            wave='第一波', category='TOP', dev_colors='黑色', status='PENDING_CRAFT',
+            created_by=self.user
+        )
+
+    def test_list_cache_hit_skips_database(self):
+        url = reverse('bom-list')
+        response = self.client.get(url, {'status': 'PENDING_CRAFT', 'ordering': '-created_at'})
+        self.assertEqual(response['X-Cache'], 'MISS')
+
+        # 参数顺序不同、空参数都归一到同一个键
+        with self.assertNumQueries(0):
+            response = self.client.get(url + '?search=&ordering=-created_at&status=PENDING_CRAFT')
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual([row['style_code'] for row in response.data['results']], ['CACHE001'])
+
+        stats = self.client.get(reverse('bom-cache-stats')).data['data']
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+    def test_writes_bump_generation(self):
+        url = reverse('bom-list')
+        self.client.get(url)
+
+        BomDetail.objects.create(
+            bom=self.bom, sequence=1, material_type='FABRIC', material_name='棉布',
+            specification='180g', usage_quantity=Decimal('2.000'), usage_unit='M',
+            unit_price=Decimal('10.0000')
+        )
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(Decimal(str(response.data['results'][0]['total_cost'])), Decimal('20'))
+
+        self.client.get(url)
+        self.bom.submit_for_details(WorkflowRole('pattern_maker'))
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['status'], 'PENDING_DETAILS')
+
+    def test_document_cache_is_per_bom(self):
+        other = Bom.objects.create(
+            style_code='CACHE002', product_name='其他', season='SPRING', year=2025,
+            wave='第一波', category='TOP', dev_colors='黑色', created_by=self.user
+        )
+        url = reverse('bom-document', kwargs={'style_code': 'CACHE001'})
+        self.client.get(url)
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+
+        # 其他BOM的尺码变化不影响本BOM的文档缓存
+        SizeSpec.objects.create(bom=other, size='M', measurements={'胸围': 100})
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+
+        SizeSpec.objects.create(bom=self.bom, size='L', measurements={'胸围': 104})
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual([spec['size'] for spec in response.data['size_specs']], ['L'])
+
+        etag = response['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_file_based_backend(self):
+        import tempfile
+        from django.test import override_settings
+
+        with tempfile.TemporaryDirectory() as location:
+            caches = {'bom-file': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': location,
+            }}
+            with override_settings(CACHES=caches, BOM_CACHE_ALIAS='bom-file'):
+                url = reverse('bom-list')
+                self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+                self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+                self.bom.save()
+                self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+
+
+class NotificationTests(APITestCase):
+    """数据库通知：工作流扇出、收件箱、未读数、全部已读"""
+
+    def setUp(self):
+        self.creator = User.objects.create(username='creator', role='designer')
+        self.designers = [
+            User.objects.create(username=f'designer{i}', role='designer')
+            for i in range(3)
+        ]
+        self.pattern_maker = User.objects.create(username='pm', role='pattern_maker')
+        self.bom = Bom.objects.create(
+            style_code='NOTI001', product_name='通知测试', season='SPRING', year=2025,
+            wave='第一波', category='TOP', dev_colors='黑色', status='PENDING_CRAFT',
+            created_by=self.creator
+        )
+
+    def test_transition_fans_out_with_single_insert(self):
+        with self.assertNumQueries(6):  # 保存点 + UPDATE + 事件 + 查接收人 + 批量写通知 + 释放保存点
+            self.bom.submit_for_details(WorkflowRole('pattern_maker', 'pm'))
+
+        notifications = Notification.objects.filter(bom=self.bom)
+        self.assertEqual(
+            sorted(notifications.values_list('recipient__username', flat=True)),
+            ['creator', 'designer0', 'designer1', 'designer2']
+        )
+        self.assertEqual(notifications.first().notification_type, 'status_change')
+
+    def test_bulk_transition_sends_one_summary_per_user(self):
+        Bom.objects.create(
+            style_code='NOTI002', product_name='通知测试2', season='SPRING', year=2025,
+            wave='第一波', category='TOP', dev_colors='黑色', status='PENDING_CRAFT',
+            created_by=self.creator
+        )
+        Bom.bulk_transition(['NOTI001', 'NOTI002'], 'reject', WorkflowRole('admin', 'boss'), '面料待定')
+        self.assertEqual(Notification.objects.filter(recipient=self.pattern_maker).count(), 1)
+        summary = Notification.objects.get(recipient=self.creator)
+        self.assertIsNone(summary.bom_id)
+        self.assertIn('2 个BOM', summary.message)
+        self.assertIn('面料待定', summary.message)
+
+    @override_settings(DEBUG=True)
+    def test_inbox_unread_count_and_mark_all_read(self):
+        self.bom.submit_for_details(WorkflowRole('pattern_maker', 'pm'))
+        self.bom.submit_to_craft(WorkflowRole('designer', 'designer1'))
+        headers = {'HTTP_X_USER_NAME': 'creator'}
+
+        with self.assertNumQueries(2):  # 查用户 + COUNT
+            response = self.client.get(reverse('notification-unread-count'), **headers)
+        self.assertEqual(response.data['data']['unread'], 2)
+
+        response = self.client.get(reverse('notifications'), {'page_size': 1}, **headers)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['title'], 'BOM待工艺处理')
+        self.assertIsNotNone(response.data['next'])
+
+        with self.assertNumQueries(2):  # 查用户 + 一条 UPDATE
+            response = self.client.post(reverse('notification-mark-all-read'), **headers)
+        self.assertEqual(response.data['data']['updated'], 2)
+        response = self.client.get(reverse('notification-unread-count'), **headers)
+        self.assertEqual(response.data['data']['unread'], 0)
+
+        response = self.client.get(reverse('notifications'), {'is_read': 'false'}, **headers)
+        self.assertEqual(response.data['results'], [])
+
+    def test_send_notification_to_role(self):
+        response = self.client.post(reverse('notifications'), {
+            'title': '季末盘点', 'message': '请在周五前确认BOM', 'role': 'designer'
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['data']['sent'], 4)
+
+        response = self.client.get(reverse('notifications'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_user_header_ignored_outside_debug(self):
+        self.bom.submit_for_details(WorkflowRole('pattern_maker', 'pm'))
+        headers = {'HTTP_X_USER_NAME': 'creator'}
+        for url in (reverse('notifications'), reverse('notification-unread-count')):
+            self.assertEqual(self.client.get(url, **headers).status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.client.post(reverse('notification-mark-all-read'), **headers)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        notification = Notification.objects.filter(recipient=self.creator).first()
+        response = self.client.post(reverse('notification-read', args=[notification.pk]), **headers)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(Notification.unread_count(self.creator), 1)
+
+    def test_send_notification_requires_username_list(self):
+        for usernames in ('creator', ['creator', 1]):
+            response = self.client.post(reverse('notifications'), {
+                'title': '格式错误', 'usernames': usernames
+            }, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Notification.objects.filter(title='格式错误').exists())
+
+
+class BomEventStreamTests(APITestCase):
+    """SSE事件流与进程内发布/订阅测试"""
+
+    def setUp(self):
+        from . import streams
+        self.streams = streams
+        streams.reset_broker()
+        self.user = User.objects.create(username='streamuser', role='designer')
+        self.bom = Bom.objects.create(
+            style_code='SSE001', product_name='推送测试', season='SPRING', year=2025,
+            wave='第一波', category='TOP', dev_colors='黑色', status='PENDING_CRAFT',
+            created_by=self.user
+        )
+
+    def test_transition_publishes_after_commit(self):
+        from unittest import mock
+
+        broker = self.streams.get_broker()
+        with mock.patch.object(broker, 'publish') as publish:
+            with self.captureOnCommitCallbacks(execute=False) as callbacks:
+                self.bom.submit_for_details(WorkflowRole('pattern_maker', 'pm'))
+            publish.assert_not_called()
+            for callback in callbacks:
+                callback()
+
+        channels, message = publish.call_args_list[0].args
+        self.assertEqual(channels, ('boms', 'bom:SSE001'))
+        self.assertEqual((message['type'], message['to_status']), ('bom.transition', 'PENDING_DETAILS'))
+        notified = [call.args for call in publish.call_args_list[1:]]
+        self.assertEqual([channels for channels, _ in notified], [(f'user:{self.user.pk}',)])
+
+    async def test_stream_delivers_subscribed_events(self):
+        response = await self.async_client.get(reverse('bom-stream'), {'style_code': 'SSE001'})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = response.streaming_content
+        first = await anext(stream)
+        self.assertIn(b'retry:', first if isinstance(first, bytes) else first.encode())
+
+        broker = self.streams.get_broker()
+        self.assertEqual(broker.subscriber_count(), 1)
+        broker.publish(('boms', 'bom:OTHER'), {'type': 'bom.transition', 'id': 1, 'style_code': 'OTHER'})
+        broker.publish(('boms', 'bom:SSE001'), {'type': 'bom.transition', 'id': 2, 'style_code': 'SSE001'})
+
+        chunk = await anext(stream)
+        chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+        self.assertIn('id: bom.transition-2', chunk)
+        self.assertIn('"style_code":"SSE001"', chunk)
+
+        await stream.aclose()
+
+    async def test_closing_stream_releases_subscription(self):
+        from .views import _sse_messages
+
+        broker = self.streams.get_broker()
+        stream = _sse_messages(broker, ['boms'])
+        await anext(stream)
+        self.assertEqual(broker.subscriber_count(), 1)
+        await stream.aclose()
+        self.assertEqual(broker.subscriber_count(), 0)
+
+    async def test_slow_subscriber_gets_resync(self):
+        broker = self.streams.LocalBroker()
+        subscription = broker.subscribe(['boms'])
+        for index in range(self.streams.QUEUE_SIZE + 5):
+            broker.publish(('boms',), {'type': 'bom.transition', 'id': index})
+        await asyncio.sleep(0)
+        self.assertTrue(subscription.overflowed)
+        self.assertEqual(subscription.queue.qsize(), self.streams.QUEUE_SIZE)
+        subscription.close()
+        self.assertEqual(broker.subscriber_count(), 0)
+
+    async def test_stream_ignores_user_query_param(self):
+        from unittest import mock
+        from django.test import RequestFactory
+        from .views import bom_event_stream
+
+        request = RequestFactory().get(reverse('bom-stream'), {'user': 'streamuser'})
+        request.auser = _anonymous_auser
+        with mock.patch('boms.views._sse_messages') as messages:
+            await bom_event_stream(request)
+        self.assertEqual(messages.call_args.args[1], ['boms'])
+
+    async def test_user_header_only_honoured_in_debug(self):
+        from unittest import mock
+        from django.test import RequestFactory
+        from .views import bom_event_stream
+
+        for debug, expected in ((False, ['boms']), (True, ['boms', f'user:{self.user.pk}'])):
+            request = RequestFactory().get(reverse('bom-stream'), HTTP_X_USER_NAME='streamuser')
+            request.auser = _anonymous_auser
+            with self.settings(DEBUG=debug), mock.patch('boms.views._sse_messages') as messages:
+                await bom_event_stream(request)
+            self.assertEqual(messages.call_args.args[1], expected)
+
+
+async def _anonymous_auser():
+    from django.contrib.auth.models import AnonymousUser
+    return AnonymousUser()
+
+
+class DatabaseBrokerTests(APITestCase):
+    """多 worker 推送后端：按 id 轮询事件表"""
+
+    def setUp(self):
+        from . import streams
+        self.streams = streams
+        self.user = User.objects.create(username='brokeruser', role='designer')
+        Bom.objects.create(
+            style_code='DBB001', product_name='轮询测试', season='SPRING', year=2025,
+            wave='第一波', category='TOP', dev_colors='黑色', status='PENDING_CRAFT',
+            created_by=self.user
+        )
+        self.broker = streams.DatabaseBroker()
+
+    async def create_event(self, event_id=None):
+        return await BomEvent.objects.acreate(
+            id=event_id, bom_id='DBB001', action='approve', from_status='PENDING_CRAFT', to_status='CONFIRMED'
+        )
+
+    async def start_polling(self):
+        subscription = self.broker.subscribe(['boms'])
+        while self.broker._cursors is None:
+            await asyncio.sleep(0.01)
+        return subscription
+
+    async def received_ids(self, subscription):
+        await asyncio.sleep(0)
+        ids = []
+        while not subscription.queue.empty():
+            ids.append(subscription.queue.get_nowait()['id'])
+        return ids
+
+    async def test_late_committed_lower_id_is_delivered(self):
+        # 不启动后台轮询，手动驱动 poll_once
+        subscription = self.streams.LocalBroker.subscribe(self.broker, ['boms'])
+        base = (await self.create_event()).id
+        await self.broker._start()
+
+        # base+2 先提交，base+1 稍后才可见
+        await self.create_event(base + 2)
+        await self.broker.poll_once(now=0)
+        self.assertEqual(await self.received_ids(subscription), [base + 2])
+        await self.create_event(base + 1)
+        await self.broker.poll_once(now=1)
+        self.assertEqual(await self.received_ids(subscription), [base + 1])
+        await self.broker.poll_once(now=2)
+        self.assertEqual(await self.received_ids(subscription), [])
+
+        # 始终没有出现的 id（回滚留下的空号）超时后跳过，水位继续推进
+        await self.create_event(base + 4)
+        await self.broker.poll_once(now=3)
+        cursor = self.broker._cursors[BomEvent]
+        self.assertEqual(cursor.last_id, base + 2)
+        await self.broker.poll_once(now=3 + self.broker.gap_timeout)
+        self.assertEqual(cursor.last_id, base + 4)
+        self.assertEqual(cursor.seen, set())
+        self.assertEqual(await self.received_ids(subscription), [base + 4])
+        subscription.close()
+
+    async def test_restart_does_not_replay_rows_from_idle_period(self):
+        self.broker.poll_interval = 0.01
+        subscription = await self.start_polling()
+        await self.create_event()
+        self.assertEqual((await subscription.get(5))['type'], 'bom.transition')
+        subscription.close()
+        await self.broker._poller
+        self.assertIsNone(self.broker._cursors)
+
+        await self.create_event()  # 无人订阅期间写入
+        subscription = await self.start_polling()
+        latest = await self.create_event()
+        self.assertEqual((await subscription.get(5))['id'], latest.id)
+        self.assertEqual(await self.received_ids(subscription), [])
+        subscription.close()
+        await self.broker._poller
+
+
+class RequestMetricsTests(APITestCase):
+    """请求级SQL/耗时埋点与慢请求日志测试"""
+
+    def setUp(self):
+        self.user = User.objects.create(username='metricsuser', role='designer')
+        for index in range(6):
+            Bom.objects.create(
+                style_code=f'MET{index:03d}', product_name='埋点测试', season='SPRING', year=2025,
+                wave='第一波', category='TOP', dev_colors='黑色', status='PENDING_CRAFT',
+                created_by=self.user
+            )
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('bom-detail', kwargs={'style_code': 'MET000'}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        timing = response['Server-Timing']
+        self.assertIn('db;dur=', timing)
+        self.assertIn('desc="2 queries"', timing)
+        for name in ('render', 'view', 'total'):
+            self.assertIn(f'{name};dur=', timing)
+
+    @override_settings(BOM_SERVER_TIMING=False)
+    def test_server_timing_can_be_disabled(self):
+        response = self.client.get(reverse('bom-detail', kwargs={'style_code': 'MET000'}))
+        self.assertNotIn('Server-Timing', response)
+
+    @override_settings(BOM_SLOW_REQUEST_MS=0, BOM_REPEATED_QUERY_MIN=3)
+    def test_slow_request_log_reports_repeated_queries(self):
+        from django.http import HttpResponse
+        from django.test import RequestFactory
+        from .instrumentation import RequestMetricsMiddleware
+
+        def n_plus_one(request):
+            # 逐个读取BOM的创建人：典型的 N+1
+            names = [bom.created_by.username for bom in Bom.objects.all()]
+            return HttpResponse(','.join(names))
+
+        middleware = RequestMetricsMiddleware(n_plus_one)
+        with self.assertLogs('boms.performance', level='WARNING') as logs:
+            response = middleware(RequestFactory().get('/api/boms/'))
+
+        self.assertIn('desc="7 queries"', response['Server-Timing'])
+        record = logs.records[0]
+        self.assertIn('N+1', record.getMessage())
+        metrics = record.request_metrics
+        self.assertEqual(metrics['query_count'], 7)
+        self.assertEqual(metrics['repeated_queries'][0]['count'], 6)
+        self.assertIn('FROM "bom_user"', metrics['repeated_queries'][0]['sql'])
+
+    @override_settings(BOM_SLOW_REQUEST_MS=60_000)
+    def test_fast_request_not_logged(self):
+        with self.assertNoLogs('boms.performance', level='WARNING'):
+            self.client.get(reverse('bom-list'))
+
+    def test_submit_for_details_does_not_load_all_boms(self):
+        url = reverse('submit-for-details', kwargs={'style_code': 'MET000'})
+        with self.assertNumQueries(7):  # 读取BOM + 转换（6条）
+            response = self.client.post(url, HTTP_X_USER_ROLE='pattern_maker')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('desc="7 queries"', response['Server-Timing'])
+
+
+class PrometheusMetricsTests(APITestCase):
+    """/metrics 指标测试"""
+
+    def setUp(self):
+        from . import metrics
+        self.metrics = metrics
+        metrics.registry.reset()
+        self.user = User.objects.create(username='promuser', role='designer')
+        self.bom = Bom.objects.create(
+            style_code='PROM001', product_name='指标测试', season='SPRING', year=2025,
+            wave='第一波', category='TOP', dev_colors='黑色', status='PENDING_CRAFT',
+            created_by=self.user
+        )
+
+    def scrape(self):
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        return response.content.decode('utf-8')
+
+    def test_request_latency_by_url_name(self):
+        self.client.get(reverse('bom-list'))
+        self.client.get(reverse('bom-detail', kwargs={'style_code': 'PROM001'}))
+        self.client.get(reverse('bom-detail', kwargs={'style_code': 'PROM001'}))
+
+        body = self.scrape()
+        self.assertIn('# TYPE bom_http_request_duration_seconds histogram', body)
+        self.assertIn('bom_http_request_duration_seconds_bucket{view="bom-list",le="+Inf"} 1', body)
+        self.assertIn('bom_http_request_duration_seconds_count{view="bom-detail"} 2', body)
+        self.assertIn('bom_http_requests_total{view="bom-detail",method="GET",status="200"} 2', body)
+        self.assertIn('bom_http_db_queries_total{view="bom-detail"} 4', body)
+
+    def test_transitions_counted_after_commit(self):
+        url = reverse('submit-for-details', kwargs={'style_code': 'PROM001'})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url, HTTP_X_USER_ROLE='pattern_maker')
+        with self.captureOnCommitCallbacks(execute=False):
+            # 未提交的转换不计数
+            Bom.objects.get(pk='PROM001').submit_to_craft(WorkflowRole('designer', 'd1'))
+
+        body = self.scrape()
+        self.assertIn(
+            'bom_workflow_transitions_total{action="submit_for_details",'
+            'from_status="PENDING_CRAFT",to_status="PENDING_DETAILS"} 1', body
+        )
+        self.assertNotIn('action="submit_to_craft"', body)
+
+    def test_merges_other_worker_snapshots(self):
+        import json
+        import tempfile
+
+        with tempfile.TemporaryDirectory() as directory, override_settings(BOM_METRICS_DIR=directory):
+            self.metrics.workflow_transitions.inc(('approve', 'PENDING_CRAFT', 'CONFIRMED'), 2)
+            self.metrics.registry.flush()
+            other = {'bom_workflow_transitions_total': {
+                json.dumps(['approve', 'PENDING_CRAFT', 'CONFIRMED']): 3,
+            }}
+            with open(f'{directory}/999999.json', 'w', encoding='utf-8') as f:
+                json.dump(other, f)
+
+            body = self.metrics.registry.expose()
+
+        self.assertIn(
+            'bom_workflow_transitions_total{action="approve",'
+            'from_status="PENDING_CRAFT",to_status="CONFIRMED"} 5', body
+        )
+
+
+class BenchmarkSuiteTests(APITestCase):
+    """基准数据生成与基准测试命令（小规模）"""
+
+    def test_generate_data_is_deterministic_and_resumable(self):
+        from .benchmarks import seed_catalog
+
+        call_command('generate_bom_data', boms=3, details_per_bom=4, sizes_per_bom=3,
+                     batch_size=2, stdout=StringIO())
+        self.assertEqual(Bom.objects.filter(style_code__startswith='BENCH').count(), 3)
+        self.assertEqual(SizeSpec.objects.count(), 9)
+        details = BomDetail.objects.count()
+        self.assertGreaterEqual(details, 3 * 2)
+
+        rollups = Bom.compute_cost_rollups(['BENCH0000000'])
+        bom = Bom.objects.get(pk='BENCH0000000')
+        self.assertEqual((bom.total_cost, bom.detail_count), rollups['BENCH0000000'][:2])
+
+        # 再次执行不会重复生成
+        self.assertEqual(seed_catalog(3, details_per_bom=4, sizes_per_bom=3),
+                         {'boms': 0, 'details': 0, 'size_specs': 0})
+        self.assertEqual(BomDetail.objects.count(), details)
+
+    @override_settings(ALLOWED_HOSTS=['localhost'])
+    def test_run_benchmarks_writes_results(self):
+        import json
+        import tempfile
+
+        call_command('generate_bom_data', boms=4, details_per_bom=3, sizes_per_bom=2, stdout=StringIO())
+        with tempfile.NamedTemporaryFile(suffix='.json') as output:
+            call_command('run_benchmarks', repeat=2, warmup=0, output=output.name, stdout=StringIO())
+            with open(output.name, encoding='utf-8') as f:
+                results = json.load(f)
+
+        self.assertEqual(results['environment']['rows']['boms'], 4)
+        self.assertEqual(
+            set(results['scenarios']),
+            {'list', 'list_large_page', 'list_filtered', 'list_cost_ordering', 'search', 'detail', 'document', 'export_csv', 'size_spec_range', 'workflow'}
+        )
+        for result in results['scenarios'].values():
+            self.assertEqual(result['runs'], 2)
+            self.assertGreater(result['queries'], 0)
+        self.assertEqual(BomEvent.objects.filter(action__in=('approve', 'reject')).count(), 2)
+        self.assertFalse(BomEvent.objects.filter(from_status=F('to_status')).exists())
+
+    def test_unknown_scenario_rejected(self):
+        call_command('generate_bom_data', boms=1, details_per_bom=1, sizes_per_bom=1, stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('run_benchmarks', only=['nope'], stdout=StringIO())
+
+
+class WorkflowLoadTestTests(TransactionTestCase):
+    """工作流并发压测命令（小规模）"""
+
+    @override_settings(ALLOWED_HOSTS=['localhost'])
+    def test_loadtest_reports_and_checks_invariants(self):
+        import json
+        import tempfile
+
+        with tempfile.NamedTemporaryFile(suffix='.json') as output, self.assertNoLogs('boms.views', 'ERROR'):
+            call_command('loadtest_workflow', boms=3, concurrency=4, requests=60,
+                         output=output.name, stdout=StringIO())
+            with open(output.name, encoding='utf-8') as f:
+                result = json.load(f)
+
+        self.assertEqual(result['requests'], 60)
+        self.assertEqual(result['violations'], [])
+        if connection.vendor == 'sqlite':
+            # SQLite 的写锁是库级的，并发写入返回 500 database table is locked（计为错误）属预期，但不能全部失败
+            self.assertLess(result['error_rate'], 1)
+            self.assertTrue(all('locked' in error for error in result['errors'] if '操作失败' in error))
+        else:
+            self.assertEqual(result['error_rate'], 0)
+        succeeded = sum(stats.get('ok', 0) for stats in result['actions'].values())
+        self.assertGreater(succeeded, 0)
+        self.assertEqual(BomEvent.objects.filter(bom__style_code__startswith='LOAD').count(), succeeded)
+        self.assertEqual(
+            sum(Bom.objects.filter(style_code__startswith='LOAD').values_list('version', flat=True)),
+            3 + succeeded
+        )
+
+    def test_invariants_detect_duplicate_and_lost_updates(self):
+        from .benchmarks import check_workflow_invariants, workflow_snapshot
+
+        user = User.objects.create_user(username='invariant', password='password')
+        Bom.objects.create(
+            style_code='INV001', product_name='不变量', season='SPRING', year=2025,
+            wave='第一波', category='TOP', dev_colors='黑色', status='PENDING_CRAFT', created_by=user
+        )
+        snapshot = workflow_snapshot(['INV001'])
+        bom = Bom.objects.get(pk='INV001')
+        self.assertTrue(bom.approve_bom(WorkflowRole('admin')))
+        self.assertEqual(check_workflow_invariants(snapshot, [('INV001', 2)]), [])
+
+        # 已确认的BOM不能再次批准
+        self.assertFalse(bom.approve_bom(WorkflowRole('admin')))
+        # 两个成功响应拿到同一版本号即为丢失更新
+        self.assertTrue(check_workflow_invariants(snapshot, [('INV001', 2), ('INV001', 2)]))
+        # 绕过条件 UPDATE 的写入会让版本号与事件数不一致
+        Bom.objects.filter(pk='INV001').update(version=5)
+        self.assertTrue(check_workflow_invariants(snapshot, [('INV001', 2)]))
+
+
+class BomFastListTests(APITestCase):
+    """列表 values() 快速序列化路径与 BomSerializer 的输出一致性"""
+
+    def setUp(self):
+        from django.utils import timezone
+
+        self.user = User.objects.create_user(username='fastuser', password='password')
+        Bom.objects.create(
+            style_code='FAST001', product_name='快速\u2028路径', season='SPRING', year=2025, wave='第一波',
+            category='TOP', dev_colors=' 黑色 / 白色/', target_price=Decimal('99.90'),
+            estimated_cost=Decimal('0'), fabric_composition='100%棉', fabric_weight='180g',
+            care_instructions='手洗 "冷水"', status='CONFIRMED', notes='多行\n备注',
+            confirmed_at=timezone.now(), created_by=self.user
+        )
+        Bom.objects.create(
+            style_code='FAST002', product_name='无价格', season='WINTER', year=2024, wave='第二波',
+            category='DRESS', dev_colors='', created_by=self.user
+        )
+        BomDetail.objects.create(
+            bom_id='FAST001', sequence=1, material_type='FABRIC', material_name='面料', specification='-',
+            usage_quantity=Decimal('1.333'), usage_unit='M', unit_price=Decimal('12.3456')
+        )
+        BomDetail.objects.create(
+            bom_id='FAST001', sequence=2, material_type='BUTTON', material_name='纽扣', specification='-',
+            usage_quantity=Decimal('6'), usage_unit='PCS', unit_price=Decimal('0.0500')
+        )
+
+    def test_rendered_json_is_byte_identical(self):
+        from rest_framework.renderers import JSONRenderer
+        from .serializers import BomListRowSerializer, BomSerializer
+
+        renderer = JSONRenderer()
+        queryset = Bom.objects.order_by('style_code')
+        for time_zone in ('Asia/Shanghai', 'UTC'):
+            with self.settings(TIME_ZONE=time_zone):
+                row_serializer = BomListRowSerializer()
+                expected = renderer.render(BomSerializer(queryset, many=True).data)
+                actual = renderer.render(row_serializer.serialize(queryset.values(*row_serializer.columns)))
+                self.assertEqual(actual, expected)
+        self.assertIn(b'"total_cost":16.7566848', expected)
+
+    def test_list_endpoint_uses_values_rows(self):
+        from .serializers import BomSerializer
+
+        self.client.force_authenticate(user=self.user)
+        with self.assertNumQueries(1) as context:  # 缓存未命中时只有一条列表查询，不连接用户表
+            response = self.client.get(reverse('bom-list'), {'ordering': 'style_code', 'page_size': 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        select = context.captured_queries[-1]['sql']
+        self.assertNotIn('bom_user', select)
+        self.assertEqual(
+            response.json()['results'],
+            [dict(BomSerializer(Bom.objects.get(pk='FAST001')).data, total_cost=16.7566848)]
+        )
+        # 字典行也能生成下一页游标
+        response = self.client.get(response.data['next'])
+        self.assertEqual([row['style_code'] for row in response.data['results']], ['FAST002'])
+
+
+class BomSparseFieldsetTests(APITestCase):
+    """?fields= / ?omit= / ?profile= 稀疏字段集"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='sparse', password='password')
+        for index in range(3):
+            Bom.objects.create(
+                style_code=f'SPARSE{index}', product_name=f'稀疏{index}', season='SPRING', year=2025,
+                wave='第一波', category='TOP', dev_colors='黑色/白色', notes='长备注' * 200,
+                care_instructions='洗护' * 100, fabric_composition='成分' * 100, created_by=self.user
+            )
+
+    def test_list_fields_trim_output_and_columns(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('bom-list'), {
+                'fields': 'style_code,dev_colors_list', 'ordering': '-updated_at', 'page_size': 2
+            })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0], {'style_code': 'SPARSE2', 'dev_colors_list': ['黑色', '白色']})
+        select = context.captured_queries[-1]['sql']
+        self.assertNotIn('"notes"', select)
+        self.assertNotIn('"care_instructions"', select)
+
+        # 排序字段不在输出中也能翻页
+        response = self.client.get(response.data['next'])
+        self.assertEqual([row['style_code'] for row in response.data['results']], ['SPARSE0'])
+
+    def test_omit_and_compact_profile(self):
+        response = self.client.get(reverse('bom-list'), {'omit': 'notes,care_instructions,fabric_composition'})
+        row = response.data['results'][0]
+        self.assertNotIn('notes', row)
+        self.assertIn('material_costs', row)
+
+        full = self.client.get(reverse('bom-list'))
+        compact = self.client.get(reverse('bom-list'), {'profile': 'compact'})
+        self.assertEqual(list(compact.data['results'][0]), [
+            'style_code', 'product_name', 'season', 'year', 'wave', 'category',
+            'dev_colors_list', 'target_price', 'total_cost', 'status', 'version', 'updated_at',
+        ])
+        self.assertLess(len(compact.content) * 5, len(full.content))
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client.get(reverse('bom-list'), {'fields': 'style_code,password'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(reverse('bom-detail', kwargs={'style_code': 'SPARSE0'}), {'profile': 'tiny'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_detail_fields_defer_columns(self):
+        url = reverse('bom-detail', kwargs={'style_code': 'SPARSE0'})
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, {'fields': 'style_code,status,total_cost'})
+        self.assertEqual(response.data, {'style_code': 'SPARSE0', 'status': 'DRAFT', 'total_cost': Decimal('0')})
+        select = context.captured_queries[-1]['sql']
+        self.assertNotIn('"notes"', select)
+        self.assertNotIn('bom_user', select)
+
+        # 稀疏读取得到的 ETag 可直接用于 If-Match 写入，写入响应仍为完整字段
+        response = self.client.patch(url, {'product_name': '改名'}, format='json', HTTP_IF_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('notes', response.data)
+
+
+class SizeGradingTests(APITestCase):
+    """基础码按品类档差推档"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='grader', password='password')
+        self.client.login(username='grader', password='password')
+        self.top = Bom.objects.create(
+            style_code='GRADE1', product_name='推档T恤', season='SPRING', year=2025,
+            wave='第三波', category='TOP', created_by=self.user
+        )
+        self.bottom = Bom.objects.create(
+            style_code='GRADE2', product_name='推档长裤', season='SPRING', year=2025,
+            wave='第三波', category='BOTTOM', created_by=self.user
+        )
+        SizeSpec.objects.create(bom=self.top, size='M', measurements={'胸围': 100, '肩宽': 44.5, '领标': 3})
+        SizeSpec.objects.create(bom=self.bottom, size='M', measurements={'腰围': 70, '裤长': 100})
+
+    def _measurements(self, bom):
+        return {spec.size: spec.measurements for spec in SizeSpec.objects.filter(bom=bom)}
+
+    def test_grade_matrix(self):
+        graded = grading.grade({
+            'A': ('TOP', {'胸围': 100, '肩宽': 44.5}),
+            'B': ('BOTTOM', {'腰围': 70}),
+        }, base_size='M', sizes=['XL', 'S', 'M'])
+        self.assertEqual(graded['A'], [
+            ('S', 2, {'胸围': 96, '肩宽': 43.3}),
+            ('M', 3, {'胸围': 100, '肩宽': 44.5}),
+            ('XL', 5, {'胸围': 108, '肩宽': 46.9}),
+        ])
+        # 款式之间的部位互不影响
+        self.assertEqual(graded['B'][0], ('S', 2, {'腰围': 66}))
+        # 覆盖档差、不会出现负数
+        graded = grading.grade({'C': ('TOP', {'胸围': 6})}, sizes=['XXS'], overrides={'胸围': 3})
+        self.assertEqual(graded['C'], [('XXS', 0, {'胸围': 0})])
+        with self.assertRaises(grading.GradingError):
+            grading.grade({'C': ('TOP', {'胸围': 100})}, base_size='XXXXL')
+
+    def test_grade_skips_text_measurements_and_keeps_base_row(self):
+        graded = grading.grade({
+            'A': ('TOP', {'胸围': 100.04, '领型': '见附图'}),
+            'B': ('TOP', {'胸围': 96}),
+        }, sizes=['S', 'M'])
+        # 非数字部位不推档，也不影响同批其他款式
+        self.assertEqual(graded['A'][0], ('S', 2, {'胸围': 96}))
+        self.assertEqual(graded['B'][0], ('S', 2, {'胸围': 92}))
+        # 基础码原样保留：不舍入，也不丢失非数字部位
+        self.assertEqual(graded['A'][1], ('M', 3, {'胸围': 100.04, '领型': '见附图'}))
+
+    def test_grade_single_bom_upserts(self):
+        SizeSpec.objects.create(bom=self.top, size='L', measurements={'胸围': 1}, is_active=False)
+        url = reverse('bom-grade-sizes', kwargs={'style_code': 'GRADE1'})
+        self.client.get(reverse('bom-document', kwargs={'style_code': 'GRADE1'}))  # 写入缓存
+
+        response = self.client.post(url, {'increments': {'领标': 0.5}}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['data']), 8)
+        measurements = self._measurements(self.top)
+        self.assertEqual(measurements['L'], {'胸围': 104, '肩宽': 45.7, '领标': 3.5})
+        self.assertEqual(measurements['XXS'], {'胸围': 88, '肩宽': 40.9, '领标': 1.5})
+        spec = SizeSpec.objects.get(bom=self.top, size='L')
+        self.assertTrue(spec.is_active)
+        self.assertEqual(spec.sort_order, 4)
+        # bulk_create 不触发信号，缓存需要手动失效
+        document = self.client.get(reverse('bom-document', kwargs={'style_code': 'GRADE1'}))
+        self.assertEqual(len(document.data['size_specs']), 8)
+
+    def test_grade_single_bom_with_request_measurements(self):
+        url = reverse('bom-grade-sizes', kwargs={'style_code': 'GRADE2'})
+        response = self.client.post(url, {
+            'base_size': 'L', 'measurements': {'腰围': 80}, 'sizes': ['M', 'L'],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self._measurements(self.bottom), {'M': {'腰围': 76}, 'L': {'腰围': 80}})
+
+        response = self.client.post(url, {'base_size': 'XS'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(url, {'sizes': ['M', 'XXXXL']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_grade_wave(self):
+        Bom.objects.create(
+            style_code='GRADE3', product_name='无尺码', season='SPRING', year=2025,
+            wave='第三波', category='TOP', created_by=self.user
+        )
+        Bom.objects.create(
+            style_code='OTHER1', product_name='其他波段', season='SPRING', year=2025,
+            wave='第一波', category='TOP', created_by=self.user
+        )
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(reverse('bom-bulk-grade-sizes'), {'wave': '第三波', 'year': 2025}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['boms'], 2)
+        self.assertEqual(response.data['size_specs'], 16)
+        self.assertEqual(response.data['skipped'], ['GRADE3'])
+        self.assertEqual(self._measurements(self.bottom)['XXXL'], {'腰围': 86, '裤长': 108})
+        self.assertFalse(SizeSpec.objects.filter(bom_id__in=['GRADE3', 'OTHER1']).exists())
+        inserts = [q for q in context.captured_queries if q['sql'].startswith('INSERT INTO "bom_size_spec"')]
+        self.assertEqual(len(inserts), 1)
+
+        response = self.client.post(reverse('bom-bulk-grade-sizes'), {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_grade_sizes_command(self):
+        out = StringIO()
+        call_command('grade_sizes', '--wave', '第三波', '--sizes', 'S', 'M', 'L', stdout=out)
+        self.assertIn('已为 2 个BOM生成 6 条尺码规格', out.getvalue())
+        self.assertEqual(self._measurements(self.top)['S'], {'胸围': 96, '肩宽': 43.3, '领标': 3})
+        with self.assertRaises(CommandError):
+            call_command('grade_sizes', '--wave', '第三波', '--base-size', 'Q', stdout=out)
+
+
+class SizeMeasurementQueryTests(APITestCase):
+    """部位尺寸索引表的同步与范围查询"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='measure', password='password')
+        self.boms = {}
+        for code, category, chest in (('MEAS1', 'TOP', 100), ('MEAS2', 'TOP', 108), ('MEAS3', 'BOTTOM', 104)):
+            bom = Bom.objects.create(
+                style_code=code, product_name=code, season='SPRING', year=2025,
+                wave='第一波', category=category, created_by=self.user
+            )
+            SizeSpec.objects.create(bom=bom, size='M', measurements={'胸围': chest, '肩宽': 44.5, '备注': '宽松'})
+            SizeSpec.objects.create(bom=bom, size='L', measurements={'胸围': chest + 4, '肩宽': 45.7})
+            self.boms[code] = bom
+
+    def _query(self, **params):
+        response = self.client.get(reverse('size-spec-query'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [(row['style_code'], row['size']) for row in response.data['results']]
+
+    def test_rows_follow_size_spec_writes(self):
+        spec = SizeSpec.objects.get(bom_id='MEAS1', size='M')
+        self.assertEqual(
+            dict(SizeMeasurement.objects.filter(spec=spec).values_list('part', 'value')),
+            {'胸围': 100.0, '肩宽': 44.5}
+        )
+        spec.measurements = {'胸围': 101}
+        spec.save()
+        self.assertEqual(list(SizeMeasurement.objects.filter(spec=spec).values_list('part', 'value')), [('胸围', 101.0)])
+        spec.delete()
+        self.assertFalse(SizeMeasurement.objects.filter(bom_id='MEAS1', size='M').exists())
+
+        # bulk_create 不触发信号，由 rebuild 补齐
+        SizeMeasurement.objects.all().delete()
+        self.assertEqual(SizeMeasurement.rebuild(), 10)
+
+    def test_range_filters(self):
+        self.assertEqual(
+            self._query(size='M', measurement='胸围:100:108', bom__category='TOP'),
+            [('MEAS1', 'M'), ('MEAS2', 'M')]
+        )
+        self.assertEqual(self._query(size='M', measurement='胸围:101:'), [('MEAS2', 'M'), ('MEAS3', 'M')])
+        self.assertEqual(self._query(size__in='M,L', measurement='胸围::104'), [
+            ('MEAS1', 'M'), ('MEAS1', 'L'), ('MEAS3', 'M'),
+        ])
+        # 多个条件需同一尺码同时满足
+        self.assertEqual(
+            self._query(measurement=['胸围:104:104', '肩宽:45:']),
+            [('MEAS1', 'L')]
+        )
+        SizeSpec.objects.filter(bom_id='MEAS1', size='L').update(is_active=False)
+        self.assertEqual(self._query(measurement='胸围:104:104'), [('MEAS3', 'M')])
+        self.assertEqual(self._query(measurement='胸围:104:104', is_active='false'), [('MEAS1', 'L')])
+
+    def test_graded_sizes_are_indexed(self):
+        grading.save(grading.grade({'MEAS3': ('BOTTOM', {'腰围': 70})}, sizes=['XL']))
+        self.assertEqual(self._query(measurement='腰围:78:78'), [('MEAS3', 'XL')])
+
+    def test_invalid_conditions(self):
+        for value in ('胸围', '胸围::', '胸围:a:110', ':100:110'):
+            response = self.client.get(reverse('size-spec-query'), {'measurement': value})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, value)
+
+    def test_range_uses_index(self):
+        queryset = SizeMeasurement.objects.filter(part='胸围', size='M', value__gte=100, value__lte=110)
+        self.assertIn('bom_size_measure_range_idx', queryset.explain())
+
+
+class BomSizeChartTests(APITestCase):
+    """尺码表列式矩阵"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='chart', password='password')
+        for code in ('CHART1', 'CHART2', 'CHART3'):
+            Bom.objects.create(
+                style_code=code, product_name=code, season='SPRING', year=2025,
+                wave='第一波', category='TOP', created_by=self.user
+            )
+        SizeSpec.objects.create(bom_id='CHART1', size='L', sort_order=4, measurements={'胸围': 104, '衣长': 70})
+        SizeSpec.objects.create(bom_id='CHART1', size='S', sort_order=2, measurements={'胸围': 96, '袖长': 58.5})
+        SizeSpec.objects.create(bom_id='CHART1', size='M', sort_order=3, measurements={'胸围': 100, '衣长': 68, '备注': '宽松'})
+        SizeSpec.objects.create(bom_id='CHART1', size='XL', sort_order=5, measurements={'胸围': 108}, is_active=False)
+        SizeSpec.objects.create(bom_id='CHART2', size='M', sort_order=3, measurements={'腰围': 70, '胸围': 90})
+
+    def test_single_chart(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('bom-size-chart', kwargs={'style_code': 'CHART1'}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {
+            'style_code': 'CHART1',
+            'sizes': ['S', 'M', 'L'],
+            'parts': ['胸围', '袖长', '衣长'],
+            'values': [[96, 58.5, None], [100, None, 68], [104, None, 70]],
+        })
+
+        response = self.client.get(reverse('bom-size-chart', kwargs={'style_code': 'CHART3'}))
+        self.assertEqual(response.data, {'style_code': 'CHART3', 'sizes': [], 'parts': [], 'values': []})
+        response = self.client.get(reverse('bom-size-chart', kwargs={'style_code': 'NOPE'}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_multiple_charts_in_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('bom-size-chart-list'), {'style_codes': 'CHART2,CHART3,CHART1'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertEqual([chart['style_code'] for chart in results], ['CHART2', 'CHART3', 'CHART1'])
+        # 部位按各BOM内首次出现的顺序，互不影响
+        self.assertEqual(results[0]['parts'], ['腰围', '胸围'])
+        self.assertEqual(results[0]['values'], [[70, 90]])
+        self.assertEqual(results[1]['values'], [])
+        self.assertEqual(results[2]['parts'], ['胸围', '袖长', '衣长'])
+
+        response = self.client.get(reverse('bom-size-chart-list'))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_chart_is_smaller_than_row_wise_specs(self):
+        from .benchmarks import MEASUREMENT_BASE
+        from .serializers import SizeSpecSerializer
+
+        for code in ('CHART2', 'CHART3'):
+            grading.save(grading.grade({code: ('TOP', dict(MEASUREMENT_BASE))}))
+        chart = self.client.get(reverse('bom-size-chart-list'), {'style_codes': 'CHART2,CHART3'})
+        specs = SizeSpec.objects.filter(bom_id__in=['CHART2', 'CHART3'], is_active=True)
+        row_wise = JSONRenderer().render(SizeSpecSerializer(specs, many=True).data)
+        self.assertGreater(len(row_wise), len(chart.content) * 3)
+
+
+class MrpExplosionTests(APITestCase):
+    """订单行 × BOM用量 → 物料需求"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='planner', password='password')
+        self.client.login(username='planner', password='password')
+        for code in ('MRP1', 'MRP2', 'MRP3'):
+            Bom.objects.create(
+                style_code=code, product_name=code, season='SPRING', year=2025,
+                wave='第一波', category='TOP', created_by=self.user
+            )
+        rows = (
+            ('MRP1', 1, 'FABRIC', 'F-001', '棉布', '华纺面料', '1.235', 'M', '12.3456'),
+            ('MRP1', 2, 'BUTTON', 'B-001', '树脂扣', '申达纽扣', '6', 'PCS', '0.0333'),
+            ('MRP2', 1, 'FABRIC', 'F-001', '棉布', '华纺面料', '0.805', 'M', '12.3456'),
+            ('MRP2', 2, 'FABRIC', 'F-001', '棉布', '广缘纺织', '0.500', 'M', '11.0000'),
+            ('MRP2', 3, 'THREAD', '', '缝纫线', '恒丰线业', '0.001', 'ROLL', '3.3333'),
+        )
+        for code, sequence, material_type, material_code, name, supplier, usage, unit, price in rows:
+            BomDetail.objects.create(
+                bom_id=code, sequence=sequence, material_type=material_type, material_code=material_code,
+                material_name=name, specification='', supplier_name=supplier,
+                usage_quantity=Decimal(usage), usage_unit=unit, unit_price=Decimal(price)
+            )
+
+    def _explode(self, lines):
+        return self.client.post(reverse('mrp-explode'), {'lines': lines}, format='json')
+
+    def test_explosion_groups_and_rounding(self):
+        lines = [
+            {'style_code': 'MRP1', 'color': '黑色', 'size': 'M', 'quantity': 100},
+            {'style_code': 'MRP1', 'color': '白色', 'size': 'L', 'quantity': 3},
+            {'style_code': 'MRP2', 'quantity': 7},
+            {'style_code': 'MRP3', 'quantity': 5},
+            {'style_code': 'NOPE', 'quantity': 1},
+        ]
+        with self.assertNumQueries(1 + 2):  # 会话、用户 + 明细
+            response = self._explode(lines)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['order_lines'], 5)
+        self.assertEqual(response.data['order_quantity'], 116)
+        self.assertEqual(response.data['missing_styles'], ['MRP3', 'NOPE'])
+        materials = {
+            (item['material_code'] or item['material_name'], item['supplier_name'], item['usage_unit']): item
+            for item in response.data['materials']
+        }
+        self.assertEqual(len(materials), 4)
+
+        fabric = materials[('F-001', '华纺面料', 'M')]
+        # 1.235 × 103 + 0.805 × 7 = 127.205 + 5.635，精确到3位小数
+        self.assertEqual(fabric['demand'], '132.840')
+        self.assertEqual(fabric['purchase_quantity'], '133')
+        # 132.840 × 12.3456 = 1639.989504 → 1639.99
+        self.assertEqual(fabric['cost'], '1639.99')
+        self.assertEqual(fabric['styles'], 2)
+
+        buttons = materials[('B-001', '申达纽扣', 'PCS')]
+        self.assertEqual((buttons['demand'], buttons['purchase_quantity']), ('618.000', '618'))
+        # 618 × 0.0333 = 20.5794 → 20.58
+        self.assertEqual(buttons['cost'], '20.58')
+
+        # 物料编码为空时按名称分组；0.007 向上取整为 1 个单位，0.0233331 四舍五入为 0.02
+        thread = materials[('缝纫线', '恒丰线业', 'ROLL')]
+        self.assertEqual((thread['demand'], thread['purchase_quantity'], thread['cost']), ('0.007', '1', '0.02'))
+
+        # 总成本按未舍入的成本合计后舍入一次：1639.989504 + 20.5794 + 38.5 + 0.0233331
+        self.assertEqual(materials[('F-001', '广缘纺织', 'M')]['cost'], '38.50')
+        self.assertEqual(response.data['total_cost'], '1699.09')
+
+    def test_half_up_rounding(self):
+        BomDetail.objects.filter(bom_id='MRP1', sequence=2).update(
+            usage_quantity=Decimal('1'), unit_price=Decimal('0.0250')
+        )
+        response = self._explode([{'style_code': 'MRP1', 'quantity': 1}])
+        buttons = [item for item in response.data['materials'] if item['material_code'] == 'B-001'][0]
+        # 0.025 → 0.03（ROUND_HALF_UP，银行家舍入会得到 0.02）
+        self.assertEqual(buttons['cost'], '0.03')
+
+    def test_invalid_lines(self):
+        for lines in ([], None, [{'quantity': 1}], [{'style_code': 'MRP1', 'quantity': 0}],
+                      [{'style_code': 'MRP1', 'quantity': 1.5}], [{'style_code': 'MRP1', 'quantity': True}]):
+            response = self._explode(lines)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, lines)
+
+    def test_large_values_stay_exact(self):
+        from . import mrp
+
+        BomDetail.objects.filter(bom_id='MRP1', sequence=1).update(
+            usage_quantity=Decimal('9999999.999'), unit_price=Decimal('999999.9999')
+        )
+        result = mrp.explode([{'style_code': 'MRP1', 'quantity': mrp.MAX_LINE_QUANTITY}] * 3)
+        fabric = [item for item in result['materials'] if item['material_code'] == 'F-001'][0]
+        demand = Decimal('9999999.999') * 3 * mrp.MAX_LINE_QUANTITY
+        self.assertEqual(fabric['demand'], str(demand))
+        self.assertEqual(fabric['cost'], str((demand * Decimal('999999.9999')).quantize(Decimal('0.01'))))
+
+
+class UnitNormalizationTests(APITestCase):
+    """明细用量换算到基础单位"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='units', password='password')
+        for code, season in (('UNIT1', 'SPRING'), ('UNIT2', 'SPRING'), ('UNIT3', 'AUTUMN')):
+            Bom.objects.create(
+                style_code=code, product_name=code, season=season, year=2025,
+                wave='第一波', category='TOP', created_by=self.user
+            )
+
+    def _detail(self, code, sequence, material_type, material_code, usage, unit):
+        return BomDetail.objects.create(
+            bom_id=code, sequence=sequence, material_type=material_type, material_code=material_code,
+            material_name=material_code, specification='', usage_quantity=Decimal(usage),
+            usage_unit=unit, unit_price=Decimal('1')
+        )
+
+    def _base(self, detail):
+        detail.refresh_from_db()
+        return detail.base_quantity, detail.base_unit
+
+    def test_fixed_conversions_on_save(self):
+        yard = self._detail('UNIT1', 1, 'FABRIC', 'F-001', '1.235', 'YARD')
+        pair = self._detail('UNIT1', 2, 'TRIM', 'T-001', '3', 'PAIR')
+        roll = self._detail('UNIT1', 3, 'THREAD', 'TH-001', '0.050', 'ROLL')
+        # 1.235 × 0.9144 = 1.129284
+        self.assertEqual(self._base(yard), (Decimal('1.129284'), 'M'))
+        self.assertEqual(self._base(pair), (Decimal('6'), 'PCS'))
+        self.assertEqual(self._base(roll), (None, ''))
+
+        yard.usage_quantity = Decimal('2')
+        yard.usage_unit = 'M'
+        yard.save()
+        self.assertEqual(self._base(yard), (Decimal('2'), 'M'))
+
+    def test_material_factor_overrides_and_renormalizes(self):
+        roll = self._detail('UNIT1', 1, 'THREAD', 'TH-001', '0.050', 'ROLL')
+        kg = self._detail('UNIT2', 1, 'FABRIC', 'F-002', '0.333', 'KG')
+        other = self._detail('UNIT2', 2, 'FABRIC', 'F-003', '0.333', 'KG')
+
+        factor = MaterialUnitFactor.objects.create(material_code='TH-001', unit='ROLL', base_unit='M', factor=Decimal('5000'))
+        MaterialUnitFactor.objects.create(material_code='F-002', unit='KG', base_unit='M', factor=Decimal('3.2'))
+        self.assertEqual(self._base(roll), (Decimal('250'), 'M'))
+        self.assertEqual(self._base(kg), (Decimal('1.0656'), 'M'))
+        self.assertEqual(self._base(other), (Decimal('0.333'), 'KG'))
+
+        # 新保存的明细直接使用物料系数
+        later = self._detail('UNIT3', 1, 'THREAD', 'TH-001', '0.1', 'ROLL')
+        self.assertEqual(self._base(later), (Decimal('500'), 'M'))
+
+        factor.delete()
+        self.assertEqual(self._base(roll), (None, ''))
+
+    def test_bulk_paths_and_backfill(self):
+        from . import units
+
+        details = [
+            BomDetail(bom_id='UNIT1', sequence=1, material_type='FABRIC', material_code='F-001', material_name='棉布',
+                      specification='', usage_quantity=Decimal('1.5'), usage_unit='YARD', unit_price=Decimal('1')),
+        ]
+        units.apply(details)
+        BomDetail.objects.bulk_create(details)
+        detail = BomDetail.objects.get(bom_id='UNIT1', sequence=1)
+        self.assertEqual((detail.base_quantity, detail.base_unit), (Decimal('1.3716'), 'M'))
+
+        # 直接 UPDATE 绕过了信号，由批量重算修复
+        BomDetail.objects.update(base_quantity=None, base_unit='')
+        out = StringIO()
+        call_command('normalize_units', stdout=out)
+        self.assertIn('已重算 1 条明细', out.getvalue())
+        self.assertEqual(self._base(detail), (Decimal('1.3716'), 'M'))
+
+    def test_material_usage_report(self):
+        self._detail('UNIT1', 1, 'FABRIC', 'F-001', '1.5', 'M')
+        self._detail('UNIT2', 1, 'FABRIC', 'F-004', '2', 'YARD')
+        self._detail('UNIT3', 1, 'FABRIC', 'F-001', '9', 'M')
+        self._detail('UNIT1', 2, 'FABRIC', 'F-005', '0.5', 'KG')
+        self._detail('UNIT1', 3, 'THREAD', 'TH-001', '0.05', 'ROLL')
+        self._detail('UNIT2', 2, 'BUTTON', 'B-001', '2', 'PAIR')
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('bom-material-usage'), {'bom__season': 'SPRING'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'], [
+            {'material_type': 'BUTTON', 'base_unit': 'PCS', 'quantity': '4.000000', 'details': 1},
+            {'material_type': 'FABRIC', 'base_unit': 'KG', 'quantity': '0.500000', 'details': 1},
+            # 1.5 M + 2 YARD (1.8288 M)
+            {'material_type': 'FABRIC', 'base_unit': 'M', 'quantity': '3.328800', 'details': 2},
+        ])
+        self.assertEqual(response.data['unconverted_details'], 1)
+
+        document = self.client.get(reverse('bom-document', kwargs={'style_code': 'UNIT2'}))
+        self.assertEqual(document.data['details'][0]['base_quantity'], '1.828800')
@@ -0,0 +1,104 @@
+"""
+用量单位换算
+
+BomDetail.usage_unit 混用 M / YARD / KG / ROLL / PCS / PAIR / SET，跨款式汇总前需要换算到同一基础单位。
+每条明细写入时计算 base_quantity / base_unit 并存库，汇总报表直接对这两列 SUM。
+
+换算顺序：
+1. 物料换算系数（MaterialUnitFactor，按 物料编码 + 单位），如某缝纫线 1 ROLL = 5000 M、某面料 1 KG = 3.2 M
+2. 固定换算 FIXED_CONVERSIONS，如 1 YARD = 0.9144 M、1 PAIR = 2 PCS
+3. 都没有（如未配置卷长的 ROLL）时无法换算，base_unit 为空、base_quantity 为 NULL
+
+base_quantity = usage_quantity × 系数，四舍五入（ROUND_HALF_UP）保留6位小数。
+
+维护方式：
+- 单条保存由 signals.py 的 pre_save 处理器调用 apply()
+- bulk_create 前对对象列表调用 apply()（一次查询系数）
+- 换算系数增删改后 renormalize(物料编码) 重算对应明细；全量回填用 renormalize() 或 normalize_units 命令
+- QuerySet.update() 修改用量或单位不会触发重算，之后需调用 renormalize()
+"""
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, F, Q, Value
+
+from . import cache as bom_cache
+from .models import BomDetail, MaterialUnitFactor
+
+# 单位 -> (基础单位, 系数)
+FIXED_CONVERSIONS = {
+    'M': ('M', Decimal('1')),
+    'YARD': ('M', Decimal('0.9144')),
+    'KG': ('KG', Decimal('1')),
+    'PCS': ('PCS', Decimal('1')),
+    'PAIR': ('PCS', Decimal('2')),
+    'SET': ('SET', Decimal('1')),
+}
+BASE_QUANTIZE = Decimal('0.000001')
+
+
+def material_factors(material_codes):
+    """一次查询读取这些物料的换算系数：{(物料编码, 单位): (基础单位, 系数)}"""
+    codes = {code for code in material_codes if code}
+    if not codes:
+        return {}
+    return {
+        (code, unit): (base_unit, factor)
+        for code, unit, base_unit, factor in MaterialUnitFactor.objects.filter(material_code__in=codes)
+        .values_list('material_code', 'unit', 'base_unit', 'factor')
+    }
+
+
+def conversion(material_code, unit, factors):
+    """返回 (基础单位, 系数)，无法换算时返回 None"""
+    return factors.get((material_code, unit)) or FIXED_CONVERSIONS.get(unit)
+
+
+def normalize(quantity, material_code, unit, factors):
+    """返回 (base_quantity, base_unit)，无法换算时为 (None, '')"""
+    found = conversion(material_code, unit, factors)
+    if found is None or quantity is None:
+        return None, ''
+    base_unit, factor = found
+    return (Decimal(quantity) * factor).quantize(BASE_QUANTIZE, rounding=ROUND_HALF_UP), base_unit
+
+
+def apply(details, factors=None):
+    """就地计算一批明细对象的 base_quantity / base_unit（不写库），factors 缺省时查询一次"""
+    if factors is None:
+        factors = material_factors(detail.material_code for detail in details)
+    for detail in details:
+        detail.base_quantity, detail.base_unit = normalize(
+            detail.usage_quantity, detail.material_code, detail.usage_unit, factors
+        )
+
+
+def renormalize(material_codes=None):
+    """
+    用 UPDATE 语句批量重算明细的基础单位用量，返回涉及的明细数
+    material_codes 为 None 时重算全部（回填）；否则只重算这些物料编码的明细
+    每个固定换算单位一条 UPDATE，再按物料换算系数逐条覆盖
+    """
+    details = BomDetail.objects.all()
+    factor_rows = MaterialUnitFactor.objects.all()
+    if material_codes is not None:
+        material_codes = list(material_codes)
+        details = details.filter(material_code__in=material_codes)
+        factor_rows = factor_rows.filter(material_code__in=material_codes)
+
+    output = DecimalField(max_digits=20, decimal_places=6)
+    with transaction.atomic():
+        touched = details.exclude(usage_unit__in=FIXED_CONVERSIONS).update(base_quantity=None, base_unit='')
+        for unit, (base_unit, factor) in FIXED_CONVERSIONS.items():
+            touched += details.filter(usage_unit=unit).update(
+                base_unit=base_unit,
+                base_quantity=F('usage_quantity') * Value(factor, output_field=output),
+            )
+        for code, unit, base_unit, factor in factor_rows.values_list('material_code', 'unit', 'base_unit', 'factor'):
+            details.filter(Q(material_code=code) & Q(usage_unit=unit)).update(
+                base_unit=base_unit,
+                base_quantity=F('usage_quantity') * Value(factor, output_field=output),
+            )
+        # UPDATE 不触发信号，明细出现在文档缓存中
+        bom_cache.invalidate(everything=True)
+    return touched
@@ -3,15 +3,40 @@ from . import views
 
 urlpatterns = [
     path('boms/', views.BomListView.as_view(), name='bom-list'),
+    path('boms/import/', views.BomImportView.as_view(), name='bom-import'),
+    path('boms/export/', views.BomExportView.as_view(), name='bom-export'),
+    path('boms/bulk-actions/', views.BulkWorkflowView.as_view(), name='bom-bulk-actions'),
+    path('boms/grade-sizes/', views.BulkGradeSizesView.as_view(), name='bom-bulk-grade-sizes'),
+    path('boms/size-charts/', views.BomSizeChartListView.as_view(), name='bom-size-chart-list'),
+    path('boms/material-usage/', views.MaterialUsageReportView.as_view(), name='bom-material-usage'),
+    path('boms/cache-stats/', views.BomCacheStatsView.as_view(), name='bom-cache-stats'),
+    path('boms/events/', views.BomEventListView.as_view(), name='bom-event-list'),
+    path('boms/documents/', views.BomDocumentListView.as_view(), name='bom-document-list'),
     path('boms/<str:style_code>/', views.BomDetailView.as_view(), name='bom-detail'),
+    path('boms/<str:style_code>/document/', views.BomDocumentView.as_view(), name='bom-document'),
+    path('boms/<str:style_code>/size-chart/', views.BomSizeChartView.as_view(), name='bom-size-chart'),
+    path('boms/<str:style_code>/history/', views.BomHistoryView.as_view(), name='bom-history'),
     
     # 工作流状态变更API端点
     path('boms/<str:style_code>/submit-for-details/', views.SubmitForDetailsView.as_view(), name='submit-for-details'),
     path('boms/<str:style_code>/submit-to-craft/', views.SubmitToCraftView.as_view(), name='submit-to-craft'),
     path('boms/<str:style_code>/approve/', views.ApproveBomView.as_view(), name='approve-bom'),
     path('boms/<str:style_code>/reject/', views.RejectBomView.as_view(), name='reject-bom'),
+    path('boms/<str:style_code>/grade-sizes/', views.BomGradeSizesView.as_view(), name='bom-grade-sizes'),
     path('boms/<str:style_code>/actions/', views.BomActionsView.as_view(), name='bom-actions'),
     
-    # 通知API端点（暂时模拟）
+    # 尺码规格按部位尺寸查询
+    path('size-specs/', views.SizeSpecQueryView.as_view(), name='size-spec-query'),
+
+    # 物料需求展开
+    path('mrp/explode/', views.MrpExplosionView.as_view(), name='mrp-explode'),
+
+    # 实时事件流（SSE，ASGI）
+    path('stream/', views.bom_event_stream, name='bom-stream'),
+
+    # 通知API端点
     path('notifications/', views.NotificationView.as_view(), name='notifications'),
+    path('notifications/unread-count/', views.NotificationUnreadCountView.as_view(), name='notification-unread-count'),
+    path('notifications/mark-all-read/', views.NotificationMarkAllReadView.as_view(), name='notification-mark-all-read'),
+    path('notifications/<int:notification_id>/read/', views.NotificationReadView.as_view(), name='notification-read'),
 ]
@@ -1,17 +1,54 @@
 from rest_framework import generics, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.exceptions import ValidationError
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 from django.shortcuts import get_object_or_404
+from django.db import transaction
+from django.db.models import Count, Prefetch, Sum
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from decimal import Decimal
+import asyncio
+import logging
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from .models import Bom
-from .serializers import BomSerializer
+from django.utils import timezone
+from .models import Bom, BomDetail, BomEvent, Notification, SizeMeasurement, SizeSpec, WorkflowConflictError
+from .serializers import (
+    BomSerializer, BomDocumentSerializer, BomEventSerializer, BomListRowSerializer, NotificationSerializer,
+    SizeSpecQuerySerializer, bom_columns, select_fields,
+)
+from .pagination import BomEventPagination, NotificationPagination, SizeSpecPagination
+from .importers import BomImporter
+from . import cache as bom_cache
+from . import conditional, exporters, grading, mrp, size_charts, streams, units
+from . import metrics as bom_metrics
+from .instrumentation import measure
+
+logger = logging.getLogger(__name__)
 
 User = get_user_model()
 
 
+def bom_document_queryset():
+    """
+    BOM完整文档查询集：明细按序号、尺码只取启用的并按排序号排列
+    无论多少个BOM，都只需 1 次主查询 + 2 次预取查询
+    """
+    return Bom.objects.select_related('created_by', 'assigned_to').prefetch_related(
+        Prefetch('details', queryset=BomDetail.objects.order_by('sequence')),
+        Prefetch(
+            'size_specs',
+            queryset=SizeSpec.objects.filter(is_active=True).order_by('sort_order', 'size'),
+            to_attr='active_size_specs'
+        ),
+    )
+
+
 class BomListView(generics.ListAPIView):
     """
     BOM列表视图 - 只读API
@@ -20,15 +57,359 @@ class BomListView(generics.ListAPIView):
     - 排序: ?ordering=-created_at
     - 搜索: ?search=款式编码或产品名称
     - 过滤: ?status=DRAFT&category=TOP
+    - 成本: ?total_cost__gte=100&ordering=-total_cost
+    - 稀疏字段: ?fields=style_code,status / ?omit=notes / ?profile=compact，只读取并返回需要的列
     """
     queryset = Bom.objects.select_related('created_by', 'assigned_to').order_by('-created_at')
     serializer_class = BomSerializer
     permission_classes = [AllowAny]  # 临时允许匿名访问，用于前端测试
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    filterset_fields = ['status', 'category', 'season', 'year']
+    filterset_fields = {
+        'status': ['exact'],
+        'category': ['exact'],
+        'season': ['exact'],
+        'year': ['exact'],
+        'total_cost': ['gte', 'lte'],
+    }
     search_fields = ['style_code', 'product_name', 'wave']
-    ordering_fields = ['created_at', 'updated_at', 'style_code', 'product_name']
+    ordering_fields = ['created_at', 'updated_at', 'style_code', 'product_name', 'total_cost']
     ordering = ['-created_at']
+    # 列表校验值只覆盖BOM主表字段，带明细/尺码的子类需关闭
+    conditional_list = True
+    cache_prefix = 'list'
+    # values() 快速序列化路径，输出与 serializer_class 一致；为 None 时使用 serializer_class
+    row_serializer_class = BomListRowSerializer
+    # 是否支持 ?fields= / ?omit= / ?profile= 稀疏字段集（仅快速路径）
+    sparse_fieldsets = True
+
+    def list(self, request, *args, **kwargs):
+        """
+        启用读缓存时：缓存键 = 列表代数 + 规范化查询参数，ETag 由缓存键生成，
+        命中时不访问数据库；未启用时由取出的当前页生成校验值做条件请求
+        """
+        if not bom_cache.is_enabled():
+            return self.conditional_list_response(request)
+
+        key = bom_cache.list_key(request, prefix=self.cache_prefix)
+        etag = conditional.make_etag(key)
+        response = conditional.conditional_response(request, etag, None)
+        if response is not None:
+            return conditional.set_validators(response, etag, None)
+
+        data = bom_cache.lookup(key)
+        hit = data is not None
+        if not hit:
+            data = self.get_list_data(self.filter_queryset(self.get_queryset()))
+            bom_cache.store(key, data)
+        response = Response(data)
+        response['X-Cache'] = 'HIT' if hit else 'MISS'
+        return conditional.set_validators(response, etag, None)
+
+    def conditional_list_response(self, request):
+        """
+        支持 If-None-Match / If-Modified-Since：先取当前页（与正常请求同一条查询），
+        页内各行的主键和 updated_at 未变化时直接返回 304，不做序列化，也不对整个过滤结果做聚合
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        if not self.conditional_list:
+            return Response(self.get_list_data(queryset))
+        rows, render = self.get_list_page(queryset)
+        etag, last_modified = conditional.page_validators(rows, request)
+        response = conditional.conditional_response(request, etag, last_modified)
+        if response is None:
+            response = Response(render())
+        return conditional.set_validators(response, etag, last_modified)
+
+    def get_list_data(self, queryset):
+        _, render = self.get_list_page(queryset)
+        return render()
+
+    def get_list_page(self, queryset):
+        """
+        取出当前页，返回 (行, render)；render() 序列化这些行并生成分页响应数据
+        快速路径的行是 values() 字典，否则是模型实例
+        """
+        if self.row_serializer_class is not None:
+            fields = select_fields(self.request.query_params, BomSerializer.Meta.fields) \
+                if self.sparse_fieldsets else None
+            row_serializer = self.row_serializer_class(fields)
+            columns = list(row_serializer.columns)
+            if self.paginator is not None:
+                # 游标由排序字段生成，即使不输出也要读取
+                columns += [name for name, _ in self.paginator.get_ordering(queryset) if name not in columns]
+            # 列表校验值由页内各行的主键和 updated_at 生成
+            columns += [name for name in ('style_code', 'updated_at') if name not in columns]
+            queryset = queryset.values(*columns)
+
+            def serialize(rows):
+                return row_serializer.serialize(rows)
+        else:
+            def serialize(rows):
+                return self.get_serializer(rows, many=True).data
+
+        page = self.paginate_queryset(queryset)
+        rows = page if page is not None else list(queryset)
+
+        def render():
+            with measure('serialize'):
+                data = serialize(rows)
+            return self.get_paginated_response(data).data if page is not None else data
+        return rows, render
+
+
+class BomExportView(BomListView):
+    """
+    BOM批量导出 - 与BOM列表使用相同的过滤、搜索和排序参数
+
+    支持参数：
+    - ?export_format=csv（默认）或 xlsx
+    - ?sheet=details（默认）/ boms / size_specs：CSV 每次导出一类数据，xlsx 包含全部工作表
+    - 其余参数同BOM列表，如 ?status=CONFIRMED&season=SPRING
+    """
+    pagination_class = None
+
+    def get(self, request, *args, **kwargs):
+        export_format = request.query_params.get('export_format', 'csv')
+        sheet = request.query_params.get('sheet', 'details')
+        if export_format not in ('csv', 'xlsx') or sheet not in exporters.SHEETS:
+            return Response({
+                'success': False,
+                'message': 'export_format 只支持 csv/xlsx，sheet 只支持 boms/details/size_specs'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        if export_format == 'xlsx':
+            return FileResponse(
+                exporters.write_xlsx(queryset),
+                as_attachment=True,
+                filename='boms.xlsx',
+                content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+            )
+        response = StreamingHttpResponse(
+            exporters.stream_csv(queryset, sheet), content_type='text/csv; charset=utf-8'
+        )
+        response['Content-Disposition'] = f'attachment; filename="boms_{sheet}.csv"'
+        return response
+
+
+class BomDocumentListView(BomListView):
+    """
+    BOM完整文档列表 - 每个BOM附带明细和尺码规格
+    过滤、搜索、排序、分页参数与BOM列表相同
+    """
+    serializer_class = BomDocumentSerializer
+    conditional_list = False
+    cache_prefix = 'documents'
+    row_serializer_class = None
+    sparse_fieldsets = False
+
+    def get_queryset(self):
+        return bom_document_queryset().order_by('-created_at')
+
+
+class BomDocumentView(generics.RetrieveAPIView):
+    """
+    BOM完整文档 - 一次请求返回BOM主表、明细和启用的尺码规格
+    """
+    serializer_class = BomDocumentSerializer
+    permission_classes = [AllowAny]  # 临时允许匿名访问，用于前端测试
+    lookup_field = 'style_code'
+
+    def get_queryset(self):
+        return bom_document_queryset()
+
+    def retrieve(self, request, *args, **kwargs):
+        """启用读缓存时按 BOM代数 缓存整份文档，ETag 由缓存键生成"""
+        if not bom_cache.is_enabled():
+            return super().retrieve(request, *args, **kwargs)
+
+        key = bom_cache.document_key(kwargs[self.lookup_field])
+        etag = conditional.make_etag(key)
+        response = conditional.conditional_response(request, etag, None)
+        if response is not None:
+            return conditional.set_validators(response, etag, None)
+
+        data = bom_cache.lookup(key)
+        hit = data is not None
+        if not hit:
+            data = super().retrieve(request, *args, **kwargs).data
+            bom_cache.store(key, data)
+        response = Response(data)
+        response['X-Cache'] = 'HIT' if hit else 'MISS'
+        return conditional.set_validators(response, etag, None)
+
+
+class BomSizeChartView(APIView):
+    """
+    BOM尺码表 - 尺码 × 部位的列式矩阵 {style_code, sizes, parts, values}，前端可直接渲染
+    """
+    permission_classes = [AllowAny]  # 临时允许匿名访问，用于前端测试
+
+    def get(self, request, style_code):
+        chart = size_charts.pivot([style_code])[style_code]
+        # 只有没有尺码时才需要确认BOM是否存在
+        if not chart['sizes'] and not Bom.objects.filter(pk=style_code).exists():
+            raise Http404
+        return Response(chart)
+
+
+class BomSizeChartListView(APIView):
+    """
+    多个BOM的尺码表：?style_codes=A,B,C（最多 size_charts.MAX_STYLE_CODES 个）
+    按请求顺序返回 {results: [...]}，不存在或没有尺码的BOM为空矩阵
+    """
+    permission_classes = [AllowAny]  # 临时允许匿名访问，用于前端测试
+
+    def get(self, request):
+        style_codes = [code.strip() for code in request.query_params.get('style_codes', '').split(',') if code.strip()]
+        if not style_codes:
+            return Response({'success': False, 'message': '请指定 style_codes'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(style_codes) > size_charts.MAX_STYLE_CODES:
+            return Response({
+                'success': False, 'message': f'一次最多查询 {size_charts.MAX_STYLE_CODES} 个BOM的尺码表'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'results': list(size_charts.pivot(style_codes).values())})
+
+
+class MaterialUsageReportView(generics.GenericAPIView):
+    """
+    跨款式物料用量汇总 - 按 (物料类型, 基础单位) 对 base_quantity 求和
+    - 过滤: ?material_type=FABRIC&bom__season=SPRING&bom__year=2025&bom__wave=第一波
+    无法换算到基础单位的明细（如未配置卷长的 ROLL）单独计数，不计入用量
+    """
+    queryset = BomDetail.objects.all()
+    permission_classes = [AllowAny]  # 临时允许匿名访问，用于前端测试
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = {
+        'material_type': ['exact'],
+        'material_code': ['exact'],
+        'supplier_name': ['exact'],
+        'bom__season': ['exact'],
+        'bom__year': ['exact'],
+        'bom__wave': ['exact'],
+        'bom__category': ['exact'],
+        'bom__status': ['exact'],
+    }
+
+    def get(self, request):
+        rows = (
+            self.filter_queryset(self.get_queryset())
+            .order_by('material_type', 'base_unit')
+            .values('material_type', 'base_unit')
+            .annotate(quantity=Sum('base_quantity'), details=Count('id'))
+        )
+        results, unconverted = [], 0
+        for row in rows:
+            if not row['base_unit']:
+                unconverted += row['details']
+                continue
+            results.append({
+                'material_type': row['material_type'],
+                'base_unit': row['base_unit'],
+                'quantity': str(Decimal(row['quantity'] or 0).quantize(units.BASE_QUANTIZE)),
+                'details': row['details'],
+            })
+        return Response({'results': results, 'unconverted_details': unconverted})
+
+
+class BomEventListView(generics.ListAPIView):
+    """
+    BOM工作流事件审计查询 - 只读API
+
+    - 过滤: ?to_status=REVISED&bom__wave=第一波
+    - 时间: ?created_at__gte=2025-09-01
+    按 (created_at, id) 倒序游标分页
+    """
+    queryset = BomEvent.objects.order_by('-created_at', '-id')
+    serializer_class = BomEventSerializer
+    permission_classes = [AllowAny]  # 临时允许匿名访问，用于前端测试
+    pagination_class = BomEventPagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = {
+        'action': ['exact'],
+        'actor': ['exact'],
+        'from_status': ['exact'],
+        'to_status': ['exact'],
+        'created_at': ['gte', 'lte'],
+        'bom__season': ['exact'],
+        'bom__year': ['exact'],
+        'bom__wave': ['exact'],
+    }
+
+
+class BomHistoryView(BomEventListView):
+    """
+    单个BOM的工作流历史，按时间倒序分页
+    """
+
+    def get_queryset(self):
+        style_code = self.kwargs['style_code']
+        if not Bom.objects.filter(pk=style_code).exists():
+            raise Http404
+        return super().get_queryset().filter(bom_id=style_code)
+
+
+def parse_measurement_filters(values):
+    """
+    解析 ?measurement=部位:下限:上限（上下限可省略其一，闭区间），返回 [(部位, 下限, 上限)]
+    格式或数值无效时返回 400
+    """
+    conditions = []
+    for value in values:
+        part, sep, bounds = value.rpartition(':')
+        part, sep2, low = part.rpartition(':')
+        high = bounds
+        if not (sep and sep2 and part) or (low == '' and high == ''):
+            raise ValidationError({'measurement': f'无效的尺寸条件 {value}，格式为 部位:下限:上限'})
+        try:
+            low = float(low) if low != '' else None
+            high = float(high) if high != '' else None
+        except ValueError:
+            raise ValidationError({'measurement': f'尺寸条件 {value} 的上下限必须为数字'})
+        conditions.append((part, low, high))
+    return conditions
+
+
+class SizeSpecQueryView(generics.ListAPIView):
+    """
+    按部位尺寸范围查询尺码规格
+
+    - 尺寸: ?measurement=胸围:100:110&measurement=肩宽::46（可重复，需同一尺码同时满足）
+    - 尺码: ?size=M 或 ?size__in=M,L
+    - BOM: ?bom__category=TOP&bom__season=SPRING&bom__year=2025&bom__wave=第一波&bom__status=CONFIRMED
+    - 默认只查启用的尺码，?is_active=false 查停用的
+    每个尺寸条件是对 SizeMeasurement (部位, 尺码, 尺寸) 索引的一次范围扫描，按 id 游标分页
+    """
+    serializer_class = SizeSpecQuerySerializer
+    permission_classes = [AllowAny]  # 临时允许匿名访问，用于前端测试
+    pagination_class = SizeSpecPagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = {
+        'size': ['exact', 'in'],
+        'is_active': ['exact'],
+        'bom__category': ['exact'],
+        'bom__season': ['exact'],
+        'bom__year': ['exact'],
+        'bom__wave': ['exact'],
+        'bom__status': ['exact'],
+    }
+
+    def get_queryset(self):
+        params = self.request.query_params
+        queryset = SizeSpec.objects.order_by('id')
+        if 'is_active' not in params:
+            queryset = queryset.filter(is_active=True)
+        sizes = [size for size in params.get('size__in', params.get('size', '')).split(',') if size]
+        for part, low, high in parse_measurement_filters(params.getlist('measurement')):
+            rows = SizeMeasurement.objects.filter(part=part)
+            if sizes:
+                rows = rows.filter(size__in=sizes)
+            if low is not None:
+                rows = rows.filter(value__gte=low)
+            if high is not None:
+                rows = rows.filter(value__lte=high)
+            queryset = queryset.filter(pk__in=rows.values('spec_id'))
+        return queryset
 
 
 class BomDetailView(generics.RetrieveUpdateAPIView):
@@ -36,7 +417,7 @@ class BomDetailView(generics.RetrieveUpdateAPIView):
     BOM详情视图 - 支持获取和更新单个BOM
     
     支持操作：
-    - GET: 获取单个BOM详情
+    - GET: 获取单个BOM详情，支持 ?fields= / ?omit= / ?profile= 稀疏字段集
     - PATCH: 部分更新BOM字段
     - PUT: 完整更新BOM（需要所有必填字段）
     """
@@ -44,6 +425,222 @@ class BomDetailView(generics.RetrieveUpdateAPIView):
     serializer_class = BomSerializer
     permission_classes = [AllowAny]  # 临时允许匿名访问，用于前端测试
     lookup_field = 'style_code'
+    fields = None
+
+    def get_queryset(self):
+        if self.fields is None:
+            return super().get_queryset()
+        # 稀疏字段集：只读取需要的列（大文本字段不出库）
+        return Bom.objects.only(*bom_columns(self.fields))
+
+    def get_serializer(self, *args, **kwargs):
+        if self.fields is not None:
+            kwargs['fields'] = self.fields
+        return super().get_serializer(*args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        条件GET：ETag 由 version、updated_at 和最近的明细修改时间生成，
+        未变化时返回 304，不做序列化。ETag 与字段集无关，稀疏读取后也可用于 If-Match 写入
+        """
+        self.fields = select_fields(request.query_params, BomSerializer.Meta.fields)
+        etag, last_modified = conditional.bom_validators(kwargs[self.lookup_field])
+        if etag is None:
+            raise Http404
+        response = conditional.conditional_response(request, etag, last_modified)
+        if response is None:
+            response = super().retrieve(request, *args, **kwargs)
+        return conditional.set_validators(response, etag, last_modified)
+
+    def update(self, request, *args, **kwargs):
+        """
+        携带 If-Match 的写入在BOM行锁内比对 ETag，已被他人修改时返回 412
+        """
+        style_code = kwargs[self.lookup_field]
+        with transaction.atomic():
+            etag, last_modified = conditional.bom_validators(style_code, lock=True)
+            if etag is None:
+                raise Http404
+            if conditional.conditional_response(request, etag, last_modified) is not None:
+                response = Response({
+                    'success': False,
+                    'message': 'BOM已被他人修改，请刷新后重试'
+                }, status=status.HTTP_412_PRECONDITION_FAILED)
+                return conditional.set_validators(response, etag, last_modified)
+            response = super().update(request, *args, **kwargs)
+        etag, last_modified = conditional.bom_validators(style_code)
+        return conditional.set_validators(response, etag, last_modified)
+
+
+class BomCacheStatsView(APIView):
+    """
+    BOM读缓存命中统计
+    - GET: 返回命中/未命中次数和命中率
+    - DELETE: 清零统计
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        return Response({'success': True, 'data': bom_cache.stats()}, status=status.HTTP_200_OK)
+
+    def delete(self, request):
+        bom_cache.reset_stats()
+        return Response({'success': True, 'data': bom_cache.stats()}, status=status.HTTP_200_OK)
+
+
+def prometheus_metrics(request):
+    """
+    Prometheus 抓取接口（/metrics）：请求耗时直方图、请求数、SQL条数和工作流转换计数
+    不经过 DRF，避免抓取本身产生渲染开销
+    """
+    return HttpResponse(
+        bom_metrics.registry.expose(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
+
+
+class BomImportView(APIView):
+    """
+    BOM批量导入 - 上传Excel工作簿或CSV文件
+
+    支持两种上传方式（multipart/form-data）：
+    - file: .xlsx 工作簿，包含 BOM / 明细 / 尺码 工作表
+    - boms / details / size_specs: 对应数据的CSV文件（可只传其中部分）
+
+    数据分块校验、分块事务写入，出错的行会在 errors 中列出行号和原因，
+    不影响其他行的导入。
+    """
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser, FormParser]
+
+    def post(self, request):
+        workbook = request.FILES.get('file')
+        csv_files = {
+            kind: request.FILES.get(kind) for kind in ('boms', 'details', 'size_specs')
+        }
+        if workbook is None and not any(csv_files.values()):
+            return Response({
+                'success': False,
+                'message': '请上传 file（xlsx）或 boms/details/size_specs（csv）文件'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        importer = BomImporter(request.user)
+        try:
+            if workbook is not None:
+                result = importer.import_workbook(workbook)
+            else:
+                result = importer.import_csv(**csv_files)
+        except (ValueError, KeyError, OSError) as e:
+            return Response({
+                'success': False,
+                'message': f'无法读取导入文件: {str(e)}'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        data = result.as_dict()
+        data['message'] = '导入完成' if result.success else f'导入完成，{result.error_count} 行存在错误'
+        return Response(data, status=status.HTTP_200_OK)
+
+
+def grading_options(data):
+    """从请求体读取推档参数：base_size（默认M）、sizes（默认全部尺码）、increments（按部位覆盖档差）"""
+    increments = data.get('increments') or {}
+    if not isinstance(increments, dict):
+        raise grading.GradingError('increments 必须是 {部位: 档差} 对象')
+    sizes = data.get('sizes') or None
+    if sizes is not None and not isinstance(sizes, list):
+        raise grading.GradingError('sizes 必须是尺码列表')
+    return {
+        'base_size': data.get('base_size') or grading.DEFAULT_BASE_SIZE,
+        'sizes': sizes,
+        'overrides': increments,
+    }
+
+
+class BomGradeSizesView(APIView):
+    """
+    单个BOM尺码推档
+    以基础码尺寸（请求体 measurements，缺省时读取该BOM已有的基础码）按品类档差生成各尺码，
+    已存在的尺码覆盖更新，不存在的新建
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, style_code):
+        bom = get_object_or_404(Bom, style_code=style_code)
+        try:
+            rows = grading.grade_bom(
+                bom, measurements=request.data.get('measurements'), **grading_options(request.data)
+            )
+        except grading.GradingError as e:
+            return Response({'success': False, 'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'success': True,
+            'message': f'已生成 {len(rows)} 个尺码',
+            'data': [
+                {'size': size, 'sort_order': sort_order, 'measurements': measurements}
+                for size, sort_order, measurements in rows
+            ],
+        }, status=status.HTTP_200_OK)
+
+
+class BulkGradeSizesView(APIView):
+    """
+    按波段批量重新推档
+    请求体 wave 必填，season、year 可选；波段内每个BOM以各自的基础码尺寸推档，
+    没有基础码尺寸的BOM跳过并在 skipped 中列出
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        wave = request.data.get('wave')
+        if not wave:
+            return Response({'success': False, 'message': '请指定 wave'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            result = grading.grade_wave(
+                wave, season=request.data.get('season'), year=request.data.get('year'),
+                **grading_options(request.data)
+            )
+        except grading.GradingError as e:
+            return Response({'success': False, 'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'success': True,
+            'message': f"已为 {result['boms']} 个BOM生成 {result['size_specs']} 条尺码规格",
+            **result,
+        }, status=status.HTTP_200_OK)
+
+
+class MrpExplosionView(APIView):
+    """
+    物料需求展开
+    请求体 {"lines": [{"style_code": "A001", "color": "黑色", "size": "M", "quantity": 120}, ...]}，
+    按 (物料编码, 供应商, 单位) 返回需求量、采购量和成本，舍入规则见 boms/mrp.py
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        try:
+            result = mrp.explode(request.data.get('lines'))
+        except mrp.ExplosionError as e:
+            return Response({'success': False, 'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'success': True, **result}, status=status.HTTP_200_OK)
+
+
+def check_expected_version(request, bom):
+    """
+    客户端可在请求体中携带读取时的 version，与当前版本不一致说明BOM已被他人修改
+    """
+    expected = request.data.get('version')
+    if expected in (None, '') or str(expected) == str(bom.version):
+        return
+    raise WorkflowConflictError(bom.style_code, bom.status, expected)
+
+
+def conflict_response(error):
+    """工作流冲突统一返回 409"""
+    return Response({
+        'success': False,
+        'message': str(error),
+        'style_code': error.style_code,
+    }, status=status.HTTP_409_CONFLICT)
 
 
 class SubmitForDetailsView(APIView):
@@ -55,15 +652,12 @@ class SubmitForDetailsView(APIView):
     
     def post(self, request, style_code):
         try:
-            # 调试信息
-            print(f"SubmitForDetailsView: 查找BOM style_code={style_code}")
-            all_boms = Bom.objects.all()
-            print(f"数据库中的所有BOM: {[b.style_code for b in all_boms]}")
-            
             bom = get_object_or_404(Bom, style_code=style_code)
             
             # 模拟用户角色（从请求头或localStorage获取）
             user_role = request.META.get('HTTP_X_USER_ROLE', 'pattern_maker')
+            logger.debug('submit_for_details style_code=%s role=%s status=%s',
+                         style_code, user_role, bom.status)
             
             # 创建模拟用户对象
             class MockUser:
@@ -74,6 +668,7 @@ class SubmitForDetailsView(APIView):
             mock_user = MockUser(user_role)
             
             # 执行状态转换
+            check_expected_version(request, bom)
             success = bom.submit_for_details(mock_user)
             
             if success:
@@ -89,7 +684,10 @@ class SubmitForDetailsView(APIView):
                     'message': '无法执行此操作，请检查BOM状态和用户权限'
                 }, status=status.HTTP_400_BAD_REQUEST)
                 
+        except WorkflowConflictError as e:
+            return conflict_response(e)
         except Exception as e:
+            logger.exception('工作流操作失败 style_code=%s', style_code)
             return Response({
                 'success': False,
                 'message': f'操作失败: {str(e)}'
@@ -115,6 +713,7 @@ class SubmitToCraftView(APIView):
                     self.username = username
             
             mock_user = MockUser(user_role)
+            check_expected_version(request, bom)
             success = bom.submit_to_craft(mock_user)
             
             if success:
@@ -130,7 +729,10 @@ class SubmitToCraftView(APIView):
                     'message': '无法执行此操作，请检查BOM状态和用户权限'
                 }, status=status.HTTP_400_BAD_REQUEST)
                 
+        except WorkflowConflictError as e:
+            return conflict_response(e)
         except Exception as e:
+            logger.exception('工作流操作失败 style_code=%s', style_code)
             return Response({
                 'success': False,
                 'message': f'操作失败: {str(e)}'
@@ -156,6 +758,7 @@ class ApproveBomView(APIView):
                     self.username = username
             
             mock_user = MockUser(user_role)
+            check_expected_version(request, bom)
             success = bom.approve_bom(mock_user)
             
             if success:
@@ -168,10 +771,13 @@ class ApproveBomView(APIView):
             else:
                 return Response({
                     'success': False,
-                    'message': '无法执行此操作，请检查用户权限'
+                    'message': '无法执行此操作，请检查BOM状态和用户权限'
                 }, status=status.HTTP_400_BAD_REQUEST)
                 
+        except WorkflowConflictError as e:
+            return conflict_response(e)
         except Exception as e:
+            logger.exception('工作流操作失败 style_code=%s', style_code)
             return Response({
                 'success': False,
                 'message': f'操作失败: {str(e)}'
@@ -197,6 +803,7 @@ class RejectBomView(APIView):
                     self.username = username
             
             mock_user = MockUser(user_role)
+            check_expected_version(request, bom)
             success = bom.reject_bom(mock_user, reason)
             
             if success:
@@ -209,10 +816,87 @@ class RejectBomView(APIView):
             else:
                 return Response({
                     'success': False,
-                    'message': '无法执行此操作，请检查用户权限'
+                    'message': '无法执行此操作，请检查BOM状态和用户权限'
                 }, status=status.HTTP_400_BAD_REQUEST)
                 
+        except WorkflowConflictError as e:
+            return conflict_response(e)
         except Exception as e:
+            logger.exception('工作流操作失败 style_code=%s', style_code)
+            return Response({
+                'success': False,
+                'message': f'操作失败: {str(e)}'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class BulkWorkflowView(APIView):
+    """
+    批量批准/驳回BOM
+
+    请求体: {"action": "approve" | "reject", "style_codes": [...], "reason": "", "versions": {style_code: version}}
+    在一个事务内用集合式 UPDATE 完成，返回逐条结果
+    """
+    permission_classes = [AllowAny]
+    max_items = 5000
+
+    def post(self, request):
+        try:
+            action = request.data.get('action')
+            style_codes = request.data.get('style_codes')
+            versions = request.data.get('versions') or {}
+
+            if action not in Bom.BULK_ACTIONS:
+                return Response({
+                    'success': False,
+                    'message': f"action 必须是 {' / '.join(Bom.BULK_ACTIONS)}"
+                }, status=status.HTTP_400_BAD_REQUEST)
+            if not isinstance(style_codes, list) or not style_codes:
+                return Response({
+                    'success': False,
+                    'message': 'style_codes 必须是非空列表'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            if len(style_codes) > self.max_items:
+                return Response({
+                    'success': False,
+                    'message': f'单次最多处理 {self.max_items} 个BOM'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            if not isinstance(versions, dict):
+                return Response({
+                    'success': False,
+                    'message': 'versions 必须是 {style_code: version} 对象'
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            user_role = request.META.get('HTTP_X_USER_ROLE', 'admin')
+
+            class MockUser:
+                def __init__(self, role, username='mock_admin'):
+                    self.role = role
+                    self.username = username
+
+            mock_user = MockUser(user_role)
+            if user_role not in Bom.BULK_ACTIONS[action][1]:
+                return Response({
+                    'success': False,
+                    'message': '无法执行此操作，请检查用户权限'
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            results = Bom.bulk_transition(
+                [str(code) for code in style_codes], action, mock_user,
+                reason=request.data.get('reason', ''), versions=versions
+            )
+            succeeded = sum(1 for item in results if item['success'])
+            return Response({
+                'success': succeeded == len(results),
+                'message': f'已处理 {len(results)} 个BOM，成功 {succeeded} 个',
+                'data': {
+                    'succeeded': succeeded,
+                    'failed': len(results) - succeeded,
+                    'results': results,
+                }
+            }, status=status.HTTP_200_OK)
+
+        except Exception as e:
+            logger.exception('批量工作流操作失败')
             return Response({
                 'success': False,
                 'message': f'操作失败: {str(e)}'
@@ -247,71 +931,199 @@ class BomActionsView(APIView):
             }, status=status.HTTP_200_OK)
             
         except Exception as e:
+            logger.exception('获取可执行操作失败 style_code=%s', style_code)
             return Response({
                 'success': False,
                 'message': f'获取操作失败: {str(e)}'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def get_notification_user(request):
+    """
+    通知接收人：已登录用户，或（仅 DEBUG 下）由 X-User-Name 请求头指定的用户
+    """
+    if request.user and request.user.is_authenticated:
+        return request.user
+    username = request.META.get('HTTP_X_USER_NAME') if settings.DEBUG else None
+    if username:
+        return User.objects.filter(username=username, is_active=True).first()
+    return None
+
+
+def missing_user_response():
+    return Response({
+        'success': False,
+        'message': '无法识别当前用户，请先登录'
+    }, status=status.HTTP_401_UNAUTHORIZED)
+
+
 class NotificationView(APIView):
     """
-    通知API - 模拟通知发送和接收
+    通知API
+    - GET: 当前用户的收件箱，按时间倒序游标分页，?is_read=false 只看未读
+    - POST: 向指定用户或角色发送通知 {"title", "message", "usernames": [...] 或 "role", "style_code"}
     """
     permission_classes = [AllowAny]
-    
+
     def post(self, request):
-        """发送通知"""
+        """发送通知（一次 bulk_create）"""
         try:
-            # 从请求中获取通知数据
-            notification_data = request.data
-            
-            # 这里可以实现真正的通知逻辑
-            # 现在只是模拟返回成功响应
-            
+            title = (request.data.get('title') or '').strip()
+            usernames = request.data.get('usernames') or []
+            role = request.data.get('role')
+            if not title or not (usernames or role):
+                return Response({
+                    'success': False,
+                    'message': 'title 必填，且需指定 usernames 或 role'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            if not isinstance(usernames, list) or not all(isinstance(name, str) for name in usernames):
+                return Response({
+                    'success': False,
+                    'message': 'usernames 必须是用户名列表'
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            recipients = User.objects.filter(is_active=True)
+            recipients = recipients.filter(username__in=usernames) if usernames else recipients.filter(role=role)
+            style_code = request.data.get('style_code') or None
+            if style_code and not Bom.objects.filter(pk=style_code).exists():
+                return Response({
+                    'success': False,
+                    'message': f'BOM {style_code} 不存在'
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            notifications = Notification.objects.bulk_create([
+                Notification(
+                    recipient_id=recipient_id,
+                    bom_id=style_code,
+                    notification_type='message',
+                    title=title[:100],
+                    message=request.data.get('message', '')
+                )
+                for recipient_id in recipients.values_list('pk', flat=True).iterator()
+            ], batch_size=Notification.BATCH_SIZE)
+            streams.publish_on_commit(notifications=notifications)
+
             return Response({
                 'success': True,
                 'message': '通知发送成功',
-                'notification_id': f'mock_notification_{hash(str(notification_data))}',
-                'data': notification_data
+                'data': {'sent': len(notifications)}
             }, status=status.HTTP_201_CREATED)
-            
+
         except Exception as e:
+            logger.exception('发送通知失败')
             return Response({
                 'success': False,
                 'message': f'发送通知失败: {str(e)}'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-    
+
     def get(self, request):
         """获取通知列表"""
-        try:
-            # 模拟返回通知列表
-            notifications = [
-                {
-                    'id': 'mock_1',
-                    'type': 'status_change',
-                    'title': 'BOM状态更新',
-                    'message': '新的BOM等待填写明细',
-                    'isRead': False,
-                    'createdAt': '2025-09-21T12:00:00Z'
-                },
-                {
-                    'id': 'mock_2',
-                    'type': 'approval',
-                    'title': 'BOM已批准',
-                    'message': 'BOM TEST001 已被批准',
-                    'isRead': True,
-                    'createdAt': '2025-09-21T11:00:00Z'
-                }
-            ]
-            
-            return Response({
-                'success': True,
-                'results': notifications,
-                'count': len(notifications)
-            }, status=status.HTTP_200_OK)
-            
-        except Exception as e:
-            return Response({
-                'success': False,
-                'message': f'获取通知失败: {str(e)}'
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        user = get_notification_user(request)
+        if user is None:
+            return missing_user_response()
+
+        queryset = Notification.objects.filter(recipient=user).order_by('-created_at', '-id')
+        is_read = request.query_params.get('is_read')
+        if is_read in ('true', 'false', '1', '0'):
+            queryset = queryset.filter(is_read=is_read in ('true', '1'))
+
+        paginator = NotificationPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        return paginator.get_paginated_response(NotificationSerializer(page, many=True).data)
+
+
+class NotificationUnreadCountView(APIView):
+    """未读通知数（只走 (recipient, is_read, ...) 索引的 COUNT）"""
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        user = get_notification_user(request)
+        if user is None:
+            return missing_user_response()
+        return Response({
+            'success': True,
+            'data': {'unread': Notification.unread_count(user)}
+        }, status=status.HTTP_200_OK)
+
+
+class NotificationMarkAllReadView(APIView):
+    """全部标记为已读（一条 UPDATE）"""
+    permission_classes = [AllowAny]
+
+    def post(self, request):
+        user = get_notification_user(request)
+        if user is None:
+            return missing_user_response()
+        updated = Notification.mark_all_read(user)
+        return Response({
+            'success': True,
+            'message': f'已将 {updated} 条通知标记为已读',
+            'data': {'updated': updated}
+        }, status=status.HTTP_200_OK)
+
+
+class NotificationReadView(APIView):
+    """标记单条通知为已读"""
+    permission_classes = [AllowAny]
+
+    def post(self, request, notification_id):
+        user = get_notification_user(request)
+        if user is None:
+            return missing_user_response()
+        updated = Notification.objects.filter(
+            pk=notification_id, recipient=user, is_read=False
+        ).update(is_read=True, read_at=timezone.now())
+        if not updated and not Notification.objects.filter(pk=notification_id, recipient=user).exists():
+            raise Http404
+        return Response({'success': True, 'data': {'updated': updated}}, status=status.HTTP_200_OK)
+
+
+async def bom_event_stream(request):
+    """
+    BOM实时事件流（Server-Sent Events，需在 ASGI 下运行）
+
+    - ?style_code=A&style_code=B 只订阅这些BOM的工作流转换，缺省订阅全部BOM
+    - 已登录时同时订阅当前用户的通知（DEBUG 下也可用 X-User-Name 请求头指定用户，便于开发调试）
+    每条消息的 data 为JSON，type 为 bom.transition / notification / resync；
+    收到 resync 说明推送积压被丢弃，客户端应重新拉取列表
+    """
+    style_codes = request.GET.getlist('style_code')
+    channels = [streams.bom_channel(code) for code in style_codes] or [streams.ALL_BOMS]
+
+    user = await request.auser()
+    user_id = user.pk if user.is_authenticated else None
+    username = request.META.get('HTTP_X_USER_NAME') if settings.DEBUG else None
+    if user_id is None and username:
+        user_id = await (
+            User.objects.filter(username=username, is_active=True)
+            .values_list('pk', flat=True).afirst()
+        )
+    if user_id is not None:
+        channels.append(streams.user_channel(user_id))
+
+    response = StreamingHttpResponse(
+        _sse_messages(streams.get_broker(), channels), content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # 关闭 nginx 缓冲
+    return response
+
+
+async def _sse_messages(broker, channels):
+    heartbeat = getattr(settings, 'BOM_STREAM_HEARTBEAT', 15)
+    subscription = broker.subscribe(channels)
+    try:
+        yield 'retry: 3000\n: connected\n\n'
+        while True:
+            try:
+                message = await subscription.get(heartbeat)
+            except asyncio.TimeoutError:
+                # 心跳注释行，防止代理断开空闲连接
+                yield ': ping\n\n'
+                continue
+            yield streams.format_sse(message)
+            if subscription.overflowed:
+                subscription.overflowed = False
+                yield streams.format_sse({'type': 'resync'})
+    finally:
+        subscription.close()
@@ -46,6 +46,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'boms.instrumentation.RequestMetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -165,3 +166,60 @@ CORS_ALLOW_HEADERS = [
     'x-csrftoken',
     'x-requested-with',
 ]
+
+# Django REST Framework
+REST_FRAMEWORK = {
+    # BOM列表使用基于 (排序字段, style_code) 的游标分页，深页与首页代价一致
+    'DEFAULT_PAGINATION_CLASS': 'boms.pagination.BomCursorPagination',
+    'PAGE_SIZE': 50,
+}
+
+# 缓存：默认进程内 locmem；设置 CACHE_LOCATION 时使用文件缓存，多个进程可共享
+# （生产环境也可以换成 Redis/Memcached，BOM缓存只依赖 Django 缓存框架的基本接口）
+CACHE_LOCATION = os.environ.get('CACHE_LOCATION')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': CACHE_LOCATION,
+    } if CACHE_LOCATION else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'bom-cache',
+    }
+}
+
+# BOM列表/文档读缓存（见 boms/cache.py），超时为 0 时关闭
+BOM_CACHE_ALIAS = 'default'
+BOM_CACHE_TIMEOUT = int(os.environ.get('BOM_CACHE_TIMEOUT', 300))
+
+# BOM实时事件流（SSE，见 boms/streams.py）
+# 单进程用 LocalBroker；多个 ASGI worker 时改为 boms.streams.DatabaseBroker（按 id 轮询事件表和通知表）
+BOM_STREAM_BACKEND = os.environ.get('BOM_STREAM_BACKEND', 'boms.streams.LocalBroker')
+BOM_STREAM_POLL_INTERVAL = float(os.environ.get('BOM_STREAM_POLL_INTERVAL', 1.0))
+BOM_STREAM_GAP_TIMEOUT = float(os.environ.get('BOM_STREAM_GAP_TIMEOUT', 10.0))
+BOM_STREAM_HEARTBEAT = 15
+
+# 请求级性能埋点（见 boms/instrumentation.py）：Server-Timing 响应头 + 慢请求日志
+BOM_SERVER_TIMING = True
+BOM_SLOW_REQUEST_MS = int(os.environ.get('BOM_SLOW_REQUEST_MS', 500))
+BOM_REPEATED_QUERY_MIN = 5
+
+# /metrics 指标（见 boms/metrics.py）：多个 worker 进程时设置共享目录，各进程定期写入自己的累计值
+BOM_METRICS_DIR = os.environ.get('BOM_METRICS_DIR')
+BOM_METRICS_FLUSH_SECONDS = 5
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'simple': {'format': '%(asctime)s %(levelname)s %(name)s %(message)s'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'simple'},
+    },
+    'loggers': {
+        'boms': {
+            'handlers': ['console'],
+            'level': os.environ.get('BOM_LOG_LEVEL', 'INFO'),
+        },
+    },
+}
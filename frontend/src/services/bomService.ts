@@ -24,6 +24,54 @@ export interface BomData {
   confirmed_at: string | null
 }
 
+// BOM明细数据类型
+export interface BomDetailLine {
+  id: number
+  sequence: number
+  material_type: string
+  material_name: string
+  material_code: string
+  specification: string
+  supplier_name: string
+  supplier_code: string
+  usage_quantity: string
+  usage_unit: string
+  base_quantity: string | null  // 换算到基础单位（米/千克/个/套）的用量，无法换算时为 null
+  base_unit: string
+  unit_price: string
+  total_cost: number
+  color_requirement: string
+  craft_requirement: string
+  notes: string
+  created_at: string
+  updated_at: string
+}
+
+// 尺码规格数据类型
+export interface SizeSpecData {
+  id: number
+  size: string
+  measurements: Record<string, number>
+  sort_order: number
+  is_active: boolean
+  created_at: string
+  updated_at: string
+}
+
+// 尺码表（尺码 × 部位 列式矩阵，values[i][j] 为 sizes[i] 的 parts[j] 尺寸）
+export interface SizeChart {
+  style_code: string
+  sizes: string[]
+  parts: string[]
+  values: (number | null)[][]
+}
+
+// BOM完整文档（主表 + 明细 + 启用的尺码规格）
+export interface BomDocument extends BomData {
+  details: BomDetailLine[]
+  size_specs: SizeSpecData[]
+}
+
 // 测试数据模拟
 const MOCK_BOM_DATA: Record<string, BomData> = {
   'PENDING_CRAFT_BOM': {
@@ -116,15 +164,40 @@ const MOCK_BOM_DATA: Record<string, BomData> = {
   }
 }
 
+// 列表页使用的精简字段集（?profile=compact，与后端 BOM_FIELD_PROFILES 一致）
+export type BomListRow = Pick<BomData,
+  'style_code' | 'product_name' | 'season' | 'year' | 'wave' | 'category' |
+  'dev_colors_list' | 'target_price' | 'total_cost' | 'status' | 'version' | 'updated_at'
+> & Partial<BomData>
+
+// 游标分页的列表响应
+export interface BomListPage {
+  results: BomListRow[]
+  next: string | null
+  previous: string | null
+}
+
+// 从 next/previous 链接中取出游标参数
+export const extractCursor = (link: string | null): string | null => {
+  if (!link) return null
+  return new URL(link, window.location.origin).searchParams.get('cursor')
+}
+
 // BOM API服务类
 export class BomService {
-  // 获取BOM列表
+  // 获取BOM列表（游标分页，传入上一页返回的 cursor 获取下一页）
   static async getBomList(params?: {
     search?: string
     status?: string
     category?: string
+    season?: string
     ordering?: string
-  }) {
+    cursor?: string
+    page_size?: number
+    profile?: 'compact'
+    fields?: string
+    omit?: string
+  }): Promise<BomListPage> {
     try {
       const response = await apiClient.get('/boms/', { params })
       return response.data
@@ -132,7 +205,8 @@ export class BomService {
       console.log('API调用失败，返回模拟数据')
       return {
         results: Object.values(MOCK_BOM_DATA),
-        count: Object.keys(MOCK_BOM_DATA).length
+        next: null,
+        previous: null
       }
     }
   }
@@ -155,6 +229,12 @@ export class BomService {
     }
   }
 
+  // 获取BOM完整文档（一次请求返回明细和尺码规格）
+  static async getBomDocument(styleCode: string): Promise<BomDocument> {
+    const response = await apiClient.get(`/boms/${styleCode}/document/`)
+    return response.data
+  }
+
   // 更新BOM（部分更新）
   static async updateBom(styleCode: string, data: Partial<BomData>): Promise<BomData> {
     try {
@@ -186,6 +266,20 @@ export class BomService {
     }
   }
 
+  // 获取尺码表
+  static async getSizeChart(styleCode: string): Promise<SizeChart> {
+    const response = await apiClient.get(`/boms/${styleCode}/size-chart/`)
+    return response.data
+  }
+
+  // 批量获取尺码表（按传入顺序返回）
+  static async getSizeCharts(styleCodes: string[]): Promise<SizeChart[]> {
+    const response = await apiClient.get('/boms/size-charts/', {
+      params: { style_codes: styleCodes.join(',') }
+    })
+    return response.data.results
+  }
+
   // 更新尺寸规格（新方法用于编辑功能）
   static async updateSizeSpecs(styleCode: string, sizeSpecs: any[]): Promise<void> {
     try {